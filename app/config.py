@@ -9,24 +9,133 @@ class Settings(BaseSettings):
     
     # LLM Configuration
     openai_api_key: Optional[str] = None
+    openai_base_url: Optional[str] = None  # OpenAI-compatible endpoint (proxy or local stub); unset uses api.openai.com
     anthropic_api_key: Optional[str] = None
     llm_provider: str = "openai"  # "openai" or "anthropic"
     llm_model: str = "gpt-4-turbo-preview"  # or "claude-3-opus-20240229"
+    llm_providers: str = ""  # comma-separated preference order, e.g. "openai,anthropic"; empty uses llm_provider
+    openai_model: Optional[str] = None  # per-provider models when routing across several
+    anthropic_model: Optional[str] = None
     embedding_model: str = "text-embedding-3-small"
+    embedding_backend: str = "openai"  # "openai" or "local"
+    embedding_batch_size: int = 64
+    embedding_index_max_users: int = 1000
+    embedding_vector_ttl_seconds: int = 7 * 86400  # note vectors shared through Redis when enabled
+    related_notes_limit: int = 5
+    related_notes_min_similarity: float = 0.0
+    
+    # LLM Dispatch (adaptive concurrency limit and retries for provider calls)
+    llm_concurrency_initial: int = 16
+    llm_concurrency_min: int = 1
+    llm_concurrency_max: int = 128
+    llm_latency_target_seconds: float = 20.0
+    llm_max_retries: int = 3
+    llm_retry_backoff_seconds: float = 0.5
+    llm_retry_backoff_max_seconds: float = 20.0
+    
+    # LLM Routing (latency-aware provider selection, circuit breaking and hedging)
+    llm_stats_window: int = 100
+    llm_breaker_failure_threshold: int = 5
+    llm_breaker_cooldown_seconds: float = 30.0
+    llm_hedging_enabled: bool = False
+    llm_hedge_quantile: float = 0.95
+    llm_hedge_min_delay_seconds: float = 2.0
+    llm_hedge_default_delay_seconds: float = 10.0  # before enough latency samples exist
+    
+    # LLM Response Cache (opt-in; TTLs are per call site, 0 disables caching there)
+    enable_llm_cache: bool = False
+    llm_cache_max_entries: int = 10000
+    llm_cache_max_bytes: int = 64 * 1024 * 1024  # 64 MB
+    llm_cache_ttl_daily_goals: int = 3600
+    llm_cache_ttl_roadmap_assist: int = 86400
+    llm_cache_ttl_note_assist: int = 600
+    llm_cache_ttl_note_chunk: int = 7 * 86400  # section analyses of long notes depend only on the section text
+    
+    # Prompt context budgets (approximate input tokens of user data per endpoint)
+    prompt_token_budget_daily_goals: int = 800
+    prompt_token_budget_roadmap_assist: int = 300
+    prompt_token_budget_note_assist: int = 1200
+    
+    # Long notes (analyzed section by section, then merged in one more call)
+    note_chunk_threshold_tokens: int = 3000  # shorter content goes in a single prompt
+    note_chunk_max_tokens: int = 1500
+    note_chunk_concurrency: int = 4  # section analyses in flight per request
+    note_content_max_chars: int = 200_000  # longer notes are rejected with 413
+    note_chunk_max_sections: int = 40  # as are notes that split into more sections
+    prompt_token_budget_note_merge: int = 6000  # section analyses in the merging prompt
+    
+    # Roadmap templates (generic roadmap per topic shared by all users, personalized per request)
+    roadmap_templates_enabled: bool = True
+    roadmap_template_max_topics: int = 2000
+    roadmap_template_ttl_seconds: int = 7 * 86400
+    roadmap_template_min_similarity: float = 0.92  # cosine similarity for a differently worded topic to match
+    roadmap_personalize_max_tokens: int = 600  # completion limit of the personalization pass
     
     # NestJS Backend
     nestjs_api_url: str = "http://localhost:3000"
     nestjs_graphql_url: str = "http://localhost:3000/graphql"
+    graphql_server_filters: bool = False  # backend supports updatedSince/isCompleted/take arguments
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry_seconds: float = 30.0
+    http_connect_timeout_seconds: float = 5.0
+    http_read_timeout_seconds: float = 30.0
+    http_write_timeout_seconds: float = 30.0
+    http_pool_timeout_seconds: float = 5.0
+    http2_enabled: bool = False
     
     # Auth0 Configuration
     auth0_domain: str
     auth0_audience: str
     auth0_issuer: str
+    auth0_jwks_url: Optional[str] = None  # unset uses https://{auth0_domain}/.well-known/jwks.json
+    jwks_cache_ttl_seconds: int = 3600  # 1 hour
+    jwks_refresh_min_interval_seconds: int = 30  # rate limit for unknown-kid refetches
+    verified_token_cache_size: int = 10000
+    jwt_verify_workers: int = 4
+    
+    # Internal webhooks (NestJS change events)
+    webhook_secret: Optional[str] = None  # unset disables the webhook endpoint
+    webhook_tolerance_seconds: int = 300
+    webhook_debounce_seconds: float = 2.0  # quiet period before a user's events are applied
+    webhook_max_delay_seconds: float = 10.0  # upper bound under a steady stream of events
     
     # Cache Configuration
     cache_ttl_seconds: int = 300  # 5 minutes
+    user_context_cache_size: int = 1000
+    user_context_cache_max_bytes: int = 256 * 1024 * 1024  # 256 MB
+    context_delta_sync_enabled: bool = False  # backend supports updatedSince on notes/roadmaps
+    context_full_resync_seconds: int = 1800  # full refetch catches deletions
+    context_delta_overlap_seconds: float = 5.0
     enable_redis: bool = False
     redis_url: Optional[str] = None
+    # With Redis on, caches keep a local L1 in front of it and share entries between workers
+    shared_cache_compress_min_bytes: int = 1024  # zlib-compress larger values in Redis
+    shared_cache_lock_ttl_seconds: float = 10.0  # longest one worker may hold a key's load lock
+    shared_cache_lock_wait_seconds: float = 5.0  # how long other workers wait for that load
+    
+    # Daily goals pre-generation (background scheduler; spends LLM tokens, so opt-in)
+    enable_goals_precompute: bool = False
+    goals_precompute_start_hour: int = 3  # UTC; off-peak window [start, end)
+    goals_precompute_end_hour: int = 6
+    goals_precompute_interval_seconds: int = 600
+    goals_precompute_concurrency: int = 4
+    nestjs_service_token: Optional[str] = None  # backend token for background fetches; else the user's last
+    active_user_window_seconds: int = 7 * 86400
+    active_users_max: int = 10000
+    daily_goals_cache_size: int = 10000
+    goals_batch_concurrency: int = 8  # users in flight per /goals/daily/batch call
+    goals_batch_max_users: int = 500
+    goals_batch_scope: str = "goals:batch"  # scope or permission a service token needs for the batch endpoint
+    
+    # Observability
+    server_timing_enabled: bool = False  # per-stage Server-Timing header on every response
+    readiness_timeout_seconds: float = 2.0  # per dependency check in /health/ready
+    readiness_cache_seconds: float = 5.0  # /health/ready calls within this window share one round of checks
+    internal_token: Optional[str] = None  # bearer token for /metrics and /health/* stats; unset disables them
+    
+    # Response compression (roadmap and note assistant JSON only; streams are never compressed)
+    gzip_minimum_size: int = 1024  # bytes; 0 disables
     
     # Feature Flags
     enable_daily_goals: bool = True
@@ -34,7 +143,10 @@ class Settings(BaseSettings):
     enable_note_assistant: bool = True
     
     # Rate Limiting
-    max_requests_per_minute: int = 60
+    max_requests_per_minute: int = 60  # per user; 0 disables
+    global_max_requests_per_minute: int = 600  # 0 disables
+    llm_token_budget_per_user: int = 200000  # 0 disables
+    llm_token_budget_window_seconds: int = 86400  # 1 day
     
     class Config:
         env_file = ".env"
@@ -0,0 +1,92 @@
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
+from app.config import settings
+from app.middleware.auth import jwks_store
+from app.middleware.rate_limit import rate_limiter
+from app.services.embedding_service import embedding_service
+from app.services.http_client import PooledHTTPClient
+from app.services.llm_cache import llm_response_cache
+from app.services.llm_router import close_llm_router
+from app.services.invalidation import change_events
+from app.utils.tiered_cache import close_tiered_caches
+
+if TYPE_CHECKING:
+    from app.services.database_service import DatabaseService
+    from app.services.recommendation_service import RecommendationService
+
+_backend_client: Optional[PooledHTTPClient] = None
+
+def get_backend_client() -> PooledHTTPClient:
+    """Shared HTTP client for the NestJS backend, one per worker"""
+    global _backend_client
+    if _backend_client is None:
+        _backend_client = PooledHTTPClient(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_keepalive_connections,
+            keepalive_expiry=settings.http_keepalive_expiry_seconds,
+            connect_timeout=settings.http_connect_timeout_seconds,
+            read_timeout=settings.http_read_timeout_seconds,
+            write_timeout=settings.http_write_timeout_seconds,
+            pool_timeout=settings.http_pool_timeout_seconds,
+            http2=settings.http2_enabled
+        )
+    return _backend_client
+
+class ServiceContainer:
+    """Services shared by the routers and background tasks, each created on first use
+
+    Nothing is built at import time, so the app can serve /health before any
+    provider SDK is imported or client constructed.
+    """
+
+    def __init__(self):
+        self._instances: Dict[str, Any] = {}
+
+    def get(self, name: str, factory: Callable[[], Any]) -> Any:
+        instance = self._instances.get(name)
+        if instance is None:
+            instance = self._instances[name] = factory()
+        return instance
+
+    def created(self) -> List[str]:
+        return list(self._instances)
+
+    async def aclose(self) -> None:
+        """Close services that hold resources and forget all of them"""
+        instances, self._instances = self._instances, {}
+        for instance in instances.values():
+            aclose = getattr(instance, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+services = ServiceContainer()
+
+def get_database_service() -> "DatabaseService":
+    """The shared DatabaseService, for use with Depends"""
+    from app.services.database_service import DatabaseService
+
+    return services.get("database", DatabaseService)
+
+def get_recommendation_service() -> "RecommendationService":
+    """The shared RecommendationService, for use with Depends"""
+    from app.services.recommendation_service import RecommendationService
+
+    return services.get("recommendation", RecommendationService)
+
+async def startup() -> None:
+    """Create shared resources when the app starts"""
+    get_backend_client()
+
+async def shutdown() -> None:
+    """Close shared resources when the app stops"""
+    global _backend_client
+    await change_events.aclose()
+    await services.aclose()
+    if _backend_client is not None:
+        await _backend_client.aclose()
+        _backend_client = None
+    await jwks_store.aclose()
+    await llm_response_cache.backend.aclose()
+    await rate_limiter.backend.aclose()
+    await close_tiered_caches()
+    await embedding_service.aclose()
+    await close_llm_router()
@@ -1,13 +1,30 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from app import dependencies
 from app.config import settings
-from app.routers import health, goals, roadmap_assistant, note_assistant, analysis
+from app.middleware.compression import SelectiveGZipMiddleware
+from app.middleware.metrics import MetricsMiddleware
+from app.services.goals_scheduler import goals_scheduler
+from app.utils.fast_json import FastJSONResponse
+from app.routers import health, goals, roadmap_assistant, note_assistant, analysis, webhooks
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await dependencies.startup()
+    if settings.enable_goals_precompute:
+        goals_scheduler.start()
+    yield
+    await goals_scheduler.stop()
+    await dependencies.shutdown()
 
 app = FastAPI(
     title=settings.api_title,
     version=settings.api_version,
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=FastJSONResponse,
+    lifespan=lifespan
 )
 
 # CORS Configuration
@@ -17,7 +34,16 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
+app.add_middleware(MetricsMiddleware)
+if settings.gzip_minimum_size:
+    # Only the assistants' large JSON bodies; streams stay uncompressed
+    app.add_middleware(
+        SelectiveGZipMiddleware,
+        paths=[f"{settings.api_prefix}/roadmap/assist", f"{settings.api_prefix}/notes/assist"],
+        minimum_size=settings.gzip_minimum_size
+    )
 
 # Include routers
 app.include_router(health.router, tags=["Health"])
@@ -25,6 +51,7 @@ app.include_router(goals.router, prefix=settings.api_prefix, tags=["Goals"])
 app.include_router(roadmap_assistant.router, prefix=settings.api_prefix, tags=["Roadmap Assistant"])
 app.include_router(note_assistant.router, prefix=settings.api_prefix, tags=["Note Assistant"])
 app.include_router(analysis.router, prefix=settings.api_prefix, tags=["Analysis"])
+app.include_router(webhooks.router, prefix=settings.api_prefix, tags=["Webhooks"])
 
 @app.get("/")
 async def root():
@@ -1,43 +1,234 @@
-from fastapi import HTTPException, Depends, status
+from fastapi import HTTPException, Depends, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from jose import jwt, JWTError
+from jose import jwk, jwt, JWTError
+from jose.backends.base import Key
+from typing import Any, Awaitable, Callable, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from app.config import settings
+from app.utils.cache import LRUCache
+from app.utils.fast_json import loads
+from app.utils.metrics import span, timed
+from app.utils.tiered_cache import TieredCache, create_tiered_cache
+import asyncio
+import hashlib
+import hmac
 import httpx
+import logging
+import time
+
+logger = logging.getLogger(__name__)
 
 security = HTTPBearer()
 
+class JWKSKeyStore:
+    """In-process cache of Auth0 signing keys, indexed by kid"""
+
+    def __init__(
+        self,
+        jwks_url: str,
+        ttl_seconds: float = 3600,
+        min_refresh_interval: float = 30,
+        timeout: float = 10.0,
+        shared: Optional[TieredCache] = None
+    ):
+        self.jwks_url = jwks_url
+        self.ttl_seconds = ttl_seconds
+        self.min_refresh_interval = min_refresh_interval
+        self.timeout = timeout
+        # Key set shared between workers, so each doesn't fetch it from Auth0
+        self.shared = shared
+
+        self._keys: Dict[str, Key] = {}
+        self._expires_at = 0.0
+        self._last_fetch: Optional[float] = None
+        self._inflight: Optional[asyncio.Future] = None
+        self._client: Optional[httpx.AsyncClient] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.fetches = 0
+        self.fetch_errors = 0
+
+    async def get_key(self, kid: Optional[str]) -> Optional[Key]:
+        """Return the parsed RSA key for kid, refreshing the key set when needed"""
+        now = time.monotonic()
+
+        if now >= self._expires_at:
+            self.misses += 1
+            await self._refresh()
+        elif kid not in self._keys:
+            self.misses += 1
+            # An unknown kid usually means Auth0 rotated its signing keys, but
+            # a client sending garbage kids must not turn into a fetch per request
+            if self._last_fetch is None or now - self._last_fetch >= self.min_refresh_interval:
+                await self._refresh(kid)
+        else:
+            self.hits += 1
+
+        return self._keys.get(kid) if kid else None
+
+    async def _refresh(self, kid: Optional[str] = None) -> None:
+        """Fetch the key set, sharing one in-flight fetch between concurrent callers
+
+        kid is set when refreshing for an unknown kid; a shared key set
+        without it is then skipped in favour of Auth0.
+        """
+        if self._inflight is None:
+            self._inflight = asyncio.ensure_future(self._fetch(kid))
+            self._inflight.add_done_callback(self._clear_inflight)
+        # Shield so a cancelled request doesn't abort the fetch for everyone else
+        await asyncio.shield(self._inflight)
+
+    async def ready(self) -> bool:
+        """Whether signing keys are loaded, fetching them if the cache has expired"""
+        if time.monotonic() >= self._expires_at:
+            await self._refresh()
+        return bool(self._keys)
+
+    def _clear_inflight(self, _future: asyncio.Future) -> None:
+        self._inflight = None
+
+    @timed("jwks_fetch")
+    async def _fetch(self, kid: Optional[str] = None) -> None:
+        self._last_fetch = time.monotonic()
+
+        try:
+            jwks = None
+            if self.shared is not None:
+                jwks = await self.shared.get_or_load(
+                    "jwks", lambda _stale: self._download(), ttl=self.ttl_seconds
+                )
+                if kid is not None and not any(key.get("kid") == kid for key in jwks.get("keys", [])):
+                    jwks = None
+            if jwks is None:
+                jwks = await self._download()
+                if self.shared is not None:
+                    await self.shared.set("jwks", jwks, ttl=self.ttl_seconds)
+            keys = self._parse_keys(jwks)
+        except Exception as e:
+            self.fetch_errors += 1
+            if not self._keys:
+                raise
+            # Keep serving the last known keys instead of failing every request
+            logger.warning(f"JWKS refresh failed, serving stale keys: {e}")
+            self._expires_at = time.monotonic() + self.min_refresh_interval
+            return
+
+        self._keys = keys
+        self._expires_at = time.monotonic() + self.ttl_seconds
+
+    async def _download(self) -> Dict[str, Any]:
+        self.fetches += 1
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+        response = await self._client.get(self.jwks_url)
+        response.raise_for_status()
+        return loads(response.content)
+
+    def _parse_keys(self, jwks: Dict[str, Any]) -> Dict[str, Key]:
+        """Parse RSA signing keys once so verification doesn't rebuild them per request"""
+        keys = {}
+        for key in jwks.get("keys", []):
+            if key.get("kty") != "RSA" or "kid" not in key or key.get("use", "sig") != "sig":
+                continue
+            keys[key["kid"]] = jwk.construct(
+                {
+                    "kty": key["kty"],
+                    "kid": key["kid"],
+                    "use": key.get("use", "sig"),
+                    "n": key["n"],
+                    "e": key["e"]
+                },
+                algorithm="RS256"
+            )
+        return keys
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache counters for monitoring"""
+        return {
+            "keys": len(self._keys),
+            "hits": self.hits,
+            "misses": self.misses,
+            "fetches": self.fetches,
+            "fetchErrors": self.fetch_errors
+        }
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+jwks_store = JWKSKeyStore(
+    settings.auth0_jwks_url or f"https://{settings.auth0_domain}/.well-known/jwks.json",
+    ttl_seconds=settings.jwks_cache_ttl_seconds,
+    min_refresh_interval=settings.jwks_refresh_min_interval_seconds,
+    shared=create_tiered_cache("jwks", l1=LRUCache(max_entries=1))
+)
+
+# Verified claims keyed by sha256(token), each entry expiring at the token's exp
+verified_tokens = LRUCache(max_entries=settings.verified_token_cache_size)
+
+# RS256 verification is CPU-bound; keep it off the event loop
+_verify_executor = ThreadPoolExecutor(
+    max_workers=settings.jwt_verify_workers,
+    thread_name_prefix="jwt-verify"
+)
+
 async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Verify Auth0 JWT token"""
-    token = credentials.credentials
-    
+    with span("auth"):
+        return await _verify(credentials.credentials)
+
+def require_scope(scope: str) -> Callable[..., Awaitable[Dict[str, Any]]]:
+    """verify_token plus a check that the token grants scope
+
+    Auth0 puts scopes in the space-separated "scope" claim and RBAC
+    permissions in "permissions"; either one is accepted.
+    """
+    async def dependency(token_data: dict = Depends(verify_token)) -> Dict[str, Any]:
+        granted = set((token_data.get("scope") or "").split()) | set(token_data.get("permissions") or [])
+        if scope not in granted:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=f"Token lacks the {scope} scope"
+            )
+        return token_data
+
+    return dependency
+
+async def _verify(token: str) -> Dict[str, Any]:
+    cache_key = hashlib.sha256(token.encode()).digest()
+    cached = verified_tokens.get(cache_key)
+    if cached is not None:
+        return cached
+
     try:
-        # Get JWKS from Auth0
-        jwks_url = f"https://{settings.auth0_domain}/.well-known/jwks.json"
-        async with httpx.AsyncClient() as client:
-            jwks_response = await client.get(jwks_url)
-            jwks = jwks_response.json()
-        
         # Decode and verify token
         unverified_header = jwt.get_unverified_header(token)
-        rsa_key = {}
-        for key in jwks["keys"]:
-            if key["kid"] == unverified_header["kid"]:
-                rsa_key = {
-                    "kty": key["kty"],
-                    "kid": key["kid"],
-                    "use": key["use"],
-                    "n": key["n"],
-                    "e": key["e"]
-                }
-        
+
+        try:
+            rsa_key = await jwks_store.get_key(unverified_header.get("kid"))
+        except Exception:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Unable to fetch signing keys"
+            )
+
         if rsa_key:
-            payload = jwt.decode(
-                token,
-                rsa_key,
-                algorithms=["RS256"],
-                audience=settings.auth0_audience,
-                issuer=settings.auth0_issuer,
+            payload = await asyncio.get_running_loop().run_in_executor(
+                _verify_executor,
+                partial(
+                    jwt.decode,
+                    token,
+                    rsa_key,
+                    algorithms=["RS256"],
+                    audience=settings.auth0_audience,
+                    issuer=settings.auth0_issuer,
+                )
             )
+            if isinstance(payload.get("exp"), (int, float)):
+                verified_tokens.set(cache_key, payload, expires_at=payload["exp"])
             return payload
         else:
             raise HTTPException(
@@ -48,4 +239,61 @@ async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(secur
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid authentication credentials"
-        )
\ No newline at end of file
+        )
+
+async def verify_webhook_signature(request: Request) -> None:
+    """Authenticate an internal webhook call by its HMAC-SHA256 signature
+
+    The backend signs "<timestamp>.<raw body>" with the shared webhook secret
+    and sends X-Webhook-Timestamp and X-Webhook-Signature: sha256=<hex>.
+    """
+    if not settings.webhook_secret:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Webhooks are not configured"
+        )
+
+    timestamp = request.headers.get("X-Webhook-Timestamp", "")
+    signature = request.headers.get("X-Webhook-Signature", "")
+    try:
+        age = abs(time.time() - int(timestamp))
+    except ValueError:
+        age = None
+    if age is None or age > settings.webhook_tolerance_seconds:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Missing or expired webhook timestamp"
+        )
+
+    body = await request.body()
+    expected = hmac.new(
+        settings.webhook_secret.encode(),
+        timestamp.encode() + b"." + body,
+        hashlib.sha256
+    ).hexdigest()
+    if not hmac.compare_digest(signature.removeprefix("sha256="), expected):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid webhook signature"
+        )
+
+def has_internal_token(request: Request) -> bool:
+    """Whether the request carries settings.internal_token as its bearer token"""
+    if not settings.internal_token:
+        return False
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    return scheme.lower() == "bearer" and hmac.compare_digest(token.encode(), settings.internal_token.encode())
+
+async def verify_internal_token(request: Request) -> None:
+    """Authenticate a metrics or diagnostics call (Prometheus, operators) by the internal token"""
+    if not settings.internal_token:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Internal endpoints are not configured"
+        )
+    if not has_internal_token(request):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid internal token",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
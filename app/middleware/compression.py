@@ -0,0 +1,20 @@
+from typing import Any, Callable, Dict, Iterable
+from starlette.middleware.gzip import GZipMiddleware
+
+class SelectiveGZipMiddleware:
+    """GZip for responses of the given paths only
+
+    Limited to endpoints with large JSON bodies so server-sent event and
+    NDJSON streams are never held back by the compressor.
+    """
+
+    def __init__(self, app: Callable, paths: Iterable[str], minimum_size: int = 1024, compresslevel: int = 6):
+        self.app = app
+        self.paths = frozenset(paths)
+        self.gzip = GZipMiddleware(app, minimum_size=minimum_size, compresslevel=compresslevel)
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] == "http" and scope["path"] in self.paths:
+            await self.gzip(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
@@ -0,0 +1,56 @@
+from typing import Any, Callable, Dict
+from app.config import settings
+from app.utils.metrics import request_duration, request_timings
+import time
+
+class MetricsMiddleware:
+    """Records request latency by route and adds a Server-Timing header
+
+    Plain ASGI rather than BaseHTTPMiddleware so streamed responses (SSE,
+    NDJSON) pass through untouched. Stage spans recorded while the request
+    runs (app.utils.metrics.span) are summed per stage into Server-Timing
+    when settings.server_timing_enabled is on; for streamed responses the
+    header only covers the stages finished before the first byte.
+    """
+
+    def __init__(self, app: Callable):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings: Dict[str, float] = {}
+        token = request_timings.set(timings)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message: Dict[str, Any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if settings.server_timing_enabled:
+                    message["headers"] = [
+                        *message.get("headers", []),
+                        (b"server-timing", _server_timing(timings, time.perf_counter() - start))
+                    ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            request_timings.reset(token)
+            # Route templates keep label cardinality bounded
+            route = scope.get("route")
+            request_duration.observe(
+                time.perf_counter() - start,
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                str(status)
+            )
+
+def _server_timing(timings: Dict[str, float], total: float) -> bytes:
+    entries = [f"{stage};dur={elapsed * 1000:.1f}" for stage, elapsed in timings.items()]
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries).encode("latin-1")
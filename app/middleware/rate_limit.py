@@ -0,0 +1,236 @@
+from abc import ABC, abstractmethod
+from fastapi import HTTPException, Depends, status
+from typing import Any, Dict, Optional, Tuple
+from app.config import settings
+from app.middleware.auth import verify_token
+from app.services.llm_service import llm_usage_recorder
+from app.utils.cache import LRUCache
+import logging
+import math
+import time
+
+logger = logging.getLogger(__name__)
+
+class RateLimitBackend(ABC):
+    """Storage for token buckets and LLM usage windows"""
+
+    @abstractmethod
+    async def consume(self, key: str, rate: float, capacity: float, cost: float = 1.0) -> float:
+        """Take cost tokens from the bucket; 0 when allowed, else seconds until it would be
+
+        A negative cost gives tokens back, up to capacity.
+        """
+
+    @abstractmethod
+    async def add_usage(self, key: str, amount: int, window_seconds: int) -> None:
+        ...
+
+    @abstractmethod
+    async def get_usage(self, key: str, window_seconds: int) -> int:
+        ...
+
+    async def ping(self) -> None:
+        """Raise if the store is unreachable"""
+        pass
+
+    async def aclose(self) -> None:
+        pass
+
+class InMemoryRateLimitBackend(RateLimitBackend):
+    """Per-worker buckets; limits are multiplied by the number of workers"""
+
+    def __init__(self, max_keys: int = 100000):
+        # A bucket that has been idle long enough to refill is the same as a
+        # missing one, so an LRU bound loses nothing
+        self._buckets = LRUCache(max_entries=max_keys)
+        self._usage = LRUCache(max_entries=max_keys)
+
+    async def consume(self, key: str, rate: float, capacity: float, cost: float = 1.0) -> float:
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key) or (capacity, now)
+        tokens = min(capacity, tokens + (now - updated) * rate)
+
+        wait = 0.0
+        if tokens >= cost:
+            tokens = min(capacity, tokens - cost)
+        else:
+            wait = (cost - tokens) / rate
+        self._buckets.set(key, (tokens, now), ttl=capacity / rate)
+        return wait
+
+    async def add_usage(self, key: str, amount: int, window_seconds: int) -> None:
+        window_key = _window_key(key, window_seconds)
+        used = self._usage.get(window_key, 0)
+        self._usage.set(window_key, used + amount, ttl=window_seconds)
+
+    async def get_usage(self, key: str, window_seconds: int) -> int:
+        return self._usage.get(_window_key(key, window_seconds), 0)
+
+_TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+
+local wait = 0
+if tokens >= cost then
+    tokens = math.min(capacity, tokens - cost)
+else
+    wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000))
+return tostring(wait)
+"""
+
+class RedisRateLimitBackend(RateLimitBackend):
+    """Buckets shared by every worker, updated atomically with a Lua script"""
+
+    def __init__(self, redis_url: str, namespace: str = "ratelimit"):
+        import redis.asyncio as redis
+
+        self.namespace = namespace
+        self._redis = redis.from_url(redis_url)
+        self._consume = self._redis.register_script(_TOKEN_BUCKET_SCRIPT)
+
+    async def consume(self, key: str, rate: float, capacity: float, cost: float = 1.0) -> float:
+        wait = await self._consume(keys=[f"{self.namespace}:bucket:{key}"], args=[rate, capacity, cost])
+        return float(wait)
+
+    async def add_usage(self, key: str, amount: int, window_seconds: int) -> None:
+        window_key = f"{self.namespace}:usage:{_window_key(key, window_seconds)}"
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.incrby(window_key, amount)
+            pipe.expire(window_key, window_seconds)
+            await pipe.execute()
+
+    async def get_usage(self, key: str, window_seconds: int) -> int:
+        used = await self._redis.get(f"{self.namespace}:usage:{_window_key(key, window_seconds)}")
+        return int(used or 0)
+
+    async def ping(self) -> None:
+        await self._redis.ping()
+
+    async def aclose(self) -> None:
+        await self._redis.aclose()
+
+def _window_key(key: str, window_seconds: int) -> str:
+    return f"{key}:{int(time.time() // window_seconds)}"
+
+def _window_reset(window_seconds: int) -> float:
+    """Seconds until the current fixed usage window ends"""
+    now = time.time()
+    return (now // window_seconds + 1) * window_seconds - now
+
+class RateLimiter:
+    """Per-user and global request buckets plus a per-user LLM token budget"""
+
+    def __init__(self, backend: RateLimitBackend):
+        self.backend = backend
+        self.user_capacity = settings.max_requests_per_minute
+        self.global_capacity = settings.global_max_requests_per_minute
+        self.token_budget = settings.llm_token_budget_per_user
+        self.budget_window = settings.llm_token_budget_window_seconds
+
+        self.allowed = 0
+        self.limited: Dict[str, int] = {"user": 0, "global": 0, "budget": 0}
+
+    async def check(self, user_id: str) -> Optional[Tuple[str, float]]:
+        """None when the request may proceed, else (reason, retry-after seconds)"""
+        if self.token_budget > 0:
+            used = await self.backend.get_usage(f"llm:{user_id}", self.budget_window)
+            if used >= self.token_budget:
+                return self._limit("budget", _window_reset(self.budget_window))
+
+        if self.user_capacity > 0:
+            wait = await self.backend.consume(
+                f"user:{user_id}", self.user_capacity / 60, self.user_capacity
+            )
+            if wait > 0:
+                return self._limit("user", wait)
+
+        if self.global_capacity > 0:
+            wait = await self.backend.consume("global", self.global_capacity / 60, self.global_capacity)
+            if wait > 0:
+                if self.user_capacity > 0:
+                    # The request isn't served, so it shouldn't count against the user
+                    await self.backend.consume(
+                        f"user:{user_id}", self.user_capacity / 60, self.user_capacity, cost=-1.0
+                    )
+                return self._limit("global", wait)
+
+        self.allowed += 1
+        return None
+
+    def _limit(self, reason: str, retry_after: float) -> Tuple[str, float]:
+        self.limited[reason] += 1
+        return reason, retry_after
+
+    async def check_budget(self, user_id: str, tokens: int) -> Optional[float]:
+        """None if tokens fit in what is left of the user's LLM budget, else seconds until it resets"""
+        if self.token_budget <= 0:
+            return None
+        used = await self.backend.get_usage(f"llm:{user_id}", self.budget_window)
+        if used + tokens > self.token_budget:
+            self.limited["budget"] += 1
+            return _window_reset(self.budget_window)
+        return None
+
+    async def record_llm_usage(self, user_id: str, tokens: int) -> None:
+        """Charge provider-reported tokens against the user's budget"""
+        if self.token_budget > 0 and tokens:
+            await self.backend.add_usage(f"llm:{user_id}", tokens, self.budget_window)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"allowed": self.allowed, "limited": dict(self.limited)}
+
+def create_rate_limit_backend() -> RateLimitBackend:
+    if settings.enable_redis and settings.redis_url:
+        return RedisRateLimitBackend(settings.redis_url)
+    return InMemoryRateLimitBackend()
+
+rate_limiter = RateLimiter(create_rate_limit_backend())
+
+_LIMIT_MESSAGES = {
+    "user": "Too many requests",
+    "global": "Service is busy, try again shortly",
+    "budget": "LLM usage budget exhausted"
+}
+
+async def rate_limited_user(token_data: dict = Depends(verify_token)) -> dict:
+    """verify_token plus request rate limits and the LLM token budget"""
+    await enforce_rate_limits(token_data.get("sub"))
+    return token_data
+
+async def enforce_rate_limits(user_id: str) -> None:
+    """Raise 429 if user_id is over a limit, else charge the LLM usage that follows to it
+
+    The usage recorder is a context var, so it covers the rest of the
+    current request or task.
+    """
+    try:
+        limited = await rate_limiter.check(user_id)
+    except Exception as e:
+        # Fail open: an unreachable limiter backend shouldn't take the API down
+        logger.warning(f"Rate limiter unavailable: {e}")
+        limited = None
+
+    if limited:
+        reason, retry_after = limited
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=_LIMIT_MESSAGES[reason],
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+        )
+
+    async def record(tokens: int) -> None:
+        await rate_limiter.record_llm_usage(user_id, tokens)
+
+    # LLMService reports provider usage for this request through the context var
+    llm_usage_recorder.set(record)
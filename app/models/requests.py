@@ -54,4 +54,17 @@ class RoadmapAssistResponse(BaseModel):
     relatedNotes: List[int]
 
 class NoteAssistResponse(BaseModel):
-    suggestions: Dict[str, Any]
\ No newline at end of file
+    suggestions: Dict[str, Any]
+
+
+class ChangeEvent(BaseModel):
+    entity: str  # "note" | "roadmap" | "step"
+    action: str  # "created" | "updated" | "deleted"
+    userId: int
+    id: int
+
+class ChangeEventBatch(BaseModel):
+    events: List[ChangeEvent]
+
+class DailyGoalsBatchRequest(BaseModel):
+    userIds: List[int]
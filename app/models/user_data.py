@@ -0,0 +1,120 @@
+# user_data.py
+import hashlib
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+from app.utils.text_processing import DocumentRanker, parse_timestamp
+
+class UserContext:
+    """A user's study data with the derived views the recommendation code needs
+
+    Built once per fetch (or delta merge) from the GraphQL response. Notes
+    and roadmaps stay the raw GraphQL dicts; the indexes refer to notes by
+    position in notes.
+    """
+
+    __slots__ = (
+        "notes",
+        "roadmaps",
+        "desktops",
+        "note_positions",
+        "note_activity",
+        "notes_by_activity",
+        "tag_index",
+        "incomplete_steps",
+        "stats",
+        "_ranker",
+        "_version"
+    )
+
+    def __init__(
+        self,
+        notes: List[Dict[str, Any]],
+        roadmaps: List[Dict[str, Any]],
+        desktops: Optional[List[Dict[str, Any]]] = None
+    ):
+        self.notes = notes
+        self.roadmaps = roadmaps
+        self.desktops = desktops or []
+
+        self.note_positions: Dict[int, int] = {}
+        # Epoch seconds of each note's last edit (updatedAt, else createdAt)
+        self.note_activity = array("d")
+        self.tag_index: Dict[str, List[int]] = {}
+        for position, note in enumerate(notes):
+            self.note_positions[note["id"]] = position
+            self.note_activity.append(parse_timestamp(note.get("updatedAt") or note.get("createdAt")))
+            for tag in note.get("tags", []):
+                self.tag_index.setdefault(tag["tag"]["name"], []).append(position)
+
+        # Most recently edited first
+        self.notes_by_activity = sorted(
+            range(len(notes)), key=self.note_activity.__getitem__, reverse=True
+        )
+
+        # (roadmap, its incomplete steps by order) for roadmaps with any left,
+        # most recently active roadmap first
+        self.incomplete_steps: List[Tuple[Dict[str, Any], List[Dict[str, Any]]]] = []
+        total_steps = 0
+        completed_steps = 0
+        for roadmap in sorted(
+            roadmaps,
+            key=lambda r: parse_timestamp(r.get("updatedAt") or r.get("createdAt")),
+            reverse=True
+        ):
+            steps = roadmap.get("steps", [])
+            incomplete = [s for s in steps if not s.get("isCompleted", False)]
+            total_steps += len(steps)
+            completed_steps += len(steps) - len(incomplete)
+            if incomplete:
+                incomplete.sort(key=lambda s: s.get("order", 0))
+                self.incomplete_steps.append((roadmap, incomplete))
+
+        self.stats = {
+            "totalNotes": len(notes),
+            "totalRoadmaps": len(roadmaps),
+            "totalSteps": total_steps,
+            "completedSteps": completed_steps,
+            "completionRate": completed_steps / total_steps if total_steps > 0 else 0
+        }
+
+        self._ranker: Optional[DocumentRanker] = None
+        self._version: Optional[str] = None
+
+    @classmethod
+    def from_graphql(cls, data: Dict[str, Any]) -> "UserContext":
+        return cls(data.get("notes") or [], data.get("roadmaps") or [], data.get("desktops"))
+
+    @property
+    def version(self) -> str:
+        """Digest of note and roadmap identities, edit times and step completion"""
+        if self._version is None:
+            digest = hashlib.blake2b(digest_size=16)
+            for note in self.notes:
+                digest.update(f"n{note['id']}:{note.get('updatedAt')}|".encode())
+            for roadmap in self.roadmaps:
+                digest.update(f"r{roadmap['id']}:{roadmap.get('updatedAt')}|".encode())
+                for step in roadmap.get("steps", []):
+                    digest.update(f"s{step['id']}:{step.get('isCompleted')}|".encode())
+            self._version = digest.hexdigest()
+        return self._version
+
+    @property
+    def ranker(self) -> DocumentRanker:
+        """BM25/recency ranker over title, tags and content, built on first use"""
+        if self._ranker is None:
+            self._ranker = DocumentRanker(
+                [
+                    " ".join([n.get("title") or "", *self.note_tags(n), n.get("content") or ""])
+                    for n in self.notes
+                ],
+                self.note_activity
+            )
+        return self._ranker
+
+    @staticmethod
+    def note_tags(note: Dict[str, Any]) -> List[str]:
+        return [t["tag"]["name"] for t in note.get("tags", [])]
+
+    def note(self, note_id: int) -> Optional[Dict[str, Any]]:
+        position = self.note_positions.get(note_id)
+        return self.notes[position] if position is not None else None
@@ -0,0 +1,5 @@
+from fastapi import APIRouter
+
+# No routes yet: user statistics need an ownership check (token subject to
+# userId) before they can be served for a path user id
+router = APIRouter()
@@ -1,35 +1,108 @@
-from fastapi import APIRouter, Depends, HTTPException
-from app.middleware.auth import verify_token
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+from fastapi.responses import StreamingResponse
+from typing import Any, AsyncIterator, Dict, List, Optional
+from app.config import settings
+from app.dependencies import get_recommendation_service
+from app.middleware.auth import require_scope
+from app.middleware.rate_limit import enforce_rate_limits, rate_limited_user
+from app.services.active_users import active_users
 from app.services.recommendation_service import RecommendationService
-from app.models.requests import DailyGoalsRequest
+from app.models.requests import DailyGoalsBatchRequest, DailyGoalsRequest
 from app.models.responses import DailyGoalsResponse
+from app.utils.ndjson import NDJSON_MEDIA_TYPE, ndjson_stream
 
 router = APIRouter()
-recommendation_service = RecommendationService()
 
-@router.post("/goals/daily", response_model=DailyGoalsResponse)
+def daily_goals_response(goals: List[Dict[str, Any]]) -> DailyGoalsResponse:
+    total_time = sum(g.get("estimatedTime", 0) for g in goals)
+
+    return DailyGoalsResponse(
+        goals=goals,
+        summary={
+            "totalGoals": len(goals),
+            "estimatedTotalTime": total_time
+        }
+    )
+
+@router.post(
+    "/goals/daily",
+    response_model=DailyGoalsResponse,
+    responses={304: {"description": "The goals named by If-None-Match are still current"}}
+)
 async def get_daily_goals(
     request: DailyGoalsRequest,
-    token_data: dict = Depends(verify_token)
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    token_data: dict = Depends(rate_limited_user),
+    recommendation_service: RecommendationService = Depends(get_recommendation_service)
 ):
-    """Get daily study goals for user"""
+    """Get daily study goals for user
+
+    The response carries an ETag; sending it back as If-None-Match gets an
+    empty 304 while the user's notes, roadmaps and the day are unchanged.
+    """
     try:
         user_id = request.userId
         auth_token = token_data.get("sub")  # Extract from token
-        
-        goals = await recommendation_service.generate_daily_goals(
+
+        etag, goals = await recommendation_service.daily_goals_if_changed(
             user_id,
-            auth_token
-        )
-        
-        total_time = sum(g.get("estimatedTime", 0) for g in goals)
-        
-        return DailyGoalsResponse(
-            goals=goals,
-            summary={
-                "totalGoals": len(goals),
-                "estimatedTotalTime": total_time
-            }
+            auth_token,
+            if_none_match
         )
+        # Recorded once the backend has accepted the token for this user
+        await active_users.add(user_id, auth_token)
+
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if goals is None:
+            return Response(status_code=304, headers=headers)
+        response.headers.update(headers)
+        return daily_goals_response(goals)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/goals/daily/batch")
+async def get_daily_goals_batch(
+    request: DailyGoalsBatchRequest,
+    token_data: dict = Depends(require_scope(settings.goals_batch_scope)),
+    recommendation_service: RecommendationService = Depends(get_recommendation_service)
+):
+    """Daily goals for many users, streamed as NDJSON records in completion order
+
+    For internal services: the token must grant settings.goals_batch_scope.
+    Each line is {"userId", "status": "ok", "result": DailyGoalsResponse} or
+    {"userId", "status": "error", "error"}; a failed or rate-limited user
+    doesn't fail the batch.
+    """
+    if len(request.userIds) > settings.goals_batch_max_users:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.goals_batch_max_users} users per batch"
+        )
+
+    auth_token = settings.nestjs_service_token or token_data.get("sub")
+
+    async def admit(user_id: int) -> None:
+        # Each target user's requests and LLM tokens count against that user.
+        # The batch doesn't carry their token subjects, so these keys are by id
+        await enforce_rate_limits(f"user-id:{user_id}")
+
+    async def records() -> AsyncIterator[Dict[str, Any]]:
+        async for user_id, goals, error in recommendation_service.generate_daily_goals_batch(
+            request.userIds,
+            auth_token,
+            concurrency=settings.goals_batch_concurrency,
+            admit=admit
+        ):
+            if error is None:
+                try:
+                    result = daily_goals_response(goals)
+                except Exception as e:
+                    error = e
+
+            if error is None:
+                yield {"userId": user_id, "status": "ok", "result": result.model_dump()}
+            else:
+                yield {"userId": user_id, "status": "error", "error": str(error)}
+
+    return StreamingResponse(ndjson_stream(records()), media_type=NDJSON_MEDIA_TYPE)
@@ -0,0 +1,131 @@
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import PlainTextResponse
+from typing import Any, Awaitable, Dict
+from app.config import settings
+from app.dependencies import get_backend_client
+from app.middleware.auth import has_internal_token, jwks_store, verify_internal_token
+from app.middleware.rate_limit import rate_limiter
+from app.services.database_service import context_sync_stats, shared_user_contexts, user_context_cache
+from app.services.embedding_service import embedding_service
+from app.services.goals_scheduler import goals_scheduler
+from app.services.invalidation import change_events
+from app.services.recommendation_service import daily_goals_cache, shared_daily_goals
+from app.services.roadmap_templates import roadmap_templates
+from app.services.llm_cache import llm_response_cache
+from app.services.llm_router import get_llm_router
+from app.utils.cache import LRUCache, SingleFlight
+from app.utils.fast_json import FastJSONResponse
+from app.utils.metrics import render_metrics
+import asyncio
+import time
+
+router = APIRouter()
+
+# Everything but the probes exposes internals, so it needs settings.internal_token
+internal = [Depends(verify_internal_token)]
+
+# The readiness probe is unauthenticated; concurrent and repeated calls share
+# one round of dependency checks instead of each making outbound calls
+_readiness = LRUCache(max_entries=1, default_ttl=settings.readiness_cache_seconds)
+_readiness_checks = SingleFlight()
+
+@router.get("/health")
+async def health_check():
+    """Liveness probe"""
+    return {"status": "healthy"}
+
+@router.get("/health/ready")
+async def readiness_check(request: Request):
+    """Readiness probe, 503 if any dependency check fails
+
+    The checks, pool and cache stats are only included for callers with the
+    internal token; probes get the status alone. Check results are reused for
+    settings.readiness_cache_seconds.
+    """
+    checks = _readiness.get("checks")
+    if checks is None:
+        checks = await _readiness_checks.do("checks", _run_checks)
+        _readiness.set("checks", checks)
+    ready = all(c["ok"] for c in checks.values())
+    content = {"status": "ready" if ready else "unavailable"}
+    if has_internal_token(request):
+        content.update({
+            "checks": checks,
+            "pool": get_backend_client().stats(),
+            "caches": await cache_stats()
+        })
+    return FastJSONResponse(status_code=200 if ready else 503, content=content)
+
+async def _run_checks() -> Dict[str, Dict[str, Any]]:
+    return dict(zip(
+        ("auth", "backend", "llmCache", "rateLimits", "llm"),
+        await asyncio.gather(
+            _check(_check_signing_keys()),
+            _check(_check_backend()),
+            _check(llm_response_cache.backend.ping()),
+            _check(rate_limiter.backend.ping()),
+            _check(_check_llm_providers())
+        )
+    ))
+
+async def _check(check: Awaitable[None]) -> Dict[str, Any]:
+    start = time.perf_counter()
+    try:
+        await asyncio.wait_for(check, settings.readiness_timeout_seconds)
+    except Exception as e:
+        result = {"ok": False, "error": str(e) or type(e).__name__}
+    else:
+        result = {"ok": True}
+    result["latencyMs"] = round(1000 * (time.perf_counter() - start), 1)
+    return result
+
+async def _check_signing_keys() -> None:
+    if not await jwks_store.ready():
+        raise RuntimeError("No JWKS signing keys")
+
+async def _check_backend() -> None:
+    response = await get_backend_client().get(settings.nestjs_api_url)
+    if response.status_code >= 500:
+        raise RuntimeError(f"NestJS returned {response.status_code}")
+
+async def _check_llm_providers() -> None:
+    if not any(route.breaker.available() for route in get_llm_router().routes):
+        raise RuntimeError("Every LLM provider circuit is open")
+
+@router.get("/metrics", response_class=PlainTextResponse, dependencies=internal)
+async def metrics():
+    """Stage and request latency histograms in the Prometheus text format"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@router.get("/health/pool", dependencies=internal)
+async def pool_stats():
+    """Connection pool saturation and wait times for the NestJS client"""
+    return get_backend_client().stats()
+
+@router.get("/health/caches", dependencies=internal)
+async def cache_stats():
+    """Hit rates of the in-process caches, and of Redis behind them when enabled"""
+    user_context = {**user_context_cache.stats(), "sync": dict(context_sync_stats)}
+    if shared_user_contexts is not None:
+        user_context["shared"] = shared_user_contexts.stats()
+    daily_goals = {**daily_goals_cache.stats(), "precompute": goals_scheduler.stats()}
+    if shared_daily_goals is not None:
+        daily_goals["shared"] = shared_daily_goals.stats()
+    return {
+        "userContext": user_context,
+        "llmResponses": llm_response_cache.stats(),
+        "embeddings": embedding_service.stats(),
+        "changeEvents": change_events.stats(),
+        "dailyGoals": daily_goals,
+        "roadmapTemplates": roadmap_templates.stats()
+    }
+
+@router.get("/health/rate-limits", dependencies=internal)
+async def rate_limit_stats():
+    """Allowed and rejected request counts by limit"""
+    return rate_limiter.stats()
+
+@router.get("/health/llm", dependencies=internal)
+async def llm_routing_stats():
+    """Per-provider latency, circuit state and dispatch queues of outbound LLM calls"""
+    return get_llm_router().stats()
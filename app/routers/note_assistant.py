@@ -0,0 +1,86 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
+from app.config import settings
+from app.middleware.rate_limit import rate_limited_user, rate_limiter
+from app.dependencies import get_recommendation_service
+from app.services.recommendation_service import RecommendationService
+from app.models.requests import NoteAssistRequest
+from app.models.responses import NoteAssistResponse
+from app.utils.sse import SSE_HEADERS, sse_stream
+import logging
+import math
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+async def check_note_size(
+    request: NoteAssistRequest,
+    token_data: dict,
+    recommendation_service: RecommendationService
+) -> None:
+    """Reject notes over the size limits, or whose analysis the user's LLM budget can't cover"""
+    too_large = HTTPException(
+        status_code=413,
+        detail=(
+            f"Notes are limited to {settings.note_content_max_chars} characters "
+            f"and {settings.note_chunk_max_sections} sections"
+        )
+    )
+    if len(request.content) > settings.note_content_max_chars:
+        raise too_large
+    sections, tokens = recommendation_service.estimate_note_analysis(request.content)
+    if sections > settings.note_chunk_max_sections:
+        raise too_large
+
+    try:
+        retry_after = await rate_limiter.check_budget(token_data.get("sub"), tokens)
+    except Exception as e:
+        # Fail open, as rate_limited_user does
+        logger.warning(f"Rate limiter unavailable: {e}")
+        retry_after = None
+    if retry_after is not None:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Not enough LLM usage budget left for this note",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+        )
+
+@router.post("/notes/assist", response_model=NoteAssistResponse)
+async def assist_note(
+    request: NoteAssistRequest,
+    token_data: dict = Depends(rate_limited_user),
+    recommendation_service: RecommendationService = Depends(get_recommendation_service)
+):
+    """Suggest improvements for a note"""
+    await check_note_size(request, token_data, recommendation_service)
+    try:
+        suggestions = await recommendation_service.assist_note_creation(
+            request.userId,
+            request.content,
+            request.title,
+            token_data.get("sub")
+        )
+        return NoteAssistResponse(suggestions=suggestions)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/notes/assist/stream")
+async def stream_note_assist(
+    request: NoteAssistRequest,
+    token_data: dict = Depends(rate_limited_user),
+    recommendation_service: RecommendationService = Depends(get_recommendation_service)
+):
+    """Stream note suggestions as server-sent events, one section at a time"""
+    await check_note_size(request, token_data, recommendation_service)
+    events = recommendation_service.stream_note_assistance(
+        request.userId,
+        request.content,
+        request.title,
+        token_data.get("sub")
+    )
+    return StreamingResponse(
+        sse_stream(events),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
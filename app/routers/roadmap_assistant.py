@@ -0,0 +1,47 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from app.middleware.rate_limit import rate_limited_user
+from app.dependencies import get_recommendation_service
+from app.services.recommendation_service import RecommendationService
+from app.models.requests import RoadmapAssistRequest
+from app.models.responses import RoadmapAssistResponse
+from app.utils.sse import SSE_HEADERS, sse_stream
+
+router = APIRouter()
+
+@router.post("/roadmap/assist", response_model=RoadmapAssistResponse)
+async def assist_roadmap(
+    request: RoadmapAssistRequest,
+    token_data: dict = Depends(rate_limited_user),
+    recommendation_service: RecommendationService = Depends(get_recommendation_service)
+):
+    """Suggest a learning roadmap for a topic"""
+    try:
+        result = await recommendation_service.assist_roadmap_creation(
+            request.userId,
+            request.topic,
+            request.description,
+            token_data.get("sub")
+        )
+        return RoadmapAssistResponse(**result)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/roadmap/assist/stream")
+async def stream_roadmap(
+    request: RoadmapAssistRequest,
+    token_data: dict = Depends(rate_limited_user),
+    recommendation_service: RecommendationService = Depends(get_recommendation_service)
+):
+    """Stream a roadmap suggestion as server-sent events, one step at a time"""
+    events = recommendation_service.stream_roadmap_creation(
+        request.userId,
+        request.topic,
+        request.description,
+        token_data.get("sub")
+    )
+    return StreamingResponse(
+        sse_stream(events),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
@@ -0,0 +1,16 @@
+from fastapi import APIRouter, Depends, status
+from app.middleware.auth import verify_webhook_signature
+from app.models.requests import ChangeEventBatch
+from app.services.invalidation import change_events
+
+router = APIRouter()
+
+@router.post(
+    "/internal/events",
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(verify_webhook_signature)]
+)
+async def receive_change_events(batch: ChangeEventBatch):
+    """Note/roadmap/step change events from the NestJS backend, applied to caches after a debounce"""
+    change_events.submit(batch.events)
+    return {"accepted": len(batch.events)}
@@ -0,0 +1,85 @@
+from typing import Any, Dict, List, Optional, Tuple
+from app.config import settings
+from app.utils.cache import LRUCache
+from app.utils.tiered_cache import get_redis
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+class ActiveUserRegistry:
+    """Users whose daily goals request succeeded recently, with their token subject
+
+    Always kept in a per-worker LRU. With a Redis client the users are also
+    kept in a sorted set by last seen time (subjects in a hash), so the
+    worker elected to pre-compute goals sees the users of every worker.
+    Redis errors are logged and the local copy is used instead.
+    """
+
+    def __init__(
+        self,
+        window_seconds: float,
+        max_users: int,
+        redis: Optional[Any] = None,
+        namespace: str = "active_users"
+    ):
+        self.window_seconds = window_seconds
+        self.max_users = max_users
+        self.local = LRUCache(max_entries=max_users, default_ttl=window_seconds)
+        self._redis = redis
+        self._seen = f"{namespace}:seen"
+        self._subjects = f"{namespace}:subjects"
+
+        self.errors = 0
+
+    async def add(self, user_id: int, subject: str) -> None:
+        self.local.set(user_id, subject)
+        if self._redis is None:
+            return
+        try:
+            async with self._redis.pipeline(transaction=False) as pipe:
+                pipe.zadd(self._seen, {str(user_id): time.time()})
+                pipe.hset(self._subjects, str(user_id), subject)
+                await pipe.execute()
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Recording active user {user_id} in Redis failed: {e}")
+
+    async def items(self) -> List[Tuple[int, str]]:
+        """(user id, subject) of every active user, least recently seen first"""
+        if self._redis is None:
+            return self.local.items()
+        try:
+            await self._prune()
+            user_ids = await self._redis.zrange(self._seen, 0, -1)
+            subjects = await self._redis.hmget(self._subjects, user_ids) if user_ids else []
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Reading active users from Redis failed, using this worker's: {e}")
+            return self.local.items()
+        return [
+            (int(user_id), subject.decode())
+            for user_id, subject in zip(user_ids, subjects)
+            if subject is not None
+        ]
+
+    async def _prune(self) -> None:
+        """Drop users not seen within the window, then the least recent over max_users"""
+        drop = await self._redis.zrangebyscore(self._seen, "-inf", time.time() - self.window_seconds)
+        overflow = await self._redis.zcard(self._seen) - len(drop) - self.max_users
+        if overflow > 0:
+            drop += await self._redis.zrange(self._seen, len(drop), len(drop) + overflow - 1)
+        if drop:
+            async with self._redis.pipeline(transaction=False) as pipe:
+                pipe.zrem(self._seen, *drop)
+                pipe.hdel(self._subjects, *drop)
+                await pipe.execute()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"local": len(self.local), "shared": self._redis is not None, "errors": self.errors}
+
+active_users = ActiveUserRegistry(
+    settings.active_user_window_seconds,
+    settings.active_users_max,
+    redis=get_redis() if settings.enable_redis and settings.redis_url else None
+)
@@ -0,0 +1,185 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Tuple
+from app.config import settings
+
+# Named selections of user data, each covering exactly the fields one caller reads
+PROFILE_FULL = "full"
+PROFILE_STATS = "stats"
+PROFILE_GOALS = "goals"
+PROFILE_NOTE_CONTENT = "note-content"
+# Both assistants read the same note fields, so they share one fetch and one cached snapshot
+PROFILE_ROADMAP_ASSIST = PROFILE_NOTE_CONTENT
+PROFILE_NOTE_ASSIST = PROFILE_NOTE_CONTENT
+
+# Daily goals look at notes edited within this window
+RECENT_NOTES_DAYS = 7
+
+# Incomplete steps per roadmap shown to the daily goals prompt
+NEXT_STEPS_PER_ROADMAP = 5
+
+QUERY_PROFILES: Dict[str, str] = {
+    PROFILE_FULL: """
+        query GetUserStudyContext($userId: Int!) {
+            notes(userId: $userId) {
+                id
+                title
+                content
+                createdAt
+                updatedAt
+                tags {
+                    tag {
+                        id
+                        name
+                    }
+                }
+            }
+            roadmaps(userId: $userId) {
+                id
+                title
+                description
+                createdAt
+                updatedAt
+                steps {
+                    id
+                    title
+                    description
+                    order
+                    isCompleted
+                    createdAt
+                }
+            }
+            desktops(userId: $userId) {
+                id
+                name
+                description
+            }
+        }
+    """,
+    PROFILE_STATS: """
+        query GetUserStats($userId: Int!) {
+            notes(userId: $userId) {
+                id
+            }
+            roadmaps(userId: $userId) {
+                id
+                steps {
+                    id
+                    isCompleted
+                }
+            }
+        }
+    """,
+    # No note content: goals only list note titles by recency
+    PROFILE_GOALS: """
+        query GetUserGoalsContext($userId: Int!) {
+            notes(userId: $userId) {
+                id
+                title
+                createdAt
+                updatedAt
+            }
+            roadmaps(userId: $userId) {
+                id
+                title
+                createdAt
+                updatedAt
+                steps {
+                    id
+                    title
+                    order
+                    isCompleted
+                }
+            }
+        }
+    """,
+    # Content is needed for relevance ranking and related-note embeddings
+    PROFILE_NOTE_CONTENT: """
+        query GetUserNoteContentContext($userId: Int!) {
+            notes(userId: $userId) {
+                id
+                title
+                content
+                createdAt
+                updatedAt
+                tags {
+                    tag {
+                        name
+                    }
+                }
+            }
+        }
+    """
+}
+
+# Variants that let the backend apply limits and filters
+# (settings.graphql_server_filters). Counts over the filtered lists are not
+# totals, so callers needing stats fetch PROFILE_STATS alongside.
+FILTERED_QUERY_PROFILES: Dict[str, str] = {
+    PROFILE_GOALS: """
+        query GetUserGoalsContext($userId: Int!, $updatedSince: DateTime!, $stepsPerRoadmap: Int!) {
+            notes(userId: $userId, updatedSince: $updatedSince) {
+                id
+                title
+                createdAt
+                updatedAt
+            }
+            roadmaps(userId: $userId) {
+                id
+                title
+                createdAt
+                updatedAt
+                steps(isCompleted: false, take: $stepsPerRoadmap) {
+                    id
+                    title
+                    order
+                    isCompleted
+                }
+            }
+        }
+    """
+}
+
+# Root lists that carry updatedAt and can be fetched incrementally
+DELTA_COLLECTIONS = ("notes", "roadmaps")
+
+# Profiles reading step completion, which can change without a roadmap's
+# updatedAt and so is only picked up by a full fetch
+STEP_PROFILES = (PROFILE_FULL, PROFILE_STATS, PROFILE_GOALS)
+
+def is_filtered(profile: str) -> bool:
+    """Whether the backend trims this profile's lists, so they aren't complete"""
+    return settings.graphql_server_filters and profile in FILTERED_QUERY_PROFILES
+
+def delta_query(query: str) -> str:
+    """Restrict a profile query's notes and roadmaps to those updated since $updatedSince"""
+    query = query.replace("($userId: Int!)", "($userId: Int!, $updatedSince: DateTime!)", 1)
+    for collection in DELTA_COLLECTIONS:
+        query = query.replace(
+            f"{collection}(userId: $userId)",
+            f"{collection}(userId: $userId, updatedSince: $updatedSince)"
+        )
+    return query
+
+def profile_query(
+    profile: str,
+    user_id: int,
+    updated_since: Optional[str] = None
+) -> Tuple[str, Dict[str, Any]]:
+    """GraphQL query and variables for a profile, or its delta since updated_since"""
+    if profile not in QUERY_PROFILES:
+        raise ValueError(f"Unknown query profile: {profile}")
+
+    if updated_since is not None:
+        if is_filtered(profile):
+            raise ValueError(f"Query profile {profile} is server-filtered and has no delta form")
+        return delta_query(QUERY_PROFILES[profile]), {"userId": user_id, "updatedSince": updated_since}
+
+    if not is_filtered(profile):
+        return QUERY_PROFILES[profile], {"userId": user_id}
+
+    since = datetime.now(timezone.utc) - timedelta(days=RECENT_NOTES_DAYS)
+    return FILTERED_QUERY_PROFILES[profile], {
+        "userId": user_id,
+        "updatedSince": since.isoformat(),
+        "stepsPerRoadmap": NEXT_STEPS_PER_ROADMAP
+    }
@@ -0,0 +1,117 @@
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+from app.models.user_data import UserContext
+from app.services.context_queries import DELTA_COLLECTIONS
+from app.utils.fast_json import dumps
+from app.utils.metrics import timed
+from app.utils.text_processing import parse_timestamp
+
+class ContextSnapshot:
+    """Last synced user context for one query profile, updated in place from deltas
+
+    Notes and roadmaps are kept by id with the newest updatedAt seen as a
+    high-water mark; a delta fetch returns only entities updated since then
+    and replaces them by id. Deletions, and step changes that don't touch
+    their roadmap's updatedAt, only show up on the next full sync.
+
+    principal identifies the credentials the data was fetched with; the
+    backend authorized them, so only they may be served from the snapshot.
+    """
+
+    def __init__(self, data: Dict[str, Any], size: int, fetched_at: float, principal: str = ""):
+        self.principal = principal
+        self.collections: Dict[str, Dict[Any, Dict[str, Any]]] = {}
+        self.other: Dict[str, Any] = {}
+        self.size = size
+        self.full_synced_at = fetched_at
+        self.fetched_at = fetched_at
+        self.deltas = 0
+
+        self._high_water = 0.0
+        # Profiles that don't select updatedAt (e.g. stats) can't be synced incrementally
+        self.incremental = True
+
+        self._apply(data)
+        self.context = self._materialize()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Plain data for the shared cache, read back by from_dict"""
+        return {
+            "principal": self.principal,
+            "collections": {field: list(items.values()) for field, items in self.collections.items()},
+            "other": self.other,
+            "size": self.size,
+            "fullSyncedAt": self.full_synced_at,
+            "fetchedAt": self.fetched_at,
+            "deltas": self.deltas,
+            "highWater": self._high_water,
+            "incremental": self.incremental
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ContextSnapshot":
+        snapshot = cls.__new__(cls)
+        snapshot.principal = data["principal"]
+        snapshot.collections = {
+            field: {item["id"]: item for item in items}
+            for field, items in data["collections"].items()
+        }
+        snapshot.other = data["other"]
+        snapshot.size = data["size"]
+        snapshot.full_synced_at = data["fullSyncedAt"]
+        snapshot.fetched_at = data["fetchedAt"]
+        snapshot.deltas = data["deltas"]
+        snapshot._high_water = data["highWater"]
+        snapshot.incremental = data["incremental"]
+        snapshot.context = snapshot._materialize()
+        return snapshot
+
+    def since(self, overlap_seconds: float = 0.0) -> str:
+        """updatedSince for the next delta, overlapping a little for in-flight writes"""
+        base = self._high_water or self.full_synced_at
+        return datetime.fromtimestamp(base - overlap_seconds, timezone.utc).isoformat()
+
+    def merge(self, delta: Dict[str, Any], fetched_at: float) -> int:
+        """Apply a delta response, returning how many entities it carried"""
+        changed, grown = self._apply(delta, measure=True)
+        # size tracks the merged data, whatever the deltas cost on the wire
+        self.size = max(0, self.size + grown)
+        self.fetched_at = fetched_at
+        self.deltas += 1
+        self.context = self._materialize()
+        return changed
+
+    def _apply(self, data: Dict[str, Any], measure: bool = False) -> Tuple[int, int]:
+        """Store data by id; returns entities applied and, if measured, the change in JSON bytes"""
+        changed = 0
+        grown = 0
+        for field, value in data.items():
+            if field not in DELTA_COLLECTIONS or not isinstance(value, list):
+                # Small lists without updatedAt (desktops) come whole every time
+                if measure:
+                    grown += len(dumps(value)) - len(dumps(self.other.get(field)))
+                self.other[field] = value
+                continue
+
+            items = self.collections.setdefault(field, {})
+            for item in value:
+                if measure:
+                    previous = items.get(item["id"])
+                    grown += len(dumps(item)) - (len(dumps(previous)) if previous is not None else 0)
+                items[item["id"]] = item
+                self._advance(item.get("updatedAt"))
+            changed += len(value)
+        return changed, grown
+
+    def _advance(self, updated_at: Optional[str]) -> None:
+        if not updated_at:
+            self.incremental = False
+            return
+        self._high_water = max(self._high_water, parse_timestamp(updated_at))
+
+    @timed("context_build")
+    def _materialize(self) -> UserContext:
+        data = dict(self.other)
+        for field, items in self.collections.items():
+            data[field] = list(items.values())
+        return UserContext.from_graphql(data)
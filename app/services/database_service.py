@@ -1,6 +1,49 @@
-import httpx
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from app.config import settings
+from app.dependencies import get_backend_client, get_database_service
+from app.models.requests import ChangeEvent
+from app.models.user_data import UserContext
+from app.services.context_queries import (
+    PROFILE_FULL,
+    PROFILE_STATS,
+    QUERY_PROFILES,
+    STEP_PROFILES,
+    is_filtered,
+    profile_query
+)
+from app.services.context_sync import ContextSnapshot
+from app.services.invalidation import change_events
+from app.utils.cache import LRUCache, SingleFlight
+from app.utils.fast_json import loads
+from app.utils.metrics import timed
+from app.utils.tiered_cache import create_tiered_cache
+import hashlib
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# (user, profile) -> ContextSnapshot, shared by every DatabaseService instance in the worker.
+# The backend authorizes each fetch, so a snapshot is only served to the
+# credentials that fetched it (ContextSnapshot.principal)
+user_context_cache = LRUCache(
+    max_entries=settings.user_context_cache_size,
+    max_bytes=settings.user_context_cache_max_bytes
+)
+_context_fetches = SingleFlight()
+
+# Redis-backed second tier over the same LRU when settings.enable_redis is on,
+# so workers share snapshots and see each other's invalidations
+shared_user_contexts = create_tiered_cache(
+    "user_context",
+    l1=user_context_cache,
+    encode=ContextSnapshot.to_dict,
+    decode=ContextSnapshot.from_dict,
+    size_of=lambda snapshot: snapshot.size
+)
+
+# Full vs incremental GraphQL fetches, for /health/caches
+context_sync_stats = {"fullSyncs": 0, "fullBytes": 0, "deltaSyncs": 0, "deltaBytes": 0, "deltaEntities": 0}
 
 class DatabaseService:
     """Service to fetch user data from NestJS backend"""
@@ -9,73 +52,175 @@ class DatabaseService:
         self.nestjs_url = settings.nestjs_api_url
         self.graphql_url = settings.nestjs_graphql_url
     
+    @timed("context")
     async def get_user_context(
         self, 
         user_id: int, 
-        auth_token: str
-    ) -> Dict[str, Any]:
-        """Fetch user's notes, roadmaps, and desktops from NestJS"""
+        auth_token: str,
+        profile: str = PROFILE_FULL
+    ) -> UserContext:
+        """Fetch the user data selected by a query profile, served from cache when fresh
         
-        # GraphQL query to get user context
-        query = """
-        query GetUserStudyContext($userId: Int!) {
-            notes(userId: $userId) {
-                id
-                title
-                content
-                createdAt
-                updatedAt
-                tags {
-                    tag {
-                        id
-                        name
-                    }
-                }
-            }
-            roadmaps(userId: $userId) {
-                id
-                title
-                description
-                createdAt
-                updatedAt
-                steps {
-                    id
-                    title
-                    description
-                    order
-                    isCompleted
-                    createdAt
-                }
-            }
-            desktops(userId: $userId) {
-                id
-                name
-                description
-            }
-        }
+        Profiles (app.services.context_queries) select only the fields their
+        caller reads; the default returns notes, roadmaps, and desktops in full.
         """
-        
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                self.graphql_url,
-                json={
-                    "query": query,
-                    "variables": {"userId": user_id}
-                },
-                headers={
-                    "Authorization": f"Bearer {auth_token}",
-                    "Content-Type": "application/json"
-                }
+        key = (user_id, profile)
+        principal = _principal(auth_token)
+        snapshot = user_context_cache.get(key)
+        if self._is_fresh(snapshot, principal):
+            return snapshot.context
+
+        if shared_user_contexts is not None:
+            # Other workers may hold a fresh copy; one of them fetches at a time
+            snapshot = await shared_user_contexts.get_or_load(
+                key,
+                lambda stale: self._load_user_context(user_id, auth_token, profile, stale),
+                expires_at=lambda loaded: self._expires_at(profile, loaded),
+                is_fresh=lambda cached: self._is_fresh(cached, principal)
             )
-            
-            if response.status_code != 200:
-                raise Exception(f"Failed to fetch user context: {response.status_code}")
-            
-            data = response.json()
-            if "errors" in data:
-                raise Exception(f"GraphQL errors: {data['errors']}")
-            
-            return data["data"]
+            if snapshot.principal != principal:
+                # Joined a load made with someone else's credentials
+                snapshot = await self._load_user_context(user_id, auth_token, profile, snapshot)
+                await shared_user_contexts.set(key, snapshot, expires_at=self._expires_at(profile, snapshot))
+            return snapshot.context
+
+        # Concurrent requests for the same user and credentials share one GraphQL round trip
+        return await _context_fetches.do(
+            (user_id, profile, principal),
+            lambda: self._refresh(user_id, auth_token, profile, snapshot)
+        )
+
+    async def _refresh(
+        self,
+        user_id: int,
+        auth_token: str,
+        profile: str,
+        snapshot: Optional[ContextSnapshot]
+    ) -> UserContext:
+        snapshot = await self._load_user_context(user_id, auth_token, profile, snapshot)
+        user_context_cache.set(
+            (user_id, profile),
+            snapshot,
+            expires_at=self._expires_at(profile, snapshot),
+            size=snapshot.size
+        )
+        return snapshot.context
+
+    async def _load_user_context(
+        self,
+        user_id: int,
+        auth_token: str,
+        profile: str,
+        snapshot: Optional[ContextSnapshot]
+    ) -> ContextSnapshot:
+        """Bring the snapshot up to date with a delta fetch, or replace it with a full one"""
+        started = time.time()
+        principal = _principal(auth_token)
+        synced = False
+        # Never merge into data fetched with other credentials
+        if snapshot is not None and snapshot.principal == principal and self._can_sync_delta(profile, snapshot):
+            try:
+                delta, size = await self._fetch_user_context(
+                    user_id,
+                    auth_token,
+                    profile,
+                    updated_since=snapshot.since(settings.context_delta_overlap_seconds)
+                )
+            except Exception as e:
+                logger.warning(f"Delta sync failed, doing a full fetch: {e}")
+            else:
+                synced = True
+                context_sync_stats["deltaEntities"] += snapshot.merge(delta, started)
+                context_sync_stats["deltaSyncs"] += 1
+                context_sync_stats["deltaBytes"] += size
+        
+        if not synced:
+            data, size = await self._fetch_user_context(user_id, auth_token, profile)
+            snapshot = ContextSnapshot(data, size, started, principal)
+            context_sync_stats["fullSyncs"] += 1
+            context_sync_stats["fullBytes"] += size
+        return snapshot
+
+    @staticmethod
+    def _is_fresh(snapshot: Optional[ContextSnapshot], principal: str) -> bool:
+        return (
+            snapshot is not None
+            and snapshot.principal == principal
+            and time.time() - snapshot.fetched_at < settings.cache_ttl_seconds
+        )
+
+    def _expires_at(self, profile: str, snapshot: ContextSnapshot) -> float:
+        # Deltas can't see deletions, so the snapshot expires at the next full
+        # resync; nor step completions, so profiles reading them keep the TTL
+        lifetime = settings.cache_ttl_seconds
+        if self._can_sync_delta(profile, snapshot) and profile not in STEP_PROFILES:
+            lifetime = max(lifetime, settings.context_full_resync_seconds)
+        return snapshot.full_synced_at + lifetime
+
+    @staticmethod
+    def _can_sync_delta(profile: str, snapshot: ContextSnapshot) -> bool:
+        return settings.context_delta_sync_enabled and snapshot.incremental and not is_filtered(profile)
+
+    async def invalidate_user_context(self, user_id: int) -> None:
+        """Drop the cached contexts so the next request refetches them"""
+        for profile in QUERY_PROFILES:
+            if shared_user_contexts is not None:
+                await shared_user_contexts.delete((user_id, profile))
+            else:
+                user_context_cache.delete((user_id, profile))
+
+    async def mark_user_context_stale(self, user_id: int) -> None:
+        """Keep the snapshots but sync them on next use, by delta where possible"""
+        for profile in QUERY_PROFILES:
+            key = (user_id, profile)
+            if shared_user_contexts is not None:
+                snapshot = await shared_user_contexts.get(key)
+            else:
+                snapshot = user_context_cache.get(key)
+            if snapshot is None:
+                continue
+            snapshot.fetched_at = 0.0
+            if shared_user_contexts is not None:
+                await shared_user_contexts.set(key, snapshot, expires_at=self._expires_at(profile, snapshot))
+
+    @timed("graphql")
+    async def _fetch_user_context(
+        self,
+        user_id: int,
+        auth_token: str,
+        profile: str = PROFILE_FULL,
+        updated_since: Optional[str] = None
+    ) -> Tuple[Dict[str, Any], int]:
+        """Fetch a profile's selection of user data from NestJS.
+
+        With updated_since, notes and roadmaps are limited to those changed
+        since then. Returns the context and the size of the response body in bytes.
+        """
+        
+        query, variables = profile_query(profile, user_id, updated_since)
+        
+        client = get_backend_client()
+        response = await client.post(
+            self.graphql_url,
+            json={
+                "query": query,
+                "variables": variables
+            },
+            headers={
+                "Authorization": f"Bearer {auth_token}",
+                "Content-Type": "application/json"
+            }
+        )
+
+        if response.status_code != 200:
+            raise Exception(f"Failed to fetch user context: {response.status_code}")
+
+        # Decoded from bytes; these payloads are the largest thing we parse
+        data = loads(response.content)
+        if "errors" in data:
+            raise Exception(f"GraphQL errors: {data['errors']}")
+
+        return data["data"], len(response.content)
     
     async def get_user_stats(
         self,
@@ -83,21 +228,21 @@ class DatabaseService:
         auth_token: str
     ) -> Dict[str, Any]:
         """Get user statistics for analysis"""
-        context = await self.get_user_context(user_id, auth_token)
-        
-        notes = context.get("notes", [])
-        roadmaps = context.get("roadmaps", [])
-        
-        total_steps = sum(len(r.get("steps", [])) for r in roadmaps)
-        completed_steps = sum(
-            sum(1 for s in r.get("steps", []) if s.get("isCompleted", False))
-            for r in roadmaps
-        )
-        
-        return {
-            "totalNotes": len(notes),
-            "totalRoadmaps": len(roadmaps),
-            "totalSteps": total_steps,
-            "completedSteps": completed_steps,
-            "completionRate": completed_steps / total_steps if total_steps > 0 else 0
-        }
\ No newline at end of file
+        context = await self.get_user_context(user_id, auth_token, PROFILE_STATS)
+        return context.stats
+
+def _principal(auth_token: str) -> str:
+    """Stable id for the credentials a context is fetched with, so they aren't stored"""
+    return hashlib.sha256(auth_token.encode()).hexdigest()[:32]
+
+@change_events.register
+async def _apply_change_events(user_id: int, events: List[ChangeEvent]) -> None:
+    service = get_database_service()
+    # Deltas see creates and updates, but not deletions or step edits that
+    # leave their roadmap's updatedAt alone
+    if settings.context_delta_sync_enabled and not any(
+        e.action == "deleted" or e.entity == "step" for e in events
+    ):
+        await service.mark_user_context_stale(user_id)
+    else:
+        await service.invalidate_user_context(user_id)
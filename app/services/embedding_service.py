@@ -0,0 +1,296 @@
+import asyncio
+import hashlib
+import logging
+import re
+import numpy as np
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from app.config import settings
+from app.models.requests import ChangeEvent
+from app.services.invalidation import change_events
+from app.utils.cache import LRUCache
+from app.utils.tiered_cache import create_tiered_cache
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"\w+")
+
+class EmbeddingBackend(ABC):
+    """Turns a batch of texts into a (len(texts), dimensions) float32 matrix"""
+
+    @abstractmethod
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        ...
+
+    @property
+    def signature(self) -> str:
+        """Identifies the vector space, so vectors from different models are never mixed"""
+        return type(self).__name__
+
+    async def aclose(self) -> None:
+        pass
+
+class OpenAIEmbeddingBackend(EmbeddingBackend):
+    """Embeddings from the OpenAI API using settings.embedding_model"""
+
+    def __init__(self, model: Optional[str] = None):
+        from openai import AsyncOpenAI
+
+        self.model = model or settings.embedding_model
+        self.client = AsyncOpenAI(api_key=settings.openai_api_key, base_url=settings.openai_base_url)
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        response = await self.client.embeddings.create(model=self.model, input=texts)
+        return np.array([d.embedding for d in response.data], dtype=np.float32)
+
+    @property
+    def signature(self) -> str:
+        return f"openai:{self.model}"
+
+    async def aclose(self) -> None:
+        await self.client.close()
+
+class HashingEmbeddingBackend(EmbeddingBackend):
+    """Deterministic local embedder based on feature-hashed words and word pairs
+
+    Needs no network or model download, which makes it the backend for tests
+    and offline benchmarks. Quality is lexical rather than semantic.
+    """
+
+    def __init__(self, dimensions: int = 512):
+        self.dimensions = dimensions
+
+    @property
+    def signature(self) -> str:
+        return f"hashing:{self.dimensions}"
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = _TOKEN_RE.findall(text.lower())
+            features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+            for feature in features:
+                digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+                bucket = int.from_bytes(digest[:4], "little") % self.dimensions
+                matrix[row, bucket] += 1.0 if digest[4] & 1 else -1.0
+        # Sublinear term frequency so long notes don't drown out short ones
+        return np.sign(matrix) * np.log1p(np.abs(matrix))
+
+def create_embedding_backend() -> EmbeddingBackend:
+    if settings.embedding_backend == "local":
+        return HashingEmbeddingBackend()
+    if settings.embedding_backend == "openai":
+        if not settings.openai_api_key:
+            # Anthropic-only deployments have no embeddings API
+            logger.warning("No OpenAI API key, using local hashing embeddings")
+            return HashingEmbeddingBackend()
+        return OpenAIEmbeddingBackend()
+    raise ValueError(f"Unsupported embedding backend: {settings.embedding_backend}")
+
+class UserEmbeddingIndex:
+    """L2-normalized note vectors of one user, row-aligned with note ids"""
+
+    def __init__(self):
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.matrix: Optional[np.ndarray] = None
+        self.versions: Dict[int, str] = {}
+        self._rows: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def upsert(self, note_ids: List[int], vectors: np.ndarray, versions: List[str]) -> None:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.maximum(norms, 1e-12)
+
+        new_ids, new_rows = [], []
+        for note_id, vector, version in zip(note_ids, vectors, versions):
+            row = self._rows.get(note_id)
+            if row is None:
+                new_ids.append(note_id)
+                new_rows.append(vector)
+            else:
+                self.matrix[row] = vector
+            self.versions[note_id] = version
+
+        if new_ids:
+            start = len(self.ids)
+            rows = np.array(new_rows, dtype=np.float32)
+            self.ids = np.concatenate([self.ids, np.array(new_ids, dtype=np.int64)])
+            self.matrix = rows if self.matrix is None else np.vstack([self.matrix, rows])
+            for offset, note_id in enumerate(new_ids):
+                self._rows[note_id] = start + offset
+
+    def remove(self, note_ids: Iterable[int]) -> None:
+        drop = [self._rows[n] for n in note_ids if n in self._rows]
+        if not drop:
+            return
+        keep = np.ones(len(self.ids), dtype=bool)
+        keep[drop] = False
+        self.ids = self.ids[keep]
+        self.matrix = self.matrix[keep]
+        self._rows = {int(note_id): row for row, note_id in enumerate(self.ids)}
+        self.versions = {n: v for n, v in self.versions.items() if n in self._rows}
+
+    def query(
+        self,
+        vector: np.ndarray,
+        k: int,
+        exclude: Iterable[int] = (),
+        min_score: float = 0.0
+    ) -> List[Tuple[int, float]]:
+        """Top-k notes by cosine similarity to vector, keeping scores above min_score"""
+        if not len(self.ids):
+            return []
+
+        vector = vector / max(float(np.linalg.norm(vector)), 1e-12)
+        scores = self.matrix @ vector
+        excluded = [self._rows[n] for n in exclude if n in self._rows]
+        if excluded:
+            scores[excluded] = -np.inf
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(self.ids[i]), float(scores[i])) for i in top if scores[i] > min_score]
+
+# (backend, user, note, version) -> float32 vector bytes in Redis when enabled.
+# The indexes stay per worker, but each note version is embedded once for all
+# of them; the index itself holds the vectors, so the local tier stays small
+shared_note_vectors = create_tiered_cache(
+    "note_vectors",
+    l1=LRUCache(max_entries=settings.embedding_batch_size),
+    encode=lambda vector: np.asarray(vector, dtype=np.float32).tobytes(),
+    decode=lambda data: np.frombuffer(data, dtype=np.float32)
+)
+
+class EmbeddingService:
+    """Per-user note embeddings for related-note retrieval"""
+
+    def __init__(self, backend: Optional[EmbeddingBackend] = None):
+        self._backend = backend
+        self.batch_size = settings.embedding_batch_size
+        # Bounded by user count; each index holds one matrix per user
+        self.indexes = LRUCache(max_entries=settings.embedding_index_max_users)
+
+        self.embedded_notes = 0
+        self.embedding_batches = 0
+
+    @property
+    def backend(self) -> EmbeddingBackend:
+        """Created on first use so importing the service doesn't load a provider SDK"""
+        if self._backend is None:
+            self._backend = create_embedding_backend()
+        return self._backend
+
+    def _index(self, user_id: int) -> UserEmbeddingIndex:
+        index = self.indexes.get(user_id)
+        if index is None:
+            index = UserEmbeddingIndex()
+            self.indexes.set(user_id, index)
+        return index
+
+    @staticmethod
+    def _note_text(note: Dict[str, Any]) -> str:
+        return f"{note.get('title') or ''}\n{note.get('content') or ''}"[:8000]
+
+    @classmethod
+    def _note_version(cls, note: Dict[str, Any]) -> str:
+        # updatedAt is cheaper than hashing content; fall back when it's missing
+        if note.get("updatedAt"):
+            return note["updatedAt"]
+        return hashlib.sha1(cls._note_text(note).encode()).hexdigest()
+
+    async def _embed(self, texts: List[str]) -> np.ndarray:
+        batches = []
+        for start in range(0, len(texts), self.batch_size):
+            batches.append(await self.backend.embed(texts[start:start + self.batch_size]))
+            self.embedding_batches += 1
+        self.embedded_notes += len(texts)
+        return np.vstack(batches)
+
+    async def _note_vectors(self, user_id: int, notes: List[Dict[str, Any]]) -> np.ndarray:
+        """Vectors of notes, embedding only those no worker has embedded yet"""
+        if shared_note_vectors is None:
+            return await self._embed([self._note_text(n) for n in notes])
+
+        keys = [
+            (self.backend.signature, user_id, n["id"], self._note_version(n))
+            for n in notes
+        ]
+        vectors = list(await asyncio.gather(*(shared_note_vectors.get(key) for key in keys)))
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            embedded = await self._embed([self._note_text(notes[i]) for i in missing])
+            for i, vector in zip(missing, embedded):
+                vectors[i] = vector
+                await shared_note_vectors.set(keys[i], vector, ttl=settings.embedding_vector_ttl_seconds)
+        return np.vstack(vectors)
+
+    async def sync_notes(self, user_id: int, notes: List[Dict[str, Any]]) -> UserEmbeddingIndex:
+        """Bring the user's index in line with notes, embedding only new or changed ones"""
+        index = self._index(user_id)
+
+        changed = [n for n in notes if index.versions.get(n["id"]) != self._note_version(n)]
+        if changed:
+            vectors = await self._note_vectors(user_id, changed)
+            index.upsert(
+                [n["id"] for n in changed],
+                vectors,
+                [self._note_version(n) for n in changed]
+            )
+
+        if len(index) > len(notes):
+            current = {n["id"] for n in notes}
+            index.remove([n for n in index.versions if n not in current])
+        return index
+
+    async def upsert_note(self, user_id: int, note: Dict[str, Any]) -> None:
+        """Re-embed a single created or edited note"""
+        vectors = await self._note_vectors(user_id, [note])
+        self._index(user_id).upsert([note["id"]], vectors, [self._note_version(note)])
+
+    def remove_note(self, user_id: int, note_id: int) -> None:
+        index = self.indexes.get(user_id)
+        if index is not None:
+            index.remove([note_id])
+
+    def invalidate_user(self, user_id: int) -> None:
+        self.indexes.delete(user_id)
+
+    async def related_notes(
+        self,
+        user_id: int,
+        notes: List[Dict[str, Any]],
+        text: str,
+        k: int = 5,
+        exclude: Iterable[int] = (),
+        min_score: float = 0.0
+    ) -> List[Tuple[int, float]]:
+        """Top-k (note id, cosine similarity) for text among the user's notes"""
+        if not notes or not text.strip():
+            return []
+        index = await self.sync_notes(user_id, notes)
+        query = await self.backend.embed([text])
+        return index.query(query[0], k, exclude, min_score)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "users": len(self.indexes),
+            "embeddedNotes": self.embedded_notes,
+            "batches": self.embedding_batches
+        }
+
+    async def aclose(self) -> None:
+        if self._backend is not None:
+            await self._backend.aclose()
+            self._backend = None
+
+embedding_service = EmbeddingService()
+
+@change_events.register
+async def _apply_change_events(user_id: int, events: List[ChangeEvent]) -> None:
+    # Edits are picked up by version on the next sync; only deletions need work
+    for event in events:
+        if event.entity == "note" and event.action == "deleted":
+            embedding_service.remove_note(user_id, event.id)
@@ -0,0 +1,141 @@
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+from app.config import settings
+from app.dependencies import get_recommendation_service
+from app.middleware.rate_limit import rate_limiter
+from app.services.llm_dispatch import PRIORITY_BACKGROUND
+from app.services.llm_service import llm_usage_recorder
+from app.services.active_users import active_users
+from app.services.recommendation_service import RecommendationService, get_daily_goals_entry
+from app.utils.tiered_cache import get_redis
+import asyncio
+import logging
+import secrets
+
+logger = logging.getLogger(__name__)
+
+class GoalsScheduler:
+    """Pre-computes today's goals for recently active users during off-peak hours
+
+    Runs as a task started from the app lifespan. Every interval inside the
+    UTC hour window it generates goals for active users that don't have
+    today's yet, a few at a time and at background LLM priority. With Redis
+    enabled, one worker per interval wins a lock and does the run.
+    """
+
+    def __init__(
+        self,
+        recommendation_service: Optional[RecommendationService] = None,
+        interval: float = 600,
+        concurrency: int = 4,
+        start_hour: int = 3,
+        end_hour: int = 6
+    ):
+        # None uses the app's shared service, created on first run
+        self.recommendation_service = recommendation_service
+        self.interval = interval
+        self.concurrency = concurrency
+        self.start_hour = start_hour
+        self.end_hour = end_hour
+        self._task: Optional[asyncio.Task] = None
+        self._worker = secrets.token_hex(8)
+
+        self.runs = 0
+        self.generated = 0
+        self.failed = 0
+        self.last_run: Optional[str] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def in_window(self, hour: int) -> bool:
+        if self.start_hour <= self.end_hour:
+            return self.start_hour <= hour < self.end_hour
+        # Window wraps past midnight
+        return hour >= self.start_hour or hour < self.end_hour
+
+    async def _loop(self) -> None:
+        while True:
+            if self.in_window(datetime.now(timezone.utc).hour):
+                try:
+                    if await self._elected():
+                        await self.run_once()
+                except Exception:
+                    logger.exception("Daily goals pre-computation failed")
+            await asyncio.sleep(self.interval)
+
+    async def _elected(self) -> bool:
+        """Whether this worker does the current interval's run"""
+        if not (settings.enable_redis and settings.redis_url):
+            return True
+        # Held for most of an interval, so the next run can go to any worker
+        return bool(await get_redis().set(
+            "goals_scheduler:leader",
+            self._worker,
+            nx=True,
+            px=max(1, int(900 * self.interval))
+        ))
+
+    async def run_once(self) -> int:
+        """Generate goals for every active user without today's; returns how many were generated"""
+        today = datetime.now(timezone.utc).date().isoformat()
+        due = [
+            (user_id, subject)
+            for user_id, subject in await active_users.items()
+            if ((await get_daily_goals_entry(user_id)) or (None,))[0] != today
+        ]
+
+        self.runs += 1
+        self.last_run = datetime.now(timezone.utc).isoformat()
+        slots = asyncio.Semaphore(self.concurrency)
+        results = await asyncio.gather(*(self._generate(*user, slots) for user in due))
+        return sum(results)
+
+    async def _generate(self, user_id: int, subject: str, slots: asyncio.Semaphore) -> bool:
+        async with slots:
+            async def record(tokens: int) -> None:
+                await rate_limiter.record_llm_usage(subject, tokens)
+
+            # Pre-computed goals still count against the user's token budget
+            llm_usage_recorder.set(record)
+            try:
+                service = self.recommendation_service or get_recommendation_service()
+                await service.generate_daily_goals(
+                    user_id,
+                    settings.nestjs_service_token or subject,
+                    priority=PRIORITY_BACKGROUND
+                )
+            except Exception as e:
+                self.failed += 1
+                logger.warning(f"Pre-computing goals for user {user_id} failed: {e}")
+                return False
+            self.generated += 1
+            return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": settings.enable_goals_precompute,
+            "running": self._task is not None and not self._task.done(),
+            "activeUsers": active_users.stats(),
+            "runs": self.runs,
+            "generated": self.generated,
+            "failed": self.failed,
+            "lastRun": self.last_run
+        }
+
+goals_scheduler = GoalsScheduler(
+    interval=settings.goals_precompute_interval_seconds,
+    concurrency=settings.goals_precompute_concurrency,
+    start_hour=settings.goals_precompute_start_hour,
+    end_hour=settings.goals_precompute_end_hour
+)
@@ -0,0 +1,108 @@
+import asyncio
+import httpx
+import logging
+import time
+from typing import Any, Dict
+
+logger = logging.getLogger(__name__)
+
+class PooledHTTPClient:
+    """Shared keep-alive HTTP client with connection pool instrumentation"""
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 30.0,
+        write_timeout: float = 30.0,
+        pool_timeout: float = 5.0,
+        http2: bool = False
+    ):
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning("HTTP/2 requested but the h2 package is not installed, using HTTP/1.1")
+                http2 = False
+
+        self.max_connections = max_connections
+        self.pool_timeout = pool_timeout
+        self.http2 = http2
+
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry
+            ),
+            timeout=httpx.Timeout(
+                connect=connect_timeout,
+                read=read_timeout,
+                write=write_timeout,
+                pool=pool_timeout
+            ),
+            http2=http2
+        )
+
+        # Mirrors the pool limit so we can see how long requests queue for a
+        # connection; httpx itself doesn't expose pool wait times
+        self._slots = asyncio.Semaphore(max_connections)
+
+        self.requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.waits = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.pool_timeouts = 0
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        if self._slots.locked():
+            start = time.perf_counter()
+            try:
+                await asyncio.wait_for(self._slots.acquire(), timeout=self.pool_timeout)
+            except asyncio.TimeoutError:
+                self.pool_timeouts += 1
+                raise httpx.PoolTimeout(f"No connection available within {self.pool_timeout}s")
+
+            waited = time.perf_counter() - start
+            self.waits += 1
+            self.total_wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+        else:
+            await self._slots.acquire()
+
+        self.requests += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            return await self.client.request(method, url, **kwargs)
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool saturation and wait-time counters"""
+        return {
+            "maxConnections": self.max_connections,
+            "http2": self.http2,
+            "requests": self.requests,
+            "inFlight": self.in_flight,
+            "peakInFlight": self.peak_in_flight,
+            "saturation": self.in_flight / self.max_connections,
+            "waits": self.waits,
+            "poolTimeouts": self.pool_timeouts,
+            "avgWaitMs": 1000 * self.total_wait_seconds / self.requests if self.requests else 0.0,
+            "maxWaitMs": 1000 * self.max_wait_seconds
+        }
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
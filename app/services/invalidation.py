@@ -0,0 +1,95 @@
+from typing import Any, Awaitable, Callable, Dict, List, Set
+from app.config import settings
+from app.models.requests import ChangeEvent
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+InvalidationHook = Callable[[int, List[ChangeEvent]], Awaitable[None]]
+
+class ChangeEventProcessor:
+    """Batches backend change events per user and applies them to registered caches
+
+    A user's events are applied after debounce seconds without a new one, and
+    no later than max_delay after the first, so a burst of edits costs one
+    invalidation. Caches register hooks that receive (user id, events).
+
+    Caches are per worker; a webhook call reaches one worker only, so shared
+    state (Redis) is what makes invalidation effective across workers.
+    """
+
+    def __init__(self, debounce: float = 2.0, max_delay: float = 10.0):
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self._hooks: List[InvalidationHook] = []
+        self._pending: Dict[int, List[ChangeEvent]] = {}
+        self._first_seen: Dict[int, float] = {}
+        self._timers: Dict[int, asyncio.TimerHandle] = {}
+        self._flushing: Set[asyncio.Task] = set()
+
+        self.received = 0
+        self.flushes = 0
+        self.hook_errors = 0
+
+    def register(self, hook: InvalidationHook) -> InvalidationHook:
+        self._hooks.append(hook)
+        return hook
+
+    def submit(self, events: List[ChangeEvent]) -> None:
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        for event in events:
+            self.received += 1
+            self._pending.setdefault(event.userId, []).append(event)
+            self._first_seen.setdefault(event.userId, now)
+
+        for user_id in {event.userId for event in events}:
+            timer = self._timers.pop(user_id, None)
+            if timer is not None:
+                timer.cancel()
+            deadline = min(now + self.debounce, self._first_seen[user_id] + self.max_delay)
+            self._timers[user_id] = loop.call_at(deadline, self._start_flush, user_id)
+
+    def _start_flush(self, user_id: int) -> None:
+        task = asyncio.ensure_future(self.flush(user_id))
+        self._flushing.add(task)
+        task.add_done_callback(self._flushing.discard)
+
+    async def flush(self, user_id: int) -> None:
+        """Apply a user's pending events now"""
+        timer = self._timers.pop(user_id, None)
+        if timer is not None:
+            timer.cancel()
+        self._first_seen.pop(user_id, None)
+        events = self._pending.pop(user_id, [])
+        if not events:
+            return
+
+        self.flushes += 1
+        for hook in self._hooks:
+            try:
+                await hook(user_id, events)
+            except Exception:
+                self.hook_errors += 1
+                logger.exception(f"Invalidation hook failed for user {user_id}")
+
+    async def aclose(self) -> None:
+        """Apply everything still pending"""
+        for user_id in list(self._pending):
+            await self.flush(user_id)
+        if self._flushing:
+            await asyncio.gather(*self._flushing, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "received": self.received,
+            "flushes": self.flushes,
+            "pendingUsers": len(self._pending),
+            "hookErrors": self.hook_errors
+        }
+
+change_events = ChangeEventProcessor(
+    debounce=settings.webhook_debounce_seconds,
+    max_delay=settings.webhook_max_delay_seconds
+)
@@ -0,0 +1,90 @@
+import hashlib
+import json
+import logging
+from typing import Any, Dict, Optional
+from app.config import settings
+from app.utils.cache import CacheBackend, create_cache_backend
+from app.utils.fast_json import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+class LLMResponseCache:
+    """Content-addressed cache of LLM completions"""
+
+    def __init__(self, backend: CacheBackend):
+        self.backend = backend
+
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.saved_tokens = 0
+        self.saved_seconds = 0.0
+
+    @staticmethod
+    def make_key(**request: Any) -> str:
+        """Hash of everything that determines the completion"""
+        payload = json.dumps(request, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    async def get(self, key: str) -> Optional[str]:
+        try:
+            raw = await self.backend.get(key)
+        except Exception as e:
+            # A broken cache must never fail the request
+            self.errors += 1
+            logger.warning(f"LLM cache read failed: {e}")
+            return None
+
+        if raw is None:
+            self.misses += 1
+            return None
+
+        try:
+            entry = loads(raw)
+            text = entry["text"]
+        except Exception as e:
+            # Corrupt or written by an older version; regenerate it
+            self.errors += 1
+            self.misses += 1
+            logger.warning(f"Unreadable LLM cache entry: {e}")
+            return None
+
+        self.hits += 1
+        self.saved_tokens += entry.get("tokens", 0)
+        self.saved_seconds += entry.get("latency", 0.0)
+        return text
+
+    async def set(self, key: str, text: str, tokens: int, latency: float, ttl: float) -> None:
+        entry = dumps({"text": text, "tokens": tokens, "latency": latency})
+        try:
+            await self.backend.set(key, entry, ttl=ttl)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"LLM cache write failed: {e}")
+
+    async def delete(self, key: str) -> None:
+        try:
+            await self.backend.delete(key)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"LLM cache delete failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hitRate": self.hits / lookups if lookups else 0.0,
+            "savedTokens": self.saved_tokens,
+            "savedSeconds": self.saved_seconds,
+            "backend": self.backend.stats()
+        }
+
+llm_response_cache = LLMResponseCache(
+    create_cache_backend(
+        "llm",
+        max_entries=settings.llm_cache_max_entries,
+        max_bytes=settings.llm_cache_max_bytes
+    )
+)
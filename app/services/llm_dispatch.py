@@ -0,0 +1,209 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, TypeVar
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Lower runs first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_DEFAULT = 5
+PRIORITY_BACKGROUND = 10
+
+def _status_code(error: Exception) -> Optional[int]:
+    # openai and anthropic both expose status_code on API status errors
+    return getattr(error, "status_code", None)
+
+def is_rate_limited(error: Exception) -> bool:
+    return _status_code(error) == 429
+
+def is_retryable(error: Exception) -> bool:
+    status = _status_code(error)
+    if status is not None:
+        return status == 429 or status == 408 or status >= 500
+    # Timeouts and dropped connections carry no status code
+    return type(error).__name__ in ("APITimeoutError", "APIConnectionError", "TimeoutError")
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Provider-requested delay from retry-after(-ms) headers, in seconds"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        return None
+    return None
+
+class LLMDispatcher:
+    """Priority-ordered, adaptively bounded concurrency for outbound LLM calls
+
+    The limit follows AIMD: it grows by about one slot per limit's worth of
+    fast successful calls, is cut in half on a provider 429 and trimmed when
+    latency exceeds the target.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 16,
+        min_limit: int = 1,
+        max_limit: int = 128,
+        latency_target: float = 20.0,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 20.0
+    ):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self.in_flight = 0
+        self._queue: list = []
+        self._sequence = itertools.count()
+
+        self.calls = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.queued = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    async def run(
+        self,
+        call: Callable[[], Awaitable[T]],
+        priority: int = PRIORITY_DEFAULT,
+        max_retries: Optional[int] = None,
+        failed: Optional[Exception] = None
+    ) -> T:
+        """Run call within the concurrency limit, retrying transient provider errors
+
+        max_retries overrides the dispatcher's own. failed is an error the
+        call already hit, so the first run waits out a backoff as a retry.
+        """
+        retries = self.max_retries if max_retries is None else max_retries
+        attempt = 0
+        error = failed
+        while True:
+            if error is not None:
+                if not is_retryable(error) or attempt >= retries:
+                    raise error
+                delay = self._backoff(attempt, retry_after(error))
+                attempt += 1
+                self.retries += 1
+                logger.warning(f"LLM call failed ({error}), retry {attempt} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+            try:
+                async with self.slot(priority):
+                    return await call()
+            except Exception as e:
+                error = e
+
+    @asynccontextmanager
+    async def slot(self, priority: int = PRIORITY_DEFAULT) -> AsyncIterator[None]:
+        """Hold one concurrency slot; used directly for streams, which aren't retried"""
+        await self._acquire(priority)
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            if is_rate_limited(e):
+                self.rate_limited += 1
+                self._decrease(0.5)
+            raise
+        else:
+            if time.perf_counter() - start > self.latency_target:
+                self._decrease(0.9)
+            else:
+                self._increase()
+        finally:
+            self._release()
+
+    async def _acquire(self, priority: int) -> None:
+        self.calls += 1
+        if not self._queue and self.in_flight < int(self.limit):
+            self.in_flight += 1
+            return
+
+        self.queued += 1
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (priority, next(self._sequence), future))
+        # Clears waiters cancelled earlier and grants the slot if one is free
+        self._wake()
+        start = time.perf_counter()
+        try:
+            await future
+        except asyncio.CancelledError:
+            # Granted a slot just as we were cancelled; hand it on
+            if future.done() and not future.cancelled():
+                self._release()
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            self.total_wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+    def _release(self) -> None:
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._queue and self.in_flight < int(self.limit):
+            _priority, _sequence, future = heapq.heappop(self._queue)
+            if future.done():
+                # Waiter was cancelled while queued
+                continue
+            self.in_flight += 1
+            future.set_result(None)
+
+    def _increase(self) -> None:
+        self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        self._wake()
+
+    def _decrease(self, factor: float) -> None:
+        self.limit = max(self.min_limit, self.limit * factor)
+
+    def _backoff(self, attempt: int, requested: Optional[float]) -> float:
+        """Full-jitter exponential backoff, never shorter than the provider asked for"""
+        if requested is not None:
+            return requested + random.uniform(0, self.backoff_base)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": int(self.limit),
+            "inFlight": self.in_flight,
+            "queueDepth": sum(1 for _p, _s, f in self._queue if not f.done()),
+            "calls": self.calls,
+            "queued": self.queued,
+            "retries": self.retries,
+            "rateLimited": self.rate_limited,
+            "avgWaitMs": 1000 * self.total_wait_seconds / self.queued if self.queued else 0.0,
+            "maxWaitMs": 1000 * self.max_wait_seconds
+        }
+
+def create_dispatcher() -> LLMDispatcher:
+    """Dispatcher from settings; each provider gets its own, since limits are per provider"""
+    return LLMDispatcher(
+        initial_limit=settings.llm_concurrency_initial,
+        min_limit=settings.llm_concurrency_min,
+        max_limit=settings.llm_concurrency_max,
+        latency_target=settings.llm_latency_target_seconds,
+        max_retries=settings.llm_max_retries,
+        backoff_base=settings.llm_retry_backoff_seconds,
+        backoff_max=settings.llm_retry_backoff_max_seconds
+    )
@@ -0,0 +1,173 @@
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from app.config import settings
+
+DEFAULT_MODELS = {
+    "openai": "gpt-4-turbo-preview",
+    "anthropic": "claude-3-opus-20240229"
+}
+
+class LLMProvider(ABC):
+    """One provider/model pair that LLMService can route requests to"""
+
+    name: str
+    model: str
+
+    @abstractmethod
+    async def complete(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int,
+        response_format: Optional[Dict] = None
+    ) -> Tuple[str, int]:
+        """Return the completion and total tokens used"""
+        ...
+
+    @abstractmethod
+    def stream(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int,
+        usage: Dict[str, int]
+    ) -> AsyncIterator[str]:
+        """Yield completion text deltas; total tokens are written to usage at the end"""
+        ...
+
+    async def aclose(self) -> None:
+        pass
+
+class OpenAIProvider(LLMProvider):
+    def __init__(self, model: str, api_key: Optional[str] = None):
+        # SDKs are imported only for the providers that are configured
+        from openai import AsyncOpenAI
+
+        self.name = "openai"
+        self.model = model
+        # Retries are handled by the dispatcher, which also adapts concurrency
+        self.client = AsyncOpenAI(
+            api_key=api_key or settings.openai_api_key,
+            base_url=settings.openai_base_url,
+            max_retries=0
+        )
+
+    async def complete(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int,
+        response_format: Optional[Dict] = None
+    ) -> Tuple[str, int]:
+        kwargs = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        }
+
+        if response_format:
+            kwargs["response_format"] = response_format
+
+        response = await self.client.chat.completions.create(**kwargs)
+        tokens = response.usage.total_tokens if response.usage else 0
+        return response.choices[0].message.content, tokens
+
+    async def stream(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int,
+        usage: Dict[str, int]
+    ) -> AsyncIterator[str]:
+        stream = await self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+        async for chunk in stream:
+            if chunk.usage:
+                usage["tokens"] = chunk.usage.total_tokens
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    async def aclose(self) -> None:
+        await self.client.close()
+
+class AnthropicProvider(LLMProvider):
+    def __init__(self, model: str, api_key: Optional[str] = None):
+        from anthropic import AsyncAnthropic
+
+        self.name = "anthropic"
+        self.model = model
+        self.client = AsyncAnthropic(api_key=api_key or settings.anthropic_api_key, max_retries=0)
+
+    @staticmethod
+    def _split_system(messages: List[Dict[str, str]]) -> Tuple[str, List[Dict[str, str]]]:
+        system = "".join(m["content"] for m in messages if m["role"] == "system")
+        return system, [m for m in messages if m["role"] != "system"]
+
+    async def complete(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int,
+        response_format: Optional[Dict] = None
+    ) -> Tuple[str, int]:
+        # Anthropic has no JSON mode; the prompt asks for JSON instead
+        system, messages = self._split_system(messages)
+        response = await self.client.messages.create(
+            model=self.model,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            system=system,
+            messages=messages
+        )
+        tokens = response.usage.input_tokens + response.usage.output_tokens
+        return response.content[0].text, tokens
+
+    async def stream(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int,
+        usage: Dict[str, int]
+    ) -> AsyncIterator[str]:
+        system, messages = self._split_system(messages)
+        async with self.client.messages.stream(
+            model=self.model,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            system=system,
+            messages=messages
+        ) as stream:
+            async for text in stream.text_stream:
+                yield text
+            message = await stream.get_final_message()
+            usage["tokens"] = message.usage.input_tokens + message.usage.output_tokens
+
+    async def aclose(self) -> None:
+        await self.client.close()
+
+def configured_provider_names() -> List[str]:
+    """settings.llm_providers in preference order, or just settings.llm_provider"""
+    names = [n.strip() for n in settings.llm_providers.split(",") if n.strip()]
+    return names or [settings.llm_provider]
+
+def model_for(name: str) -> str:
+    explicit = {"openai": settings.openai_model, "anthropic": settings.anthropic_model}.get(name)
+    if explicit:
+        return explicit
+    if name == settings.llm_provider:
+        return settings.llm_model
+    return DEFAULT_MODELS.get(name, settings.llm_model)
+
+def create_provider(name: str) -> LLMProvider:
+    if name == "openai":
+        return OpenAIProvider(model_for(name))
+    elif name == "anthropic":
+        return AnthropicProvider(model_for(name))
+    raise ValueError(f"Unsupported LLM provider: {name}")
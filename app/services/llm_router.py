@@ -0,0 +1,350 @@
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from app.config import settings
+from app.services.llm_dispatch import PRIORITY_DEFAULT, LLMDispatcher, create_dispatcher, is_retryable
+from app.services.llm_providers import LLMProvider, configured_provider_names, create_provider
+
+logger = logging.getLogger(__name__)
+
+class ProviderStats:
+    """Rolling latency and error statistics of one provider"""
+
+    def __init__(self, window: int = 100):
+        self.latencies: deque = deque(maxlen=window)
+        self.outcomes: deque = deque(maxlen=window)
+        self.successes = 0
+        self.failures = 0
+
+    def record_success(self, latency: float) -> None:
+        self.latencies.append(latency)
+        self.outcomes.append(True)
+        self.successes += 1
+
+    def record_failure(self) -> None:
+        self.outcomes.append(False)
+        self.failures += 1
+
+    def quantile(self, q: float, min_samples: int = 5) -> Optional[float]:
+        if len(self.latencies) < min_samples:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    @property
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "successes": self.successes,
+            "failures": self.failures,
+            "errorRate": self.error_rate,
+            "p50": self.quantile(0.5, min_samples=1),
+            "p95": self.quantile(0.95, min_samples=1)
+        }
+
+class CircuitBreaker:
+    """Stops routing to a provider after repeated failures, probing again after a cooldown"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+
+    def available(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN:
+            return time.monotonic() - self.opened_at >= self.cooldown
+        return not self._trial_in_flight
+
+    def begin(self) -> None:
+        """Mark an attempt as started; after a cooldown it is the single trial request"""
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            self._trial_in_flight = True
+
+    def end(self) -> None:
+        """Release the trial slot of an attempt that ended without a verdict"""
+        self._trial_in_flight = False
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        self._trial_in_flight = False
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning("LLM provider circuit opened")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+class ProviderRoute:
+    """A provider with its statistics, circuit breaker and dispatch queue"""
+
+    def __init__(self, provider: LLMProvider, dispatcher: Optional[LLMDispatcher] = None):
+        self.provider = provider
+        self.stats = ProviderStats(settings.llm_stats_window)
+        self.breaker = CircuitBreaker(
+            settings.llm_breaker_failure_threshold,
+            settings.llm_breaker_cooldown_seconds
+        )
+        self.dispatcher = dispatcher or create_dispatcher()
+
+    @property
+    def name(self) -> str:
+        return self.provider.name
+
+    def score(self) -> float:
+        """Expected latency, penalized by recent errors; untried providers score 0 so they get tried"""
+        p50 = self.stats.quantile(0.5, min_samples=1)
+        if p50 is None:
+            # Never succeeded: untried goes first, only-failed goes last
+            return math.inf if self.stats.outcomes else 0.0
+        return p50 * (1 + 4 * self.stats.error_rate)
+
+class LLMRouter:
+    """Routes completions to the fastest healthy provider, optionally hedging slow calls
+
+    With hedging on, a second request goes to the next-best provider once the
+    first has been outstanding longer than its recent p95 latency; whichever
+    succeeds first wins and the other is cancelled.
+
+    A failed call moves on to the next provider at once. Retries with backoff
+    start only after every provider has failed, on the best one whose error
+    was transient.
+    """
+
+    def __init__(
+        self,
+        providers: List[LLMProvider],
+        hedging: Optional[bool] = None,
+        hedge_quantile: Optional[float] = None,
+        hedge_min_delay: Optional[float] = None,
+        hedge_default_delay: Optional[float] = None
+    ):
+        if not providers:
+            raise ValueError("At least one LLM provider is required")
+
+        self.routes = [ProviderRoute(p) for p in providers]
+        self.hedging = settings.llm_hedging_enabled if hedging is None else hedging
+        self.hedge_quantile = settings.llm_hedge_quantile if hedge_quantile is None else hedge_quantile
+        self.hedge_min_delay = settings.llm_hedge_min_delay_seconds if hedge_min_delay is None else hedge_min_delay
+        self.hedge_default_delay = (
+            settings.llm_hedge_default_delay_seconds if hedge_default_delay is None else hedge_default_delay
+        )
+
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failovers = 0
+
+    @property
+    def signature(self) -> List[str]:
+        """Configured provider/model pairs, part of the response cache key"""
+        return [f"{r.provider.name}:{r.provider.model}" for r in self.routes]
+
+    def ranked(self) -> List[ProviderRoute]:
+        healthy = [r for r in self.routes if r.breaker.available()]
+        # With every circuit open, still try rather than fail outright
+        candidates = healthy or list(self.routes)
+        return sorted(candidates, key=lambda r: (r.score(), self.routes.index(r)))
+
+    def hedge_delay(self, route: ProviderRoute) -> float:
+        latency = route.stats.quantile(self.hedge_quantile)
+        if latency is None:
+            return self.hedge_default_delay
+        return max(self.hedge_min_delay, latency)
+
+    async def complete(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int,
+        response_format: Optional[Dict] = None,
+        priority: int = PRIORITY_DEFAULT
+    ) -> Tuple[str, int]:
+        args = (messages, temperature, max_tokens, response_format, priority)
+        candidates = self.ranked()
+
+        if self.hedging and len(candidates) > 1:
+            return await self._hedged(candidates, args)
+        return await self._with_failover(candidates, args)
+
+    async def _with_failover(
+        self,
+        routes: List[ProviderRoute],
+        args: tuple,
+        failures: Optional[List[Tuple[ProviderRoute, Exception]]] = None
+    ) -> Tuple[str, int]:
+        """Try each route once, then retry the first transient failure with backoff
+
+        failures are routes that already failed once for this request.
+        """
+        failures = list(failures or [])
+        for route in routes:
+            if failures:
+                self.failovers += 1
+            try:
+                return await self._attempt(route, args, max_retries=0)
+            except Exception as e:
+                logger.warning(f"LLM provider {route.name} failed: {e}")
+                failures.append((route, e))
+
+        for route, error in failures:
+            if is_retryable(error):
+                return await self._attempt(route, args, failed=error)
+        raise failures[-1][1]
+
+    async def _hedged(self, routes: List[ProviderRoute], args: tuple) -> Tuple[str, int]:
+        primary, secondary, rest = routes[0], routes[1], routes[2:]
+        tasks = [asyncio.ensure_future(self._attempt(primary, args, max_retries=0))]
+        try:
+            done, _pending = await asyncio.wait(tasks, timeout=self.hedge_delay(primary))
+            if done:
+                if tasks[0].exception() is None:
+                    return tasks[0].result()
+                # Primary failed outright; no race needed
+                return await self._with_failover([secondary, *rest], args, [(primary, tasks[0].exception())])
+
+            self.hedges += 1
+            tasks.append(asyncio.ensure_future(self._attempt(secondary, args, max_retries=0)))
+            pending = set(tasks)
+            failures: List[Tuple[ProviderRoute, Exception]] = []
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is tasks[1]:
+                            self.hedge_wins += 1
+                        return task.result()
+                    failures.append((primary if task is tasks[0] else secondary, task.exception()))
+
+            return await self._with_failover(rest, args, failures)
+        finally:
+            # The loser (or everything, if our caller was cancelled)
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def _attempt(
+        self,
+        route: ProviderRoute,
+        args: tuple,
+        max_retries: Optional[int] = None,
+        failed: Optional[Exception] = None
+    ) -> Tuple[str, int]:
+        messages, temperature, max_tokens, response_format, priority = args
+        timing = {}
+
+        async def call() -> Tuple[str, int]:
+            start = time.perf_counter()
+            result = await route.provider.complete(messages, temperature, max_tokens, response_format)
+            timing["latency"] = time.perf_counter() - start
+            return result
+
+        route.breaker.begin()
+        try:
+            result = await route.dispatcher.run(call, priority, max_retries, failed)
+        except asyncio.CancelledError:
+            # Lost a hedge race; says nothing about the provider's health
+            route.breaker.end()
+            raise
+        except Exception:
+            route.stats.record_failure()
+            route.breaker.record_failure()
+            raise
+
+        route.stats.record_success(timing["latency"])
+        route.breaker.record_success()
+        return result
+
+    async def stream(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int,
+        usage: Dict[str, int],
+        priority: int = PRIORITY_DEFAULT
+    ) -> AsyncIterator[str]:
+        """Stream from the best provider, failing over only before the first chunk"""
+        last_error: Optional[Exception] = None
+        for route in self.ranked():
+            started = False
+            start = time.perf_counter()
+            route.breaker.begin()
+            try:
+                async with route.dispatcher.slot(priority):
+                    async for delta in route.provider.stream(messages, temperature, max_tokens, usage):
+                        started = True
+                        yield delta
+            except Exception as e:
+                route.stats.record_failure()
+                route.breaker.record_failure()
+                if started:
+                    raise
+                logger.warning(f"LLM provider {route.name} failed to stream: {e}")
+                self.failovers += 1
+                last_error = e
+                continue
+            finally:
+                route.breaker.end()
+
+            # Whole-stream time, comparable to a completion's latency
+            route.stats.record_success(time.perf_counter() - start)
+            route.breaker.record_success()
+            return
+        raise last_error
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hedging": self.hedging,
+            "hedges": self.hedges,
+            "hedgeWins": self.hedge_wins,
+            "failovers": self.failovers,
+            "providers": [
+                {
+                    "name": r.name,
+                    "model": r.provider.model,
+                    "circuit": r.breaker.state,
+                    **r.stats.to_dict(),
+                    "dispatch": r.dispatcher.stats()
+                }
+                for r in self.routes
+            ]
+        }
+
+    async def aclose(self) -> None:
+        for route in self.routes:
+            await route.provider.aclose()
+
+_default_router: Optional[LLMRouter] = None
+
+def get_llm_router() -> LLMRouter:
+    """Router over the configured providers, shared by every LLMService in the worker"""
+    global _default_router
+    if _default_router is None:
+        _default_router = LLMRouter([create_provider(n) for n in configured_provider_names()])
+    return _default_router
+
+async def close_llm_router() -> None:
+    global _default_router
+    if _default_router is not None:
+        await _default_router.aclose()
+        _default_router = None
@@ -1,95 +1,238 @@
-from openai import AsyncOpenAI
-from anthropic import AsyncAnthropic
-from typing import Dict, Any, Optional, List
+from contextvars import ContextVar
+from typing import Dict, Any, AsyncIterator, Awaitable, Callable, Iterable, Optional, List, Tuple
 from app.config import settings
+from app.services.llm_cache import llm_response_cache
+from app.services.llm_dispatch import PRIORITY_DEFAULT
+from app.services.llm_router import LLMRouter, get_llm_router
+from app.utils.fast_json import extract_json_object, loads
+from app.utils.json_stream import StreamingJSONParser
+from app.utils.metrics import span, timed
 import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Set per request (see app.middleware.rate_limit) to charge provider token
+# usage to the calling user
+llm_usage_recorder: ContextVar[Optional[Callable[[int], Awaitable[None]]]] = ContextVar(
+    "llm_usage_recorder", default=None
+)
 
 class LLMService:
-    """Service for interacting with LLM providers"""
+    """Service for interacting with LLM providers
     
-    def __init__(self):
-        self.provider = settings.llm_provider
-        self.model = settings.llm_model
-        
-        if self.provider == "openai":
-            self.client = AsyncOpenAI(api_key=settings.openai_api_key)
-        elif self.provider == "anthropic":
-            self.client = AsyncAnthropic(api_key=settings.anthropic_api_key)
-        else:
-            raise ValueError(f"Unsupported LLM provider: {self.provider}")
+    Calls are routed across the configured providers (settings.llm_providers)
+    by LLMRouter, which fails over and optionally hedges between them.
+    """
+    
+    def __init__(self, router: Optional[LLMRouter] = None):
+        self.router = router or get_llm_router()
     
+    @timed("llm")
     async def generate_response(
         self,
         prompt: str,
         system_prompt: Optional[str] = None,
         temperature: float = 0.7,
         max_tokens: int = 2000,
-        response_format: Optional[Dict] = None
+        response_format: Optional[Dict] = None,
+        cache_ttl: Optional[int] = None,
+        priority: int = PRIORITY_DEFAULT
     ) -> str:
-        """Generate response from LLM"""
+        """Generate response from LLM
+
+        Passing cache_ttl (seconds) opts the call into the response cache, so an
+        identical request within that window is answered without the provider.
+        priority orders the call in the dispatch queue (lower runs first).
+        """
+        messages = self._build_messages(prompt, system_prompt)
+        
+        cache_key = None
+        if cache_ttl and settings.enable_llm_cache:
+            cache_key = self._cache_key(messages, temperature, max_tokens, response_format)
+            cached = await llm_response_cache.get(cache_key)
+            if cached is not None:
+                return cached
         
-        if self.provider == "openai":
-            messages = []
-            if system_prompt:
-                messages.append({"role": "system", "content": system_prompt})
-            messages.append({"role": "user", "content": prompt})
-            
-            kwargs = {
-                "model": self.model,
-                "messages": messages,
-                "temperature": temperature,
-                "max_tokens": max_tokens
-            }
-            
-            if response_format:
-                kwargs["response_format"] = response_format
-            
-            response = await self.client.chat.completions.create(**kwargs)
-            return response.choices[0].message.content
+        start = time.perf_counter()
+        text, tokens = await self.router.complete(
+            messages, temperature, max_tokens, response_format, priority
+        )
+        await self._record_usage(tokens)
         
-        elif self.provider == "anthropic":
-            system = system_prompt if system_prompt else ""
-            response = await self.client.messages.create(
-                model=self.model,
-                max_tokens=max_tokens,
-                temperature=temperature,
-                system=system,
-                messages=[{"role": "user", "content": prompt}]
+        if cache_key:
+            await llm_response_cache.set(
+                cache_key, text, tokens, time.perf_counter() - start, cache_ttl
             )
-            return response.content[0].text
+        return text
+    
+    async def stream_response(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 2000,
+        cache_ttl: Optional[int] = None,
+        priority: int = PRIORITY_DEFAULT
+    ) -> AsyncIterator[str]:
+        """Stream the completion as text deltas
+
+        Shares cache entries with generate_response for identical requests; a
+        cached completion is yielded as a single chunk.
+        """
+        messages = self._build_messages(prompt, system_prompt)
+        
+        cache_key = None
+        if cache_ttl and settings.enable_llm_cache:
+            cache_key = self._cache_key(messages, temperature, max_tokens, None)
+            cached = await llm_response_cache.get(cache_key)
+            if cached is not None:
+                yield cached
+                return
+        
+        start = time.perf_counter()
+        usage = {"tokens": 0}
+        parts = []
+        # Includes time the consumer spends between chunks
+        with span("llm_stream"):
+            async for delta in self.router.stream(messages, temperature, max_tokens, usage, priority):
+                parts.append(delta)
+                yield delta
+        await self._record_usage(usage["tokens"])
+        
+        if cache_key:
+            await llm_response_cache.set(
+                cache_key, "".join(parts), usage["tokens"], time.perf_counter() - start, cache_ttl
+            )
+    
+    async def _record_usage(self, tokens: int) -> None:
+        recorder = llm_usage_recorder.get()
+        if recorder is None or not tokens:
+            return
+        try:
+            await recorder(tokens)
+        except Exception as e:
+            logger.warning(f"Failed to record LLM usage: {e}")
+    
+    def _build_messages(self, prompt: str, system_prompt: Optional[str]) -> List[Dict[str, str]]:
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        messages.append({"role": "user", "content": prompt})
+        return messages
+    
+    def _cache_key(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int,
+        response_format: Optional[Dict]
+    ) -> str:
+        # Any configured provider may answer, so the whole set is part of the key
+        return llm_response_cache.make_key(
+            providers=self.router.signature,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            response_format=response_format
+        )
     
     async def generate_structured_response(
         self,
         prompt: str,
         system_prompt: Optional[str] = None,
-        schema: Optional[Dict] = None
+        schema: Optional[Dict] = None,
+        cache_ttl: Optional[int] = None,
+        priority: int = PRIORITY_DEFAULT,
+        max_tokens: int = 2000
     ) -> Dict[str, Any]:
-        """Generate structured JSON response"""
+        """Generate structured JSON response
+
+        A completion that doesn't parse is dropped from the response cache, so
+        the next identical request asks the provider again instead of replaying it.
+        """
         
-        if self.provider == "openai" and schema:
-            # Use JSON mode for OpenAI
+        response_format = None
+        if schema:
+            # JSON mode where the provider supports it (OpenAI); others rely on the prompt
             response_format = {"type": "json_object"}
-            system_with_schema = f"{system_prompt}\n\nRespond in valid JSON matching this schema: {json.dumps(schema)}"
-            
-            response = await self.generate_response(
-                prompt,
-                system_prompt=system_with_schema,
-                response_format=response_format
-            )
+            system_prompt = f"{system_prompt}\n\nRespond in valid JSON matching this schema: {json.dumps(schema)}"
         else:
-            # For other providers or no schema, ask for JSON in prompt
-            json_prompt = f"{prompt}\n\nRespond with valid JSON only."
-            response = await self.generate_response(
-                json_prompt,
-                system_prompt=system_prompt
-            )
+            # No schema, ask for JSON in prompt
+            prompt = f"{prompt}\n\nRespond with valid JSON only."
+        
+        response = await self.generate_response(
+            prompt,
+            system_prompt=system_prompt,
+            max_tokens=max_tokens,
+            response_format=response_format,
+            cache_ttl=cache_ttl,
+            priority=priority
+        )
+        try:
+            return self._parse_json(response)
+        except ValueError:
+            if cache_ttl:
+                await self._uncache(prompt, system_prompt, max_tokens=max_tokens, response_format=response_format)
+            raise
+    
+    async def stream_structured_response(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        paths: Iterable[Tuple[Any, ...]] = (),
+        cache_ttl: Optional[int] = None,
+        priority: int = PRIORITY_DEFAULT
+    ) -> AsyncIterator[Tuple[Tuple[Any, ...], Any]]:
+        """Stream a JSON response, yielding (path, value) as each watched value completes
+
+        The whole document is yielded last under the empty path ().
+        """
+        json_prompt = f"{prompt}\n\nRespond with valid JSON only."
+        parser = StreamingJSONParser(set(paths) | {()})
+        
+        async for delta in self.stream_response(
+            json_prompt,
+            system_prompt=system_prompt,
+            cache_ttl=cache_ttl,
+            priority=priority
+        ):
+            for path, value in parser.feed(delta):
+                yield path, value
         
+        if not parser.done:
+            # Truncated or malformed output; fall back to the lenient parser
+            try:
+                document = self._parse_json(parser.text)
+            except ValueError:
+                if cache_ttl:
+                    await self._uncache(json_prompt, system_prompt)
+                raise
+            yield (), document
+    
+    async def _uncache(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 2000,
+        response_format: Optional[Dict] = None
+    ) -> None:
+        """Drop the cached completion of the matching generate_response / stream_response call"""
+        if settings.enable_llm_cache:
+            messages = self._build_messages(prompt, system_prompt)
+            await llm_response_cache.delete(
+                self._cache_key(messages, temperature, max_tokens, response_format)
+            )
+    
+    @timed("json_parse")
+    def _parse_json(self, response: str) -> Dict[str, Any]:
         try:
-            return json.loads(response)
-        except json.JSONDecodeError:
-            # Fallback: try to extract JSON from response
-            import re
-            json_match = re.search(r'\{.*\}', response, re.DOTALL)
-            if json_match:
-                return json.loads(json_match.group())
-            raise ValueError("Failed to parse JSON response")
\ No newline at end of file
+            return loads(response)
+        except ValueError:
+            # Prose or code fences around the object
+            parsed = extract_json_object(response)
+            if parsed is None:
+                raise ValueError("Failed to parse JSON response")
+            return parsed
\ No newline at end of file
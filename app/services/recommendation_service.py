@@ -1,28 +1,35 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, AsyncIterator, Awaitable, Callable, Optional, Tuple
+from app.config import settings
+from app.dependencies import get_database_service
+from app.models.user_data import UserContext
+from app.services.context_queries import (
+    NEXT_STEPS_PER_ROADMAP,
+    PROFILE_GOALS,
+    PROFILE_NOTE_ASSIST,
+    PROFILE_ROADMAP_ASSIST,
+    RECENT_NOTES_DAYS,
+    is_filtered
+)
+from app.services.llm_dispatch import PRIORITY_DEFAULT, PRIORITY_INTERACTIVE
 from app.services.llm_service import LLMService
 from app.services.database_service import DatabaseService
-from datetime import datetime, timedelta
+from app.services.embedding_service import embedding_service
+from app.services.roadmap_templates import personalize, roadmap_templates
+from app.utils.cache import LRUCache
+from app.utils.etag import etag_matches, make_etag
+from app.utils.fast_json import dumps
+from app.utils.metrics import timed
+from app.utils.tiered_cache import create_tiered_cache
+from app.utils.text_processing import estimate_tokens, fill_budget, snippet, split_chunks
+from datetime import datetime, timezone
+import asyncio
+import itertools
+import logging
+import time
 
-class RecommendationService:
-    """Service for generating AI recommendations"""
-    
-    def __init__(self):
-        self.llm_service = LLMService()
-        self.db_service = DatabaseService()
-    
-    async def generate_daily_goals(
-        self,
-        user_id: int,
-        auth_token: str
-    ) -> List[Dict[str, Any]]:
-        """Generate daily study goals for user"""
-        
-        # Fetch user context
-        context = await self.db_service.get_user_context(user_id, auth_token)
-        stats = await self.db_service.get_user_stats(user_id, auth_token)
-        
-        # Prepare prompt
-        system_prompt = """You are an AI tutor helping students with their learning. 
+logger = logging.getLogger(__name__)
+
+DAILY_GOALS_SYSTEM_PROMPT = """You are an AI tutor helping students with their learning. 
         Analyze the user's study data and suggest 3-5 daily goals that are:
         1. Specific and actionable
         2. Based on their incomplete roadmaps and recent notes
@@ -46,39 +53,11 @@ class RecommendationService:
                 }
             ]
         }"""
-        
-        user_prompt = f"""User's study context:
-        - Total notes: {stats['totalNotes']}
-        - Total roadmaps: {stats['totalRoadmaps']}
-        - Completion rate: {stats['completionRate']:.1%}
-        
-        Incomplete roadmap steps:
-        {self._format_incomplete_steps(context.get('roadmaps', []))}
-        
-        Recent notes (last 7 days):
-        {self._format_recent_notes(context.get('notes', []))}
-        
-        Suggest daily goals for today."""
-        
-        response = await self.llm_service.generate_structured_response(
-            user_prompt,
-            system_prompt=system_prompt
-        )
-        
-        return response.get("goals", [])
-    
-    async def assist_roadmap_creation(
-        self,
-        user_id: int,
-        topic: str,
-        description: Optional[str],
-        auth_token: str
-    ) -> Dict[str, Any]:
-        """Assist in creating a roadmap for a topic"""
-        
-        context = await self.db_service.get_user_context(user_id, auth_token)
-        
-        system_prompt = """You are an AI tutor helping create learning roadmaps.
+
+# Part of the daily goals ETag; bump when the goals prompts change so clients refetch
+DAILY_GOALS_PROMPT_VERSION = 1
+
+ROADMAP_SYSTEM_PROMPT = """You are an AI tutor helping create learning roadmaps.
         Create a structured learning roadmap that breaks down a topic into manageable steps.
         Each step should be:
         1. Clear and specific
@@ -102,44 +81,39 @@ class RecommendationService:
                     }
                 ]
             },
-            "reasoning": "Why this structure",
-            "relatedNotes": [1, 2, 3]
+            "reasoning": "Why this structure"
         }"""
+
+ROADMAP_PERSONALIZE_SYSTEM_PROMPT = """You are an AI tutor adapting an existing learning roadmap to one learner.
+        You are given the roadmap's steps and what the learner already has notes on.
+        Don't rewrite the roadmap; only list adjustments:
+        1. Steps the learner clearly already knows (to skip)
+        2. A one-sentence note for steps that connect to what they know
+        3. At most two extra steps their goal needs that the roadmap lacks
         
-        user_prompt = f"""Create a learning roadmap for:
-        Topic: {topic}
-        Description: {description or 'No description provided'}
-        
-        User's existing knowledge (from their notes):
-        {self._format_user_knowledge(context.get('notes', []))}
-        
-        Suggest a comprehensive roadmap."""
-        
-        response = await self.llm_service.generate_structured_response(
-            user_prompt,
-            system_prompt=system_prompt
-        )
-        
-        return response
-    
-    async def assist_note_creation(
-        self,
-        user_id: int,
-        content: str,
-        title: Optional[str],
-        auth_token: str
-    ) -> Dict[str, Any]:
-        """Assist in creating/improving a note"""
-        
-        context = await self.db_service.get_user_context(user_id, auth_token)
-        
-        system_prompt = """You are an AI tutor helping improve study notes.
+        Return JSON with this structure:
+        {
+            "skipSteps": [2, 3],
+            "stepNotes": [{"order": 4, "note": "Note for this learner"}],
+            "extraSteps": [
+                {
+                    "after": 5,
+                    "title": "Step title",
+                    "description": "What to learn",
+                    "estimatedTime": 60,
+                    "prerequisites": ["topic1"],
+                    "learningObjectives": ["objective1"]
+                }
+            ],
+            "reasoning": "Why this roadmap suits the learner"
+        }"""
+
+NOTE_SYSTEM_PROMPT = """You are an AI tutor helping improve study notes.
         Analyze the note content and provide suggestions for:
         1. Better title (if missing or unclear)
         2. Improved content structure
         3. Relevant tags based on content
-        4. Related notes from user's collection
-        5. Content gaps or areas needing more detail
+        4. Content gaps or areas needing more detail
         
         Return JSON with this structure:
         {
@@ -147,14 +121,6 @@ class RecommendationService:
                 "title": "Suggested title",
                 "improvedContent": "Improved content (if significant changes)",
                 "suggestedTags": ["tag1", "tag2"],
-                "relatedNotes": [
-                    {
-                        "id": 1,
-                        "title": "Note title",
-                        "relevance": 0.85,
-                        "reason": "Why it's related"
-                    }
-                ],
                 "contentGaps": ["gap1", "gap2"],
                 "improvements": [
                     {
@@ -165,56 +131,746 @@ class RecommendationService:
                 ]
             }
         }"""
+
+NOTE_SECTION_SYSTEM_PROMPT = """You are an AI tutor analyzing one section of a long study note.
+        Summarize what the section covers and what could be improved in it.
         
-        user_prompt = f"""Analyze this note:
+        Return JSON with this structure:
+        {
+            "summary": "Two or three sentences on what the section covers",
+            "topics": ["topic1", "topic2"],
+            "suggestedTags": ["tag1", "tag2"],
+            "contentGaps": ["gap1", "gap2"],
+            "improvements": [
+                {
+                    "type": "structure" | "clarity" | "completeness",
+                    "suggestion": "What to improve",
+                    "location": "Where in the section"
+                }
+            ]
+        }"""
+
+NOTE_MERGE_SYSTEM_PROMPT = """You are an AI tutor helping improve study notes.
+        The note is too long to read at once; you are given an analysis of
+        each of its sections, in order. Combine them into suggestions for the
+        whole note:
+        1. Better title (if missing or unclear)
+        2. Improved structure across sections
+        3. Relevant tags, merged and deduplicated
+        4. Content gaps in the note as a whole
+        
+        Return JSON with this structure:
+        {
+            "suggestions": {
+                "title": "Suggested title",
+                "improvedContent": "",
+                "suggestedTags": ["tag1", "tag2"],
+                "contentGaps": ["gap1", "gap2"],
+                "improvements": [
+                    {
+                        "type": "structure" | "clarity" | "completeness",
+                        "suggestion": "What to improve",
+                        "location": "Section number and where in it"
+                    }
+                ]
+            }
+        }
+        Leave improvedContent empty; the note is too long to rewrite."""
+
+# Streamed JSON paths and the server-sent event each one is emitted as
+ROADMAP_STREAM_EVENTS = {
+    ("suggestedRoadmap", "title"): "title",
+    ("suggestedRoadmap", "description"): "description",
+    ("suggestedRoadmap", "steps", "*"): "step",
+    ("reasoning",): "reasoning"
+}
+
+NOTE_SUGGESTION_SECTIONS = [
+    "title",
+    "improvedContent",
+    "suggestedTags",
+    "contentGaps",
+    "improvements"
+]
+
+# user id -> (UTC day, context version, goals). Read only after the caller's
+# own context fetch, and served only for the same context version, so the
+# backend has authorized the caller for the data the goals came from
+daily_goals_cache = LRUCache(
+    max_entries=settings.daily_goals_cache_size,
+    default_ttl=86400
+)
+
+# Shared through Redis when enabled, so goals pre-computed by one worker are
+# served by all of them
+shared_daily_goals = create_tiered_cache("daily_goals", l1=daily_goals_cache, decode=tuple)
+
+async def get_daily_goals_entry(user_id: int) -> Optional[Tuple[str, str, List[Dict[str, Any]]]]:
+    """The cached (UTC day, context version, goals) of a user, from Redis when enabled"""
+    if shared_daily_goals is not None:
+        return await shared_daily_goals.get(user_id)
+    return daily_goals_cache.get(user_id)
+
+class RecommendationService:
+    """Service for generating AI recommendations"""
+    
+    def __init__(self, db_service: Optional[DatabaseService] = None):
+        self.llm_service = LLMService()
+        self.db_service = db_service or get_database_service()
+        self.embedding_service = embedding_service
+    
+    async def generate_daily_goals(
+        self,
+        user_id: int,
+        auth_token: str,
+        priority: int = PRIORITY_DEFAULT
+    ) -> List[Dict[str, Any]]:
+        """Generate daily study goals for user
+        
+        Goals are generated at most once a day per context version, so goals
+        pre-computed by the scheduler are returned without an LLM call until
+        the user's notes or roadmaps change.
+        """
+        context, stats = await self._goals_context(user_id, auth_token)
+        return await self._daily_goals(user_id, context, stats, priority)
+    
+    async def daily_goals_if_changed(
+        self,
+        user_id: int,
+        auth_token: str,
+        if_none_match: Optional[str] = None
+    ) -> Tuple[str, Optional[List[Dict[str, Any]]]]:
+        """Today's goals with their ETag, or (ETag, None) when if_none_match names them
+        
+        The ETag covers the user, the UTC day, the context version and
+        DAILY_GOALS_PROMPT_VERSION, so a client that already holds the goals
+        for all four is answered after the (usually cached) context fetch,
+        without an LLM call.
+        """
+        context, stats = await self._goals_context(user_id, auth_token)
+        today = datetime.now(timezone.utc).date().isoformat()
+        etag = make_etag(user_id, today, context.version, DAILY_GOALS_PROMPT_VERSION)
+        if if_none_match:
+            # "*" only matches goals that have already been generated
+            cached = await get_daily_goals_entry(user_id)
+            exists = cached is not None and cached[:2] == (today, context.version)
+            if etag_matches(if_none_match, etag, exists):
+                return etag, None
+        return etag, await self._daily_goals(user_id, context, stats, PRIORITY_DEFAULT)
+    
+    async def _goals_context(self, user_id: int, auth_token: str) -> Tuple[UserContext, Dict[str, Any]]:
+        if is_filtered(PROFILE_GOALS):
+            # Server-side filtered lists don't add up to totals
+            return await asyncio.gather(
+                self.db_service.get_user_context(user_id, auth_token, PROFILE_GOALS),
+                self.db_service.get_user_stats(user_id, auth_token)
+            )
+        context = await self.db_service.get_user_context(user_id, auth_token, PROFILE_GOALS)
+        return context, context.stats
+    
+    async def _daily_goals(
+        self,
+        user_id: int,
+        context: UserContext,
+        stats: Dict[str, Any],
+        priority: int
+    ) -> List[Dict[str, Any]]:
+        today = datetime.now(timezone.utc).date().isoformat()
+        cached = await get_daily_goals_entry(user_id)
+        if cached is not None and cached[:2] == (today, context.version):
+            return cached[2]
+        
+        response = await self.llm_service.generate_structured_response(
+            self._goals_prompt(context, stats),
+            system_prompt=DAILY_GOALS_SYSTEM_PROMPT,
+            cache_ttl=settings.llm_cache_ttl_daily_goals,
+            priority=priority
+        )
+        
+        goals = response.get("goals", [])
+        if shared_daily_goals is not None:
+            await shared_daily_goals.set(user_id, (today, context.version, goals), ttl=86400)
+        else:
+            daily_goals_cache.set(user_id, (today, context.version, goals))
+        return goals
+    
+    async def generate_daily_goals_batch(
+        self,
+        user_ids: List[int],
+        auth_token: str,
+        concurrency: int = 8,
+        admit: Optional[Callable[[int], Awaitable[None]]] = None
+    ) -> AsyncIterator[Tuple[int, Optional[List[Dict[str, Any]]], Optional[Exception]]]:
+        """Generate goals for many users, yielding (user id, goals, error) as each finishes
+        
+        At most concurrency users are in flight at once; one user's failure is
+        yielded as its error and doesn't stop the others. admit runs in each
+        user's task before generation and may raise to reject that user.
+        """
+        slots = asyncio.Semaphore(concurrency)
+        
+        async def generate(user_id: int):
+            async with slots:
+                try:
+                    if admit is not None:
+                        await admit(user_id)
+                    return user_id, await self.generate_daily_goals(user_id, auth_token), None
+                except Exception as e:
+                    logger.warning(f"Daily goals for user {user_id} failed: {e}")
+                    return user_id, None, e
+        
+        tasks = [asyncio.ensure_future(generate(user_id)) for user_id in dict.fromkeys(user_ids)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # Client went away mid-batch
+            for task in tasks:
+                task.cancel()
+    
+    async def assist_roadmap_creation(
+        self,
+        user_id: int,
+        topic: str,
+        description: Optional[str],
+        auth_token: str
+    ) -> Dict[str, Any]:
+        """Assist in creating a roadmap for a topic"""
+        
+        context = await self.db_service.get_user_context(user_id, auth_token, PROFILE_ROADMAP_ASSIST)
+        
+        # Related notes come from the embedding index, not the LLM
+        response, related = await asyncio.gather(
+            self._roadmap_response(context, topic, description),
+            self._related_notes(user_id, context, f"{topic}\n{description or ''}")
+        )
+        
+        response["relatedNotes"] = [note_id for note_id, _score in related]
+        return response
+    
+    async def stream_roadmap_creation(
+        self,
+        user_id: int,
+        topic: str,
+        description: Optional[str],
+        auth_token: str
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """Stream a roadmap suggestion as (event, data) pairs, one step at a time
+        
+        A stored template is personalized and sent in the same events; on a
+        template miss the full roadmap is streamed as it is generated.
+        """
+        
+        context = await self.db_service.get_user_context(user_id, auth_token, PROFILE_ROADMAP_ASSIST)
+        related_task = asyncio.ensure_future(
+            self._related_notes(user_id, context, f"{topic}\n{description or ''}")
+        )
+        related_ids = None
+        
+        try:
+            template = await roadmap_templates.find(topic) if settings.roadmap_templates_enabled else None
+            if template is not None:
+                # Personalizing a template is one short call; send its result in the usual events
+                response = await self._personalized_roadmap(context, template, topic, description)
+                roadmap = response["suggestedRoadmap"]
+                yield "title", roadmap.get("title")
+                yield "description", roadmap.get("description")
+                for step in roadmap["steps"]:
+                    yield "step", step
+                yield "reasoning", response["reasoning"]
+                related_ids = [note_id for note_id, _score in await related_task]
+                yield "relatedNotes", related_ids
+                response["relatedNotes"] = related_ids
+                yield "result", response
+                return
+            
+            async for path, value in self.llm_service.stream_structured_response(
+                self._roadmap_prompt(context, topic, description),
+                system_prompt=ROADMAP_SYSTEM_PROMPT,
+                paths=ROADMAP_STREAM_EVENTS.keys(),
+                cache_ttl=settings.llm_cache_ttl_roadmap_assist,
+                priority=PRIORITY_INTERACTIVE
+            ):
+                # Emit related notes as soon as the index answers
+                if related_ids is None and related_task.done():
+                    related_ids = [note_id for note_id, _score in related_task.result()]
+                    yield "relatedNotes", related_ids
+                
+                if path:
+                    yield ROADMAP_STREAM_EVENTS[path], value
+                else:
+                    if related_ids is None:
+                        related_ids = [note_id for note_id, _score in await related_task]
+                        yield "relatedNotes", related_ids
+                    value["relatedNotes"] = related_ids
+                    yield "result", value
+        finally:
+            related_task.cancel()
+    
+    async def assist_note_creation(
+        self,
+        user_id: int,
+        content: str,
+        title: Optional[str],
+        auth_token: str
+    ) -> Dict[str, Any]:
+        """Assist in creating/improving a note
+        
+        Content over settings.note_chunk_threshold_tokens is analyzed section
+        by section (see _analyze_sections) and the analyses merged in one
+        more call.
+        """
+        
+        context = await self.db_service.get_user_context(user_id, auth_token, PROFILE_NOTE_ASSIST)
+        related_task = asyncio.ensure_future(
+            self._related_notes(user_id, context, f"{title or ''}\n{content}")
+        )
+        
+        try:
+            chunks = self._note_chunks(content)
+            if chunks:
+                sections = [None] * len(chunks)
+                async for index, analysis in self._analyze_sections(chunks):
+                    sections[index] = analysis
+                prompt = self._note_merge_prompt(context, chunks, sections, title)
+                system_prompt = NOTE_MERGE_SYSTEM_PROMPT
+            else:
+                prompt = self._note_prompt(context, content, title)
+                system_prompt = NOTE_SYSTEM_PROMPT
+            
+            response = await self.llm_service.generate_structured_response(
+                prompt,
+                system_prompt=system_prompt,
+                cache_ttl=settings.llm_cache_ttl_note_assist,
+                priority=PRIORITY_INTERACTIVE
+            )
+            related = await related_task
+        finally:
+            related_task.cancel()
+        
+        suggestions = response.get("suggestions", {})
+        suggestions["relatedNotes"] = self._format_related_notes(context, related)
+        return suggestions
+    
+    async def stream_note_assistance(
+        self,
+        user_id: int,
+        content: str,
+        title: Optional[str],
+        auth_token: str
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """Stream note suggestions as (event, data) pairs, one section at a time"""
+        
+        context = await self.db_service.get_user_context(user_id, auth_token, PROFILE_NOTE_ASSIST)
+        related_task = asyncio.ensure_future(
+            self._related_notes(user_id, context, f"{title or ''}\n{content}")
+        )
+        related_notes = None
+        
+        try:
+            chunks = self._note_chunks(content)
+            if chunks:
+                # Progress while the sections are analyzed, before any suggestion exists
+                sections = [None] * len(chunks)
+                done = 0
+                async for index, analysis in self._analyze_sections(chunks):
+                    sections[index] = analysis
+                    done += 1
+                    yield "progress", {"sectionsAnalyzed": done, "sections": len(chunks)}
+                prompt = self._note_merge_prompt(context, chunks, sections, title)
+                system_prompt = NOTE_MERGE_SYSTEM_PROMPT
+            else:
+                prompt = self._note_prompt(context, content, title)
+                system_prompt = NOTE_SYSTEM_PROMPT
+            
+            async for path, value in self.llm_service.stream_structured_response(
+                prompt,
+                system_prompt=system_prompt,
+                paths=[("suggestions", section) for section in NOTE_SUGGESTION_SECTIONS],
+                cache_ttl=settings.llm_cache_ttl_note_assist,
+                priority=PRIORITY_INTERACTIVE
+            ):
+                if related_notes is None and related_task.done():
+                    related_notes = self._format_related_notes(context, related_task.result())
+                    yield "suggestion", {"section": "relatedNotes", "value": related_notes}
+                
+                if path:
+                    yield "suggestion", {"section": path[1], "value": value}
+                else:
+                    if related_notes is None:
+                        related_notes = self._format_related_notes(context, await related_task)
+                        yield "suggestion", {"section": "relatedNotes", "value": related_notes}
+                    suggestions = value.get("suggestions", {})
+                    suggestions["relatedNotes"] = related_notes
+                    yield "result", suggestions
+        finally:
+            related_task.cancel()
+    
+    async def _roadmap_response(
+        self,
+        context: UserContext,
+        topic: str,
+        description: Optional[str]
+    ) -> Dict[str, Any]:
+        if settings.roadmap_templates_enabled:
+            return await self._templated_roadmap(context, topic, description)
+        return await self.llm_service.generate_structured_response(
+            self._roadmap_prompt(context, topic, description),
+            system_prompt=ROADMAP_SYSTEM_PROMPT,
+            cache_ttl=settings.llm_cache_ttl_roadmap_assist,
+            priority=PRIORITY_INTERACTIVE
+        )
+    
+    async def _templated_roadmap(
+        self,
+        context: UserContext,
+        topic: str,
+        description: Optional[str]
+    ) -> Dict[str, Any]:
+        """The shared roadmap for topic, adjusted to the user's notes by a short call"""
+        template, _stored = await roadmap_templates.get_or_create(
+            topic, lambda: self._generate_template(topic)
+        )
+        return await self._personalized_roadmap(context, template, topic, description)
+    
+    async def _personalized_roadmap(
+        self,
+        context: UserContext,
+        template: Dict[str, Any],
+        topic: str,
+        description: Optional[str]
+    ) -> Dict[str, Any]:
+        """template adjusted to the user's notes; as is if the personalization call fails"""
+        prompt = self._personalize_prompt(context, template, topic, description)
+        try:
+            adjustments = await self.llm_service.generate_structured_response(
+                prompt,
+                system_prompt=ROADMAP_PERSONALIZE_SYSTEM_PROMPT,
+                cache_ttl=settings.llm_cache_ttl_roadmap_assist,
+                priority=PRIORITY_INTERACTIVE,
+                max_tokens=settings.roadmap_personalize_max_tokens
+            )
+        except Exception as e:
+            logger.warning(f"Roadmap personalization failed, serving the template: {e}")
+            adjustments = {}
+        roadmap_templates.record_personalization(
+            estimate_tokens(ROADMAP_PERSONALIZE_SYSTEM_PROMPT + prompt) + estimate_tokens(dumps(adjustments).decode())
+        )
+        return personalize(template, adjustments)
+    
+    async def _generate_template(self, topic: str) -> Dict[str, Any]:
+        """Roadmap for topic from no prior knowledge, with no user data in the prompt"""
+        prompt = f"""Create a learning roadmap for:
+        Topic: {topic}
+        
+        The roadmap will be shared by every learner of this topic, so assume
+        no prior knowledge of it.
+        
+        Suggest a comprehensive roadmap."""
+        template = await self.llm_service.generate_structured_response(
+            prompt,
+            system_prompt=ROADMAP_SYSTEM_PROMPT,
+            priority=PRIORITY_INTERACTIVE
+        )
+        if not (template.get("suggestedRoadmap") or {}).get("steps"):
+            raise ValueError("Roadmap template has no steps")
+        # What a later hit on this template saves
+        template["tokens"] = estimate_tokens(ROADMAP_SYSTEM_PROMPT + prompt) + estimate_tokens(dumps(template).decode())
+        return template
+    
+    def estimate_note_analysis(self, content: str) -> Tuple[int, int]:
+        """(sections, input tokens) of analyzing content; no sections when it fits one prompt
+        
+        The tokens cover the section analyses of a long note, or the single
+        prompt's note text, so callers can check them against a budget first.
+        """
+        chunks = self._note_chunks(content)
+        if not chunks:
+            return 0, estimate_tokens(NOTE_SYSTEM_PROMPT) + estimate_tokens(content)
+        system_tokens = estimate_tokens(NOTE_SECTION_SYSTEM_PROMPT)
+        return len(chunks), sum(system_tokens + estimate_tokens(chunk) for chunk in chunks)
+    
+    def _note_chunks(self, content: str) -> Optional[List[str]]:
+        """Sections of content too long for one prompt, None when it fits"""
+        if estimate_tokens(content) <= settings.note_chunk_threshold_tokens:
+            return None
+        return split_chunks(content, settings.note_chunk_max_tokens)
+    
+    async def _analyze_sections(
+        self,
+        chunks: List[str]
+    ) -> AsyncIterator[Tuple[int, Optional[Dict[str, Any]]]]:
+        """Analyze each section, yielding (index, analysis) as each finishes
+        
+        A section's prompt holds only its own text, so the LLM response cache
+        keys it by content: after an edit only the changed sections are
+        analyzed again. A failed section is yielded as None and the merge
+        goes ahead without it.
+        """
+        slots = asyncio.Semaphore(settings.note_chunk_concurrency)
+        
+        async def analyze(index: int, chunk: str):
+            async with slots:
+                try:
+                    return index, await self.llm_service.generate_structured_response(
+                        f"Analyze this section of a note:\n{chunk}",
+                        system_prompt=NOTE_SECTION_SYSTEM_PROMPT,
+                        cache_ttl=settings.llm_cache_ttl_note_chunk,
+                        priority=PRIORITY_INTERACTIVE
+                    )
+                except Exception as e:
+                    logger.warning(f"Note section analysis failed: {e}")
+                    return index, None
+        
+        tasks = [asyncio.ensure_future(analyze(i, chunk)) for i, chunk in enumerate(chunks)]
+        try:
+            failed = 0
+            for next_done in asyncio.as_completed(tasks):
+                index, analysis = await next_done
+                failed += analysis is None
+                yield index, analysis
+            if failed == len(chunks):
+                raise ValueError("Failed to analyze any section of the note")
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    @timed("related_notes")
+    async def _related_notes(
+        self,
+        user_id: int,
+        context: UserContext,
+        text: str
+    ) -> List[Tuple[int, float]]:
+        """Nearest notes by embedding similarity; an embedding outage only loses this section"""
+        try:
+            return await self.embedding_service.related_notes(
+                user_id,
+                context.notes,
+                text,
+                k=settings.related_notes_limit,
+                min_score=settings.related_notes_min_similarity
+            )
+        except Exception:
+            logger.exception("Related-note lookup failed")
+            return []
+    
+    def _format_related_notes(
+        self,
+        context: UserContext,
+        related: List[Tuple[int, float]]
+    ) -> List[Dict[str, Any]]:
+        return [
+            {
+                "id": note_id,
+                "title": (context.note(note_id) or {}).get("title"),
+                "relevance": round(score, 3),
+                "reason": "Similar content"
+            }
+            for note_id, score in related
+        ]
+    
+    @timed("prompt_build")
+    def _goals_prompt(self, context: UserContext, stats: Dict[str, Any]) -> str:
+        """Build the user prompt for daily goals"""
+        return f"""User's study context:
+        - Total notes: {stats['totalNotes']}
+        - Total roadmaps: {stats['totalRoadmaps']}
+        - Completion rate: {stats['completionRate']:.1%}
+        
+        Incomplete roadmap steps:
+        {self._format_incomplete_steps(
+            context,
+            int(settings.prompt_token_budget_daily_goals * 0.6)
+        )}
+        
+        Recent notes (last 7 days):
+        {self._format_recent_notes(
+            context,
+            int(settings.prompt_token_budget_daily_goals * 0.4)
+        )}
+        
+        Suggest daily goals for today."""
+    
+    @timed("prompt_build")
+    def _roadmap_prompt(
+        self,
+        context: UserContext,
+        topic: str,
+        description: Optional[str]
+    ) -> str:
+        """Build the user prompt for roadmap suggestions"""
+        return f"""Create a learning roadmap for:
+        Topic: {topic}
+        Description: {description or 'No description provided'}
+        
+        User's existing knowledge (from their notes):
+        {self._format_user_knowledge(
+            context,
+            f"{topic} {description or ''}",
+            settings.prompt_token_budget_roadmap_assist
+        )}
+        
+        Suggest a comprehensive roadmap."""
+    
+    @timed("prompt_build")
+    def _personalize_prompt(
+        self,
+        context: UserContext,
+        template: Dict[str, Any],
+        topic: str,
+        description: Optional[str]
+    ) -> str:
+        """Build the user prompt that adapts a roadmap template to the user"""
+        steps = "\n".join(
+            f"{step.get('order')}. {step.get('title', '')}"
+            for step in template["suggestedRoadmap"]["steps"]
+        )
+        return f"""Adapt this roadmap for a learner:
+        Topic: {topic}
+        Learner's goal: {description or 'No description provided'}
+        
+        Roadmap steps:
+        {steps}
+        
+        Learner's existing knowledge (from their notes):
+        {self._format_user_knowledge(
+            context,
+            f"{topic} {description or ''}",
+            settings.prompt_token_budget_roadmap_assist
+        ) or 'No related notes'}
+        
+        List the adjustments."""
+    
+    @timed("prompt_build")
+    def _note_prompt(
+        self,
+        context: UserContext,
+        content: str,
+        title: Optional[str]
+    ) -> str:
+        """Build the user prompt for note suggestions"""
+        return f"""Analyze this note:
         Title: {title or 'No title'}
         Content: {content}
         
         User's existing notes for context:
-        {self._format_notes_summary(context.get('notes', []))}
+        {self._format_notes_summary(
+            context,
+            f"{title or ''} {content}",
+            settings.prompt_token_budget_note_assist
+        )}
         
         Provide suggestions."""
+    
+    @timed("prompt_build")
+    def _note_merge_prompt(
+        self,
+        context: UserContext,
+        chunks: List[str],
+        sections: List[Optional[Dict[str, Any]]],
+        title: Optional[str]
+    ) -> str:
+        """Build the user prompt that merges section analyses of a long note
         
-        response = await self.llm_service.generate_structured_response(
-            user_prompt,
-            system_prompt=system_prompt
-        )
+        Each section gets an equal share of settings.prompt_token_budget_note_merge,
+        filled with its summary first and its details as far as they fit.
+        """
+        budget = settings.prompt_token_budget_note_merge // len(chunks)
+        lines = []
+        topics = []
+        for number, (chunk, analysis) in enumerate(zip(chunks, sections), 1):
+            lines.append(f'{number}. Starts "{snippet(chunk, max_chars=60)}"')
+            if analysis is None:
+                lines.append("   (not analyzed)")
+                continue
+            topics.extend(analysis.get("topics") or [])
+            details = [f"   Summary: {analysis.get('summary', '')}"]
+            for label, field in (("Topics", "topics"), ("Tags", "suggestedTags"), ("Gaps", "contentGaps")):
+                if analysis.get(field):
+                    details.append(f"   {label}: {', '.join(map(str, analysis[field]))}")
+            details.extend(
+                f"   Improve ({improvement.get('type', 'clarity')}): {improvement.get('suggestion', '')}"
+                f" [{improvement.get('location', '')}]"
+                for improvement in analysis.get("improvements") or []
+            )
+            lines.extend(fill_budget(details, budget))
+        overview = "\n".join(lines)
+        
+        return f"""Combine these section analyses of a note:
+        Title: {title or 'No title'}
+        
+        Sections:
+        {overview}
+        
+        User's existing notes for context:
+        {self._format_notes_summary(
+            context,
+            f"{title or ''} {' '.join(map(str, topics))}",
+            settings.prompt_token_budget_note_assist
+        )}
         
-        return response.get("suggestions", {})
-    
-    def _format_incomplete_steps(self, roadmaps: List[Dict]) -> str:
-        """Format incomplete roadmap steps for prompt"""
-        result = []
-        for roadmap in roadmaps:
-            incomplete = [s for s in roadmap.get("steps", []) if not s.get("isCompleted", False)]
-            if incomplete:
-                result.append(f"\n{roadmap['title']}:")
-                for step in incomplete:
-                    result.append(f"  - Step {step['order']}: {step['title']}")
+        Provide suggestions for the whole note."""
+    
+    def _format_incomplete_steps(self, context: UserContext, budget_tokens: int) -> str:
+        """Format the next incomplete steps of the most recently active roadmaps"""
+        blocks = (
+            "\n".join([
+                f"\n{roadmap['title']}:",
+                *(f"  - Step {step['order']}: {step['title']}" for step in steps[:NEXT_STEPS_PER_ROADMAP])
+            ])
+            for roadmap, steps in context.incomplete_steps
+        )
+        result = fill_budget(blocks, budget_tokens)
         return "\n".join(result) if result else "No incomplete steps"
     
-    def _format_recent_notes(self, notes: List[Dict], days: int = 7) -> str:
-        """Format recent notes for prompt"""
-        cutoff = datetime.now() - timedelta(days=days)
-        recent = [
-            n for n in notes
-            if datetime.fromisoformat(n["createdAt"].replace("Z", "+00:00")) > cutoff
-        ]
-        return "\n".join([f"- {n['title']}" for n in recent[:10]]) if recent else "No recent notes"
-    
-    def _format_user_knowledge(self, notes: List[Dict]) -> str:
-        """Format user's knowledge from notes"""
-        topics = {}
-        for note in notes:
-            tags = [t["tag"]["name"] for t in note.get("tags", [])]
-            for tag in tags:
-                topics[tag] = topics.get(tag, 0) + 1
-        
-        return ", ".join([f"{topic} ({count} notes)" for topic, count in sorted(topics.items(), key=lambda x: x[1], reverse=True)[:10]])
-    
-    def _format_notes_summary(self, notes: List[Dict]) -> str:
-        """Format notes summary for prompt"""
-        return "\n".join([
-            f"- [{n['id']}] {n['title']}: {n['content'][:100]}..."
-            for n in notes[:20]
-        ])
\ No newline at end of file
+    def _format_recent_notes(
+        self,
+        context: UserContext,
+        budget_tokens: int,
+        days: int = RECENT_NOTES_DAYS
+    ) -> str:
+        """Format recently edited notes, newest first"""
+        cutoff = time.time() - days * 86400
+        recent = (
+            f"- {context.notes[i]['title']}"
+            for i in itertools.takewhile(
+                lambda i: context.note_activity[i] > cutoff, context.notes_by_activity
+            )
+        )
+        result = fill_budget(recent, budget_tokens)
+        return "\n".join(result) if result else "No recent notes"
+    
+    def _format_user_knowledge(
+        self,
+        context: UserContext,
+        topic: str,
+        budget_tokens: int
+    ) -> str:
+        """Format user's knowledge from note tags, weighted toward notes about topic"""
+        relevance = context.ranker.index.scores(topic)
+        top = max(relevance.values(), default=0.0) or 1.0
+        
+        weights = {
+            tag: len(positions) + 2 * sum(relevance.get(i, 0.0) for i in positions) / top
+            for tag, positions in context.tag_index.items()
+        }
+        ranked = sorted(weights, key=weights.get, reverse=True)
+        return ", ".join(fill_budget(
+            (f"{tag} ({len(context.tag_index[tag])} notes)" for tag in ranked),
+            budget_tokens
+        ))
+    
+    def _format_notes_summary(
+        self,
+        context: UserContext,
+        query: str,
+        budget_tokens: int
+    ) -> str:
+        """Format the notes most relevant to query, with matching excerpts"""
+        notes = context.notes
+        lines = (
+            f"- [{notes[i]['id']}] {notes[i]['title']}: {snippet(notes[i].get('content') or '', query, 100)}"
+            for i in context.ranker.rank(query)
+        )
+        return "\n".join(fill_budget(lines, budget_tokens))
@@ -0,0 +1,242 @@
+import copy
+import logging
+import re
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import numpy as np
+from pydantic import ValidationError
+from app.config import settings
+from app.models.responses import RoadmapStep
+from app.services.embedding_service import UserEmbeddingIndex, embedding_service
+from app.utils.cache import LRUCache, SingleFlight
+from app.utils.text_processing import STOPWORDS
+from app.utils.tiered_cache import create_tiered_cache
+
+logger = logging.getLogger(__name__)
+
+# Unlike text_processing.tokenize, keeps one-letter words, numbers and +/#,
+# which tell topics such as "C", "C++" and "C#", or "Python 2" and "Python 3" apart
+_TOPIC_WORD_RE = re.compile(r"[a-z0-9][a-z0-9+#]*")
+# Characters that are neither part of a word nor plain separators
+_UNKEPT_RE = re.compile(r"[^a-z0-9+#\s.,:;!?'\"()/&-]")
+
+def topic_words(topic: str) -> List[str]:
+    """Lowercased topic words without stopwords"""
+    return [w for w in _TOPIC_WORD_RE.findall(topic.lower()) if w not in STOPWORDS]
+
+def normalize_topic(topic: str) -> str:
+    """Lowercased topic words without stopwords, sorted, so rephrasings share a key
+
+    Topics with characters the words leave out (e.g. "A* search") or with
+    only stopwords keep their own lowercased form instead.
+    """
+    words = topic_words(topic)
+    if not words or _UNKEPT_RE.search(topic.lower()):
+        return " ".join(topic.lower().split())
+    return " ".join(sorted(set(words)))
+
+def _qualifiers(key: str) -> List[str]:
+    """Words of a key that a similar-sounding topic must share: short ones, numbers, +/#"""
+    return sorted(w for w in key.split() if len(w) <= 2 or not w.isalpha())
+
+class RoadmapTemplateStore:
+    """Generic roadmaps by topic, shared by every user
+
+    A template is a roadmap generated for the topic alone, without anyone's
+    notes; requests personalize it with a much smaller call. Topics are
+    looked up by normalized form first, then by embedding similarity to the
+    topics this worker has seen, so near-identical phrasings hit too. With
+    Redis enabled the templates themselves are shared between workers.
+    """
+
+    def __init__(
+        self,
+        max_topics: int = 2000,
+        ttl_seconds: float = 7 * 86400,
+        min_similarity: float = 0.92
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.min_similarity = min_similarity
+        # normalized topic -> template
+        self.templates = LRUCache(max_entries=max_topics, default_ttl=ttl_seconds)
+        self.shared = create_tiered_cache("roadmap_templates", l1=self.templates)
+        # Topic vectors; row ids map back to normalized topics
+        self.index = UserEmbeddingIndex()
+        self._topics: Dict[int, str] = {}
+        self._ids: Dict[str, int] = {}
+        self._next_id = 0
+        self._creates = SingleFlight()
+
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.saved_tokens = 0
+        self.personalization_tokens = 0
+
+    async def get_or_create(
+        self,
+        topic: str,
+        generate: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Tuple[Dict[str, Any], bool]:
+        """Template for topic and whether it was already stored
+
+        generate builds a missing template; its "tokens" entry (the estimated
+        cost of generating it) is what a later hit counts as saved. Templates
+        are shared; callers must not modify them.
+        """
+        key = normalize_topic(topic)
+        template, vector = await self._find(key)
+        if template is not None:
+            return template, True
+
+        self.misses += 1
+        template = await self._creates.do(key, lambda: self._create(key, generate))
+        if vector is not None:
+            self._remember(key, vector)
+        return template, False
+
+    async def find(self, topic: str) -> Optional[Dict[str, Any]]:
+        """Stored template for topic, or None without creating one"""
+        template, _vector = await self._find(normalize_topic(topic))
+        if template is None:
+            self.misses += 1
+        return template
+
+    async def _find(self, key: str) -> Tuple[Optional[Dict[str, Any]], Optional[np.ndarray]]:
+        """Template stored under key or a similar topic, and key's vector when it was embedded"""
+        template = await self._get(key)
+        if template is not None:
+            self.exact_hits += 1
+            self.saved_tokens += template.get("tokens", 0)
+            if key not in self._ids:
+                # Created by another worker; make it findable by similarity here too
+                vector = await self._embed(key)
+                if vector is not None:
+                    self._remember(key, vector)
+            return template, None
+
+        vector = await self._embed(key)
+        if vector is not None:
+            for topic_id, _score in self.index.query(vector, 1, min_score=self.min_similarity):
+                similar = self._topics[topic_id]
+                if _qualifiers(similar) != _qualifiers(key):
+                    # Close in wording but a different language or version
+                    continue
+                template = await self._get(similar)
+                if template is not None:
+                    self.similar_hits += 1
+                    self.saved_tokens += template.get("tokens", 0)
+                    return template, vector
+        return None, vector
+
+    def record_personalization(self, tokens: int) -> None:
+        self.personalization_tokens += tokens
+
+    async def _get(self, key: str) -> Optional[Dict[str, Any]]:
+        if self.shared is not None:
+            return await self.shared.get(key)
+        return self.templates.get(key)
+
+    async def _create(self, key: str, generate: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        if self.shared is not None:
+            # One worker generates a popular topic while the others wait for it
+            return await self.shared.get_or_load(key, lambda _stale: generate(), ttl=self.ttl_seconds)
+        template = await generate()
+        self.templates.set(key, template)
+        return template
+
+    async def _embed(self, key: str) -> Optional[np.ndarray]:
+        """Topic vector, or None when there is nothing to embed or the backend fails"""
+        if not key:
+            return None
+        try:
+            return (await embedding_service.backend.embed([key]))[0]
+        except Exception as e:
+            logger.warning(f"Topic embedding failed, exact matches only: {e}")
+            return None
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        if key in self._ids:
+            return
+        topic_id = self._next_id
+        self._next_id += 1
+        self._ids[key] = topic_id
+        self._topics[topic_id] = key
+        self.index.upsert([topic_id], vector[None, :], [key])
+
+        # Drop vectors of topics the LRU has evicted
+        if len(self.index) > 2 * self.templates.max_entries:
+            evicted = [i for i, k in self._topics.items() if k not in self.templates]
+            self.index.remove(evicted)
+            for topic_id in evicted:
+                del self._ids[self._topics.pop(topic_id)]
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self.exact_hits + self.similar_hits
+        lookups = hits + self.misses
+        return {
+            "topics": len(self.templates),
+            "exactHits": self.exact_hits,
+            "similarHits": self.similar_hits,
+            "misses": self.misses,
+            "hitRate": hits / lookups if lookups else 0.0,
+            "savedTokens": self.saved_tokens,
+            "personalizationTokens": self.personalization_tokens
+        }
+
+def personalize(template: Dict[str, Any], adjustments: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of template with a personalization pass's adjustments applied
+
+    adjustments may skip steps the user already knows (skipSteps, by order),
+    add a sentence to steps (stepNotes), insert a few steps (extraSteps,
+    placed after the step numbered "after") and replace the reasoning.
+    """
+    roadmap = copy.deepcopy(template.get("suggestedRoadmap") or {})
+    skip = {_step_order(order) for order in adjustments.get("skipSteps") or []} - {None}
+    notes = {}
+    for item in adjustments.get("stepNotes") or []:
+        if isinstance(item, dict) and item.get("note") and _step_order(item.get("order")) is not None:
+            notes[_step_order(item["order"])] = item["note"]
+    extra: Dict[Any, List[Dict[str, Any]]] = {}
+    for step in adjustments.get("extraSteps") or []:
+        if not isinstance(step, dict) or not step.get("title"):
+            continue
+        try:
+            # Renumbered below; an extra step without objectives just lists none
+            valid = RoadmapStep.model_validate({"learningObjectives": [], **step, "order": 0})
+        except ValidationError:
+            logger.warning(f"Dropping invalid extra roadmap step: {step!r}")
+            continue
+        extra.setdefault(_step_order(step.get("after")), []).append(valid.model_dump())
+
+    steps = list(extra.pop(0, []))
+    for step in roadmap.get("steps") or []:
+        order = _step_order(step.get("order"))
+        if order not in skip:
+            if order in notes:
+                step["description"] = f"{step.get('description', '')} {notes[order]}".strip()
+            steps.append(step)
+        steps.extend(extra.pop(order, []))
+    # Extra steps placed after an unknown step go last
+    for remaining in extra.values():
+        steps.extend(remaining)
+
+    for order, step in enumerate(steps, 1):
+        step["order"] = order
+    roadmap["steps"] = steps
+    return {
+        "suggestedRoadmap": roadmap,
+        "reasoning": adjustments.get("reasoning") or template.get("reasoning", "")
+    }
+
+def _step_order(value: Any) -> Optional[int]:
+    """A step number from model output, which may send it as a string; None if it isn't one"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+roadmap_templates = RoadmapTemplateStore(
+    max_topics=settings.roadmap_template_max_topics,
+    ttl_seconds=settings.roadmap_template_ttl_seconds,
+    min_similarity=settings.roadmap_template_min_similarity
+)
@@ -0,0 +1,192 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+from app.config import settings
+import asyncio
+import time
+
+class LRUCache:
+    """Bounded in-memory LRU cache with per-entry expiry and an optional byte budget"""
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        default_ttl: Optional[float] = None,
+        max_bytes: Optional[int] = None
+    ):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.max_bytes = max_bytes
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+
+        value, expires_at, _size = entry
+        if expires_at is not None and time.time() >= expires_at:
+            self.delete(key)
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(
+        self,
+        key: Hashable,
+        value: Any,
+        ttl: Optional[float] = None,
+        expires_at: Optional[float] = None,
+        size: int = 0
+    ) -> None:
+        """Store value; expires_at (epoch seconds) takes precedence over ttl.
+
+        size is the caller's estimate of the entry's footprint in bytes and only
+        matters when the cache has a max_bytes budget.
+        """
+        if expires_at is None:
+            ttl = ttl if ttl is not None else self.default_ttl
+            expires_at = time.time() + ttl if ttl is not None else None
+
+        self.delete(key)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+
+        self._data[key] = (value, expires_at, size)
+        self._bytes += size
+
+        while len(self._data) > self.max_entries or (
+            self.max_bytes is not None and self._bytes > self.max_bytes
+        ):
+            _key, (_value, _expires_at, evicted_size) = self._data.popitem(last=False)
+            self._bytes -= evicted_size
+            self.evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    def clear(self) -> None:
+        self._data.clear()
+        self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def items(self) -> List[Tuple[Hashable, Any]]:
+        """Snapshot of unexpired entries, least recently used first; doesn't touch recency"""
+        now = time.time()
+        return [
+            (key, value)
+            for key, (value, expires_at, _size) in self._data.items()
+            if expires_at is None or now < expires_at
+        ]
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._data.get(key)
+        return entry is not None and (entry[1] is None or time.time() < entry[1])
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hitRate": self.hits / lookups if lookups else 0.0
+        }
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key onto one in-flight task"""
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        future = self._inflight.get(key)
+        if future is None:
+            self.calls += 1
+            future = asyncio.ensure_future(fn())
+            self._inflight[key] = future
+            future.add_done_callback(lambda _future: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        # Shield so one cancelled caller doesn't cancel the work for the others
+        return await asyncio.shield(future)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "inFlight": len(self._inflight),
+            "calls": self.calls,
+            "coalesced": self.coalesced
+        }
+
+class CacheBackend(ABC):
+    """Async byte-oriented key/value store behind the shared caches"""
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        ...
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        ...
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+    async def ping(self) -> None:
+        """Raise if the store is unreachable"""
+        pass
+
+    async def aclose(self) -> None:
+        pass
+
+class MemoryCacheBackend(CacheBackend):
+    """Per-worker backend on top of LRUCache, sized by value bytes"""
+
+    def __init__(self, max_entries: int = 1024, max_bytes: Optional[int] = None):
+        self._cache = LRUCache(max_entries=max_entries, max_bytes=max_bytes)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return self._cache.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        self._cache.set(key, value, ttl=ttl, size=len(value))
+
+    async def delete(self, key: str) -> None:
+        self._cache.delete(key)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "memory", **self._cache.stats()}
+
+def create_cache_backend(
+    namespace: str,
+    max_entries: int = 1024,
+    max_bytes: Optional[int] = None
+) -> CacheBackend:
+    """In-memory LRU, fronting Redis when settings.enable_redis is on"""
+    if settings.enable_redis and settings.redis_url:
+        from app.utils.tiered_cache import TieredCacheBackend, create_tiered_cache
+
+        return TieredCacheBackend(
+            create_tiered_cache(namespace, l1=LRUCache(max_entries=max_entries, max_bytes=max_bytes))
+        )
+    return MemoryCacheBackend(max_entries=max_entries, max_bytes=max_bytes)
@@ -0,0 +1,27 @@
+import hashlib
+from typing import Optional
+
+def make_etag(*parts: object) -> str:
+    """Weak ETag over the values that determine a response
+
+    Weak because regenerating from the same inputs gives an equivalent
+    response, not a byte-identical one.
+    """
+    digest = hashlib.blake2b("|".join(map(str, parts)).encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+def _opaque(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+def etag_matches(if_none_match: Optional[str], etag: str, exists: bool = True) -> bool:
+    """Whether an If-None-Match header names etag, by weak comparison
+
+    exists says whether a current representation exists yet; "*" matches
+    only when it does (RFC 9110, section 13.1.2).
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return exists
+    return any(_opaque(tag) == _opaque(etag) for tag in if_none_match.split(","))
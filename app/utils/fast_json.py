@@ -0,0 +1,92 @@
+import json
+import re
+from typing import Any, List, Optional, Tuple, Union
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # optional speedup; the stdlib json module is the fallback
+    orjson = None
+
+def loads(data: Union[bytes, bytearray, str]) -> Any:
+    """Parse JSON straight from response bytes, without decoding to str first
+
+    Errors are ValueErrors either way, including nesting too deep to parse.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    try:
+        return json.loads(data)
+    except RecursionError as e:
+        # orjson reports nesting past its limit as a decode error; match it
+        raise ValueError("JSON nested too deeply") from e
+
+def dumps(obj: Any) -> bytes:
+    """Compact UTF-8 JSON"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode()
+
+# Characters that matter when matching braces; everything else is skipped over
+_STRUCTURAL = re.compile(r'[{}"\\]')
+
+def extract_json_object(text: str) -> Optional[Any]:
+    """First balanced {...} in text that parses as JSON, or None
+
+    For model output with prose or code fences around the object. Tries the
+    span from the first "{" to the last "}" first, then one pass over the
+    text matching braces outside of strings. The outermost balanced spans
+    are parsed in order; an unmatched "{" in the prose before the object
+    is simply never closed, so it doesn't hide the spans after it. The
+    spans are disjoint, so the cost stays linear in the length of the text.
+    """
+    first = text.find("{")
+    last = text.rfind("}")
+    if first < 0 or last < first:
+        return None
+    try:
+        return loads(text[first:last + 1])
+    except ValueError:
+        pass
+
+    opened: List[int] = []
+    # Outermost balanced (start, end) spans so far; one closing later around them replaces them
+    spans: List[Tuple[int, int]] = []
+    in_string = False
+    skip_to = 0
+
+    for match in _STRUCTURAL.finditer(text, first, last + 1):
+        i = match.start()
+        if i < skip_to:
+            # Escaped character inside a string
+            continue
+        char = match.group()
+        if in_string:
+            if char == "\\":
+                skip_to = i + 2
+            elif char == '"':
+                in_string = False
+        elif char == "{":
+            opened.append(i)
+        elif not opened:
+            continue
+        elif char == '"':
+            in_string = True
+        elif char == "}":
+            start = opened.pop()
+            while spans and spans[-1][0] > start:
+                spans.pop()
+            spans.append((start, i + 1))
+
+    for start, end in spans:
+        try:
+            return loads(text[start:end])
+        except ValueError:
+            pass
+    return None
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson when it is installed"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,124 @@
+import bisect
+import json
+from typing import Any, Iterable, List, Optional, Tuple
+
+Path = Tuple[Any, ...]
+
+class StreamingJSONParser:
+    """Incremental parser that reports JSON values as soon as they are complete
+
+    Watched paths are tuples of object keys, with "*" standing for any array
+    element: ("suggestedRoadmap", "steps", "*") reports each roadmap step and
+    () reports the whole document. Anything before the first "{" (prose, code
+    fences) is skipped, as is anything after the root object closes.
+    """
+
+    def __init__(self, paths: Iterable[Path]):
+        self.paths = set(paths)
+        self.done = False
+
+        # Chunks as received and where each starts; joined only for the spans
+        # of completed values, so feeding stays linear in the document size
+        self._chunks: List[str] = []
+        self._offsets: List[int] = []
+        self._length = 0
+        self._pos = 0
+        self._started = False
+        # Open containers: [kind, path, start, current key, expecting key]
+        self._stack: List[list] = []
+        self._in_string = False
+        self._escape = False
+        self._string_is_key = False
+        self._string_start = 0
+        self._primitive_start: Optional[int] = None
+
+    def feed(self, chunk: str) -> List[Tuple[Path, Any]]:
+        """Consume the next chunk, returning the watched values it completed"""
+        if self.done:
+            return []
+
+        self._chunks.append(chunk)
+        self._offsets.append(self._length)
+        self._length += len(chunk)
+        completed = []
+
+        for c in chunk:
+            if self.done:
+                break
+            i = self._pos
+            self._pos += 1
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    frame = self._stack[-1]
+                    if self._string_is_key:
+                        frame[3] = json.loads(self._slice(self._string_start, i + 1))
+                        frame[4] = False
+                    else:
+                        self._complete(self._child_path(), self._string_start, i + 1, completed)
+                continue
+
+            if self._primitive_start is not None:
+                if c not in ",}] \t\r\n":
+                    continue
+                self._complete(self._child_path(), self._primitive_start, i, completed)
+                self._primitive_start = None
+
+            if not self._started:
+                if c != "{":
+                    continue
+                self._started = True
+                self._stack.append(["object", (), i, None, True])
+                continue
+
+            if c in " \t\r\n:":
+                continue
+
+            frame = self._stack[-1]
+            if c == '"':
+                self._in_string = True
+                self._string_start = i
+                self._string_is_key = frame[0] == "object" and frame[4]
+            elif c == ",":
+                if frame[0] == "object":
+                    frame[4] = True
+            elif c in "{[":
+                kind = "object" if c == "{" else "array"
+                self._stack.append([kind, self._child_path(), i, None, True])
+            elif c in "}]":
+                kind, path, start, _key, _expecting_key = self._stack.pop()
+                self._complete(path, start, i + 1, completed)
+                if not self._stack:
+                    self.done = True
+            else:
+                self._primitive_start = i
+
+        return completed
+
+    @property
+    def text(self) -> str:
+        """Everything fed so far"""
+        if len(self._chunks) > 1:
+            self._chunks = ["".join(self._chunks)]
+            self._offsets = [0]
+        return self._chunks[0] if self._chunks else ""
+
+    def _slice(self, start: int, end: int) -> str:
+        first = bisect.bisect_right(self._offsets, start) - 1
+        last = bisect.bisect_left(self._offsets, end)
+        base = self._offsets[first]
+        return "".join(self._chunks[first:last])[start - base:end - base]
+
+    def _child_path(self) -> Path:
+        """Path of the value currently being read inside the innermost container"""
+        kind, path, _start, key, _expecting_key = self._stack[-1]
+        return path + (key if kind == "object" else "*",)
+
+    def _complete(self, path: Path, start: int, end: int, completed: list) -> None:
+        if path in self.paths:
+            completed.append((path, json.loads(self._slice(start, end))))
@@ -0,0 +1,130 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+import asyncio
+import functools
+import time
+
+# Seconds; spans from sub-millisecond cache hits to minute-long LLM calls
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+
+# Per-request stage totals for the Server-Timing header (see app.middleware.metrics);
+# None outside a request
+request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+# Time spent in spans nested inside the innermost open span; None outside any
+_nested_time: ContextVar[Optional[List[float]]] = ContextVar("_nested_time", default=None)
+
+class Histogram:
+    """Cumulative-bucket histogram with labels, rendered in the Prometheus text format"""
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (last is +Inf), sum]
+        self._series: Dict[Tuple[str, ...], List[Any]] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def count(self, *label_values: str) -> int:
+        series = self._series.get(label_values)
+        return sum(series[0]) if series is not None else 0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for label_values, (counts, total) in sorted(self._series.items()):
+            labels = ",".join(
+                f'{name}="{_escape(value)}"' for name, value in zip(self.labels, label_values)
+            )
+            prefix = f"{labels}," if labels else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            cumulative += counts[-1]
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {cumulative}')
+            suffix = f"{{{labels}}}" if labels else ""
+            lines.append(f"{self.name}_sum{suffix} {total}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+    def reset(self) -> None:
+        self._series.clear()
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+stage_duration = Histogram(
+    "ai_tutor_stage_duration_seconds",
+    "Time spent in each stage of request handling",
+    labels=("stage",)
+)
+
+request_duration = Histogram(
+    "ai_tutor_http_request_duration_seconds",
+    "HTTP request latency by route",
+    labels=("method", "route", "status")
+)
+
+def render_metrics() -> str:
+    lines = stage_duration.render() + request_duration.render()
+    return "\n".join(lines) + "\n"
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Time a block into the stage histogram and the current request's Server-Timing
+
+    A span records its own time only: spans nested inside it (e.g. graphql
+    within context) are subtracted, so the stages of a request don't overlap.
+    """
+    parent = _nested_time.get()
+    nested = [0.0]
+    token = _nested_time.set(nested)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _nested_time.reset(token)
+        total = time.perf_counter() - start
+        if parent is not None:
+            parent[0] += total
+        # Nested spans run concurrently in gathered tasks can add up to more than the total
+        elapsed = max(0.0, total - nested[0])
+        stage_duration.observe(elapsed, stage)
+        timings = request_timings.get()
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + elapsed
+
+def timed(stage: str) -> Callable[[Callable], Callable]:
+    """Decorator form of span for plain and async functions"""
+    def decorate(func: Callable) -> Callable:
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(stage):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
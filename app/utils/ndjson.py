@@ -0,0 +1,21 @@
+import logging
+from typing import Any, AsyncIterator
+from app.utils.fast_json import dumps
+
+logger = logging.getLogger(__name__)
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+def format_ndjson(item: Any) -> str:
+    """Encode one newline-delimited JSON record"""
+    return dumps(item).decode() + "\n"
+
+async def ndjson_stream(items: AsyncIterator[Any]) -> AsyncIterator[str]:
+    """Turn records into an NDJSON body, reporting a failure as a final error record"""
+    try:
+        async for item in items:
+            yield format_ndjson(item)
+    except Exception as e:
+        # Headers are already sent, so the status code can't change any more
+        logger.exception("Streaming response failed")
+        yield format_ndjson({"status": "error", "error": str(e)})
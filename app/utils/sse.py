@@ -0,0 +1,26 @@
+import logging
+from typing import Any, AsyncIterator, Tuple
+from app.utils.fast_json import dumps
+
+logger = logging.getLogger(__name__)
+
+def format_sse(event: str, data: Any) -> str:
+    """Encode one server-sent event"""
+    return f"event: {event}\ndata: {dumps(data).decode()}\n\n"
+
+async def sse_stream(events: AsyncIterator[Tuple[str, Any]]) -> AsyncIterator[str]:
+    """Turn (event, data) pairs into an SSE body, reporting failures as an error event"""
+    try:
+        async for event, data in events:
+            yield format_sse(event, data)
+    except Exception as e:
+        # Headers are already sent, so the status code can't change any more
+        logger.exception("Streaming response failed")
+        yield format_sse("error", {"detail": str(e)})
+    yield format_sse("done", {})
+
+# Response headers that keep proxies from buffering the stream
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no"
+}
@@ -0,0 +1,198 @@
+import math
+import re
+import time
+import zlib
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_PARAGRAPH_RE = re.compile(r"\n\s*\n")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+STOPWORDS = frozenset("""
+a an and are as at be but by for from has have how i if in into is it its of on or
+that the their then there these this to was what when where which who why will with
+you your about can do does not no so than too very just over also more most some
+""".split())
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stopwords"""
+    return [w for w in _WORD_RE.findall(text.lower()) if w not in STOPWORDS and len(w) > 1]
+
+def estimate_tokens(text: str) -> int:
+    """Rough LLM token count (~4 characters per token for English)"""
+    return (len(text) + 3) // 4
+
+def parse_timestamp(value: Optional[str]) -> float:
+    """ISO-8601 timestamp to epoch seconds, 0.0 when missing or malformed"""
+    if not value:
+        return 0.0
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return 0.0
+
+class BM25Index:
+    """Inverted index with Okapi BM25 scoring over a fixed set of documents"""
+
+    def __init__(self, documents: Iterable[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        self.doc_lengths: List[int] = []
+
+        for doc_id, text in enumerate(documents):
+            terms = tokenize(text)
+            self.doc_lengths.append(len(terms))
+            for term, tf in Counter(terms).items():
+                self.postings.setdefault(term, []).append((doc_id, tf))
+
+        n = len(self.doc_lengths)
+        self.avg_length = sum(self.doc_lengths) / n if n else 0.0
+        self.idf = {
+            term: math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in self.postings.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def scores(self, query: str) -> Dict[int, float]:
+        """BM25 score of every document sharing at least one term with query"""
+        result: Dict[int, float] = {}
+        avg_length = self.avg_length or 1.0
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for doc_id, tf in self.postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                result[doc_id] = result.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return result
+
+class DocumentRanker:
+    """Ranks documents by BM25 relevance to a query blended with recency"""
+
+    def __init__(self, documents: Iterable[str], timestamps: Sequence[float]):
+        self.index = BM25Index(documents)
+        self.timestamps = timestamps
+
+    def rank(
+        self,
+        query: str = "",
+        recency_weight: float = 0.3,
+        half_life_days: float = 14.0,
+        now: Optional[float] = None
+    ) -> List[int]:
+        """Document positions, best first
+
+        Without query terms in the index this degrades to newest first.
+        """
+        now = now if now is not None else time.time()
+        relevance = self.index.scores(query) if query else {}
+        top = max(relevance.values(), default=0.0)
+        if top <= 0:
+            recency_weight = 1.0
+
+        half_life = half_life_days * 86400
+        scored = []
+        for doc_id, timestamp in enumerate(self.timestamps):
+            recency = 0.5 ** (max(now - timestamp, 0.0) / half_life) if timestamp else 0.0
+            score = recency_weight * recency
+            if top > 0:
+                score += (1 - recency_weight) * relevance.get(doc_id, 0.0) / top
+            scored.append((score, timestamp, doc_id))
+
+        scored.sort(reverse=True)
+        return [doc_id for _score, _timestamp, doc_id in scored]
+
+def snippet(text: str, query: str = "", max_chars: int = 160) -> str:
+    """Excerpt of text around the first query term it contains"""
+    text = " ".join(text.split())
+    if len(text) <= max_chars:
+        return text
+
+    start = 0
+    lowered = text.lower()
+    for term in tokenize(query):
+        position = lowered.find(term)
+        if position >= 0:
+            start = max(0, position - max_chars // 4)
+            break
+
+    excerpt = text[start:start + max_chars]
+    prefix = "..." if start > 0 else ""
+    suffix = "..." if start + max_chars < len(text) else ""
+    return f"{prefix}{excerpt}{suffix}"
+
+def fill_budget(lines: Iterable[str], budget_tokens: int) -> List[str]:
+    """Take ranked lines in order until the token budget is spent
+
+    Lines too long for the remaining budget are skipped so that shorter,
+    lower-ranked lines can still use it.
+    """
+    selected = []
+    remaining = budget_tokens
+    for line in lines:
+        if remaining <= 0:
+            break
+        cost = estimate_tokens(line) + 1
+        if cost <= remaining:
+            selected.append(line)
+            remaining -= cost
+    return selected
+
+def split_chunks(text: str, max_tokens: int, boundary_every: int = 4) -> List[str]:
+    """Split text at headings and paragraph breaks into chunks of at most ~max_tokens
+
+    Markdown headings start a new chunk. Otherwise a chunk ends once it holds
+    a quarter of max_tokens and a paragraph's checksum picks it as a cut
+    point (about one paragraph in boundary_every), or when the next paragraph
+    wouldn't fit. Cut points follow the paragraphs rather than their offsets,
+    so an edit changes the chunks around it and the rest come out identical.
+    """
+    chunks = []
+    current: List[str] = []
+    size = 0
+
+    for paragraph in _paragraphs(text, max_tokens):
+        cost = estimate_tokens(paragraph) + 1
+        if current and (paragraph.startswith("#") or size + cost > max_tokens):
+            chunks.append("\n\n".join(current))
+            current, size = [], 0
+        current.append(paragraph)
+        size += cost
+        if size >= max_tokens // 4 and zlib.crc32(paragraph.encode()) % boundary_every == 0:
+            chunks.append("\n\n".join(current))
+            current, size = [], 0
+
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+def _paragraphs(text: str, max_tokens: int) -> Iterator[str]:
+    """Non-empty paragraphs, those over max_tokens split by sentence and then by length"""
+    max_chars = max_tokens * 4
+    for paragraph in _PARAGRAPH_RE.split(text):
+        paragraph = paragraph.strip()
+        if estimate_tokens(paragraph) <= max_tokens:
+            if paragraph:
+                yield paragraph
+            continue
+
+        piece = ""
+        for sentence in _SENTENCE_RE.split(paragraph):
+            while len(sentence) > max_chars:
+                if piece:
+                    yield piece
+                    piece = ""
+                yield sentence[:max_chars]
+                sentence = sentence[max_chars:]
+            if piece and len(piece) + len(sentence) + 1 > max_chars:
+                yield piece
+                piece = sentence
+            else:
+                piece = f"{piece} {sentence}" if piece else sentence
+        if piece:
+            yield piece
@@ -0,0 +1,388 @@
+import asyncio
+import logging
+import secrets
+import time
+import zlib
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+from app.config import settings
+from app.utils.cache import CacheBackend, LRUCache, SingleFlight
+from app.utils.fast_json import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+# First byte of an encoded value: bit 0 set for JSON (else raw bytes), bit 1 for zlib
+_JSON = 1
+_ZLIB = 2
+
+# Delete the lock only if this worker still holds it
+_RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+def encode_value(value: Any, compress_min_bytes: int = 1024) -> bytes:
+    """Bytes as-is or compact JSON, zlib-compressed from compress_min_bytes up"""
+    if isinstance(value, (bytes, bytearray)):
+        kind, payload = 0, bytes(value)
+    else:
+        kind, payload = _JSON, dumps(value)
+    if len(payload) >= compress_min_bytes:
+        kind |= _ZLIB
+        payload = zlib.compress(payload, 1)
+    return bytes((kind,)) + payload
+
+def decode_value(data: bytes) -> Any:
+    kind = data[0]
+    payload = data[1:]
+    if kind & _ZLIB:
+        payload = zlib.decompress(payload)
+    return loads(payload) if kind & _JSON else payload
+
+class TieredCache:
+    """In-process L1 LRU in front of a Redis L2 shared by every worker
+
+    Reads try L1, then L2 (filling L1 for the entry's remaining TTL). Writes
+    and deletes go to both and are published on a pub/sub channel so other
+    workers drop their L1 copy. get_or_load takes a short Redis lock per key
+    so that, across workers, one loads a missing or stale value while the
+    rest wait for it to land in L2.
+
+    encode/decode convert values to and from something encode_value accepts
+    (JSON-compatible data or bytes). Redis errors are logged and treated as
+    misses; the cache then behaves like its L1 alone.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        redis: Any,
+        l1: Optional[LRUCache] = None,
+        encode: Optional[Callable[[Any], Any]] = None,
+        decode: Optional[Callable[[Any], Any]] = None,
+        size_of: Optional[Callable[[Any], int]] = None,
+        compress_min_bytes: int = 1024,
+        lock_ttl: float = 10.0,
+        lock_wait: float = 5.0,
+        poll_interval: float = 0.05
+    ):
+        self.namespace = namespace
+        self.l1 = l1 if l1 is not None else LRUCache()
+        self.compress_min_bytes = compress_min_bytes
+        self.lock_ttl = lock_ttl
+        self.lock_wait = lock_wait
+        self.poll_interval = poll_interval
+        self._redis = redis
+        self._encode = encode
+        self._decode = decode
+        self._size_of = size_of
+        self._release = redis.register_script(_RELEASE_SCRIPT)
+        self._channel = f"{namespace}:invalidate"
+        self._worker = secrets.token_hex(8)
+        self._loads = SingleFlight()
+        self._listener: Optional[asyncio.Task] = None
+        self._subscribed = asyncio.Event()
+
+        self.l2_hits = 0
+        self.l2_misses = 0
+        self.loads = 0
+        self.lock_waits = 0
+        self.invalidations_sent = 0
+        self.invalidations_received = 0
+        self.errors = 0
+
+    def _key(self, key: Hashable) -> str:
+        parts = key if isinstance(key, tuple) else (key,)
+        return ":".join([self.namespace, "v", *map(str, parts)])
+
+    def _lock_key(self, key: Hashable) -> str:
+        parts = key if isinstance(key, tuple) else (key,)
+        return ":".join([self.namespace, "lock", *map(str, parts)])
+
+    async def start(self) -> None:
+        """Subscribe to invalidations now rather than on first use"""
+        self._ensure_listener()
+        await self._subscribed.wait()
+
+    async def get(self, key: Hashable, default: Any = None) -> Any:
+        value = self.l1.get(key)
+        if value is not None:
+            return value
+        value = await self._get_l2(key)
+        return default if value is None else value
+
+    async def set(
+        self,
+        key: Hashable,
+        value: Any,
+        ttl: Optional[float] = None,
+        expires_at: Optional[float] = None,
+        size: int = 0
+    ) -> None:
+        """Store in both tiers; expires_at (epoch seconds) takes precedence over ttl"""
+        if expires_at is None and ttl is not None:
+            expires_at = time.time() + ttl
+        data = encode_value(
+            self._encode(value) if self._encode else value,
+            self.compress_min_bytes
+        )
+        self.l1.set(key, value, expires_at=expires_at, size=size or self._size(value, data))
+
+        px = None if expires_at is None else max(1, int(1000 * (expires_at - time.time())))
+        try:
+            await self._redis.set(self._key(key), data, px=px)
+            await self._publish(key)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Shared cache write to {self.namespace} failed: {e}")
+
+    async def delete(self, key: Hashable) -> None:
+        self.l1.delete(key)
+        try:
+            await self._redis.delete(self._key(key))
+            await self._publish(key)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Shared cache delete from {self.namespace} failed: {e}")
+
+    async def get_or_load(
+        self,
+        key: Hashable,
+        loader: Callable[[Optional[Any]], Awaitable[Any]],
+        ttl: Optional[float] = None,
+        expires_at: Optional[Callable[[Any], float]] = None,
+        is_fresh: Optional[Callable[[Any], bool]] = None
+    ) -> Any:
+        """Cached value, or loader(stale value or None) run by one worker at a time
+
+        is_fresh decides whether a cached value can be served (default: any
+        cached value); expires_at computes a loaded value's expiry, else ttl
+        applies.
+        """
+        value = self.l1.get(key)
+        if value is not None and (is_fresh is None or is_fresh(value)):
+            return value
+        # Callers in this worker share one load; the lock covers other workers
+        return await self._loads.do(
+            key, lambda: self._load(key, value, loader, ttl, expires_at, is_fresh)
+        )
+
+    async def _load(
+        self,
+        key: Hashable,
+        stale: Optional[Any],
+        loader: Callable[[Optional[Any]], Awaitable[Any]],
+        ttl: Optional[float],
+        expires_at: Optional[Callable[[Any], float]],
+        is_fresh: Optional[Callable[[Any], bool]]
+    ) -> Any:
+        def fresh(value: Any) -> bool:
+            return value is not None and (is_fresh is None or is_fresh(value))
+
+        # Another worker may already have refreshed it
+        shared = await self._get_l2(key)
+        if fresh(shared):
+            return shared
+        stale = shared if shared is not None else stale
+
+        token = secrets.token_hex(8)
+        lock_key = self._lock_key(key)
+        try:
+            locked = await self._redis.set(lock_key, token, nx=True, px=int(1000 * self.lock_ttl))
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Shared cache lock on {self.namespace} failed: {e}")
+            locked = None
+        else:
+            if not locked:
+                self.lock_waits += 1
+                value = await self._wait_for_holder(key, lock_key, fresh)
+                if value is not None:
+                    return value
+
+        try:
+            self.loads += 1
+            value = await loader(stale)
+            await self.set(
+                key,
+                value,
+                ttl=ttl,
+                expires_at=expires_at(value) if expires_at is not None else None
+            )
+            return value
+        finally:
+            if locked:
+                try:
+                    await self._release(keys=[lock_key], args=[token])
+                except Exception:
+                    # It expires after lock_ttl anyway
+                    pass
+
+    async def _wait_for_holder(
+        self,
+        key: Hashable,
+        lock_key: str,
+        fresh: Callable[[Any], bool]
+    ) -> Optional[Any]:
+        """Poll L2 until the lock holder's value lands; None if it gives up or fails"""
+        deadline = time.monotonic() + self.lock_wait
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self.poll_interval)
+            value = await self._get_l2(key)
+            if fresh(value):
+                return value
+            try:
+                if not await self._redis.exists(lock_key):
+                    return None
+            except Exception:
+                return None
+        return None
+
+    async def _get_l2(self, key: Hashable) -> Optional[Any]:
+        self._ensure_listener()
+        try:
+            async with self._redis.pipeline(transaction=False) as pipe:
+                pipe.get(self._key(key))
+                pipe.pttl(self._key(key))
+                data, pttl = await pipe.execute()
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Shared cache read from {self.namespace} failed: {e}")
+            return None
+
+        if data is None:
+            self.l2_misses += 1
+            return None
+        self.l2_hits += 1
+        value = decode_value(data)
+        if self._decode:
+            value = self._decode(value)
+        self.l1.set(
+            key,
+            value,
+            ttl=pttl / 1000 if pttl and pttl > 0 else None,
+            size=self._size(value, data)
+        )
+        return value
+
+    def _size(self, value: Any, data: bytes) -> int:
+        return self._size_of(value) if self._size_of else len(data)
+
+    async def _publish(self, key: Hashable) -> None:
+        await self._redis.publish(self._channel, dumps([self._worker, key]))
+        self.invalidations_sent += 1
+
+    def _ensure_listener(self) -> None:
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.ensure_future(self._listen())
+
+    async def _listen(self) -> None:
+        """Drop L1 entries other workers changed; resubscribe with backoff on errors"""
+        backoff = 0.5
+        while True:
+            pubsub = self._redis.pubsub()
+            try:
+                await pubsub.subscribe(self._channel)
+                if self._subscribed.is_set():
+                    # Invalidations may have been missed while disconnected
+                    self.l1.clear()
+                self._subscribed.set()
+                backoff = 0.5
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    worker, key = loads(message["data"])
+                    if worker != self._worker:
+                        self.l1.delete(tuple(key) if isinstance(key, list) else key)
+                        self.invalidations_received += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"Shared cache invalidation listener for {self.namespace} failed: {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "namespace": self.namespace,
+            "l1": self.l1.stats(),
+            "l2Hits": self.l2_hits,
+            "l2Misses": self.l2_misses,
+            "loads": self.loads,
+            "lockWaits": self.lock_waits,
+            "invalidationsSent": self.invalidations_sent,
+            "invalidationsReceived": self.invalidations_received,
+            "errors": self.errors
+        }
+
+    async def aclose(self) -> None:
+        if self._listener is not None:
+            # The Redis client can swallow a cancel that lands while it is
+            # still subscribing, so cancel until the listener has stopped
+            while not self._listener.done():
+                self._listener.cancel()
+                await asyncio.wait([self._listener], timeout=0.1)
+            self._listener = None
+
+class TieredCacheBackend(CacheBackend):
+    """CacheBackend over a TieredCache, for the byte-oriented caches (LLM responses)"""
+
+    def __init__(self, cache: TieredCache):
+        self.cache = cache
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.cache.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        await self.cache.set(key, value, ttl=ttl, size=len(value))
+
+    async def delete(self, key: str) -> None:
+        await self.cache.delete(key)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "tiered", **self.cache.stats()}
+
+    async def ping(self) -> None:
+        await self.cache._redis.ping()
+
+    async def aclose(self) -> None:
+        await self.cache.aclose()
+
+_redis_client: Optional[Any] = None
+_tiered_caches: List[TieredCache] = []
+
+def get_redis() -> Any:
+    """Redis client shared by the tiered caches of this worker"""
+    global _redis_client
+    if _redis_client is None:
+        import redis.asyncio as redis
+
+        _redis_client = redis.from_url(settings.redis_url)
+    return _redis_client
+
+def create_tiered_cache(namespace: str, l1: Optional[LRUCache] = None, **options: Any) -> Optional[TieredCache]:
+    """TieredCache over settings.redis_url, or None when settings.enable_redis is off"""
+    if not (settings.enable_redis and settings.redis_url):
+        return None
+    options.setdefault("compress_min_bytes", settings.shared_cache_compress_min_bytes)
+    options.setdefault("lock_ttl", settings.shared_cache_lock_ttl_seconds)
+    options.setdefault("lock_wait", settings.shared_cache_lock_wait_seconds)
+    cache = TieredCache(namespace, get_redis(), l1=l1, **options)
+    _tiered_caches.append(cache)
+    return cache
+
+async def close_tiered_caches() -> None:
+    """Stop every invalidation listener and close the shared Redis client"""
+    global _redis_client
+    for cache in _tiered_caches:
+        await cache.aclose()
+    if _redis_client is not None:
+        await _redis_client.aclose()
+        _redis_client = None
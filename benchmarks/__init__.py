@@ -0,0 +1,7 @@
+"""Benchmarks, run from the repository root as python -m benchmarks.<name>"""
+import os
+
+# Settings require Auth0 values; benchmarks never talk to Auth0
+os.environ.setdefault("AUTH0_DOMAIN", "bench.local")
+os.environ.setdefault("AUTH0_AUDIENCE", "https://bench.local/api")
+os.environ.setdefault("AUTH0_ISSUER", "https://bench.local/")
@@ -0,0 +1,104 @@
+"""Conditional daily goals (ETag / 304) and gzip on the assistants' JSON responses
+
+Drives the app in process (httpx over ASGI, auth bypassed) against local
+stand-ins for NestJS and OpenAI. For /goals/daily it compares a full
+response with a revalidation carrying If-None-Match: latency, bytes on the
+wire and LLM calls, then edits a note and checks the ETag changes. For the
+roadmap and note assistants it reports JSON body size with and without
+gzip, and checks the streaming endpoints stay uncompressed.
+
+    python -m benchmarks.conditional_goals [--users 50] [--llm-latency 0.4]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from typing import Any, Dict, List
+import httpx
+from benchmarks.fake_backend import FakeBackend, LocalServer, free_port
+from benchmarks.fake_llm import FakeLLM, LatencyModel
+from benchmarks.load_test import _note, _roadmap
+
+async def timed_post(client: httpx.AsyncClient, path: str, body: Dict[str, Any], **headers) -> httpx.Response:
+    start = time.perf_counter()
+    response = await client.post(path, json=body, headers=headers)
+    response.elapsed_seconds = time.perf_counter() - start
+    return response
+
+def row(label: str, responses: List[httpx.Response], calls: int) -> None:
+    latencies = sorted(r.elapsed_seconds for r in responses)
+    size = statistics.mean(len(r.content) for r in responses)
+    print(
+        f"{label:<12} p50 {1000 * statistics.median(latencies):>7.1f} ms  "
+        f"body {size:>7.0f} B  {calls:>4} LLM calls"
+    )
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--notes", type=int, default=100)
+    parser.add_argument("--llm-latency", type=float, default=0.4)
+    args = parser.parse_args()
+
+    llm = FakeLLM(latency=LatencyModel("fixed", args.llm_latency))
+    backend = FakeBackend(notes=args.notes, note_words=100)
+    ports = {"llm": free_port(), "backend": free_port()}
+    os.environ.update({
+        "OPENAI_API_KEY": "bench",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{ports['llm']}/v1",
+        "LLM_PROVIDERS": "openai",
+        "ENABLE_GOALS_PRECOMPUTE": "false",
+        "NESTJS_GRAPHQL_URL": f"http://127.0.0.1:{ports['backend']}/graphql"
+    })
+    from app.config import settings
+    from app.dependencies import get_database_service, shutdown
+    from app.main import app
+    from app.middleware.rate_limit import rate_limited_user
+
+    app.dependency_overrides[rate_limited_user] = lambda: {"sub": "token"}
+    goals = f"{settings.api_prefix}/goals/daily"
+    users = range(1, args.users + 1)
+
+    async with LocalServer(llm.app, ports["llm"]), LocalServer(backend.app, ports["backend"]):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://app", timeout=60) as client:
+            calls = llm.completions
+            full = await asyncio.gather(*(timed_post(client, goals, {"userId": u}) for u in users))
+            assert all(r.status_code == 200 and r.headers.get("etag") for r in full)
+            row("200 full", full, llm.completions - calls)
+
+            calls = llm.completions
+            revalidated = await asyncio.gather(*(
+                timed_post(client, goals, {"userId": u}, **{"If-None-Match": r.headers["etag"]})
+                for u, r in zip(users, full)
+            ))
+            assert all(r.status_code == 304 and not r.content for r in revalidated)
+            row("304 match", revalidated, llm.completions - calls)
+            assert llm.completions == calls, "a 304 should not call the LLM"
+
+            # An edited note changes the context version, so the old ETag no longer matches
+            backend.update_note(1, backend.user(1)["notes"][0]["id"], title="Edited title")
+            await get_database_service().invalidate_user_context(1)
+            changed = await timed_post(client, goals, {"userId": 1}, **{"If-None-Match": full[0].headers["etag"]})
+            print(f"after edit   {changed.status_code}, ETag {'changed' if changed.headers['etag'] != full[0].headers['etag'] else 'unchanged'}")
+
+            print()
+            for name, body in (("roadmap", _roadmap(1)), ("notes", _note(1))):
+                path = f"{settings.api_prefix}/{name}/assist"
+                plain = await client.post(path, json=body, headers={"Accept-Encoding": "identity"})
+                gzipped = await client.post(path, json=body, headers={"Accept-Encoding": "gzip"})
+                wire = int(gzipped.headers.get("content-length") or len(gzipped.content))
+                print(
+                    f"{name + '/assist':<15} {len(plain.content):>7,} B plain  {wire:>7,} B "
+                    f"{gzipped.headers.get('content-encoding', 'identity')}"
+                )
+                async with client.stream("POST", path + "/stream", json=body, headers={"Accept-Encoding": "gzip"}) as stream:
+                    assert "content-encoding" not in stream.headers, f"{path}/stream was compressed"
+                    await stream.aread()
+            print("streams      uncompressed")
+
+    await shutdown()
+
+if __name__ == "__main__":
+    asyncio.run(main())
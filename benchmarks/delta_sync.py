@@ -0,0 +1,52 @@
+"""Delta sync of user context against a local stub GraphQL server
+
+Compares the bytes of a warm delta request with a full fetch for each
+profile. tests/test_user_context.py checks that edits, additions and
+deletions reach the cached context.
+
+    python -m benchmarks.delta_sync [--notes 2000] [--note-words 400]
+"""
+import argparse
+import asyncio
+from benchmarks.fake_backend import FakeBackend, LocalServer
+from app.config import settings
+from app.services import database_service
+from app.services.context_queries import PROFILE_FULL, PROFILE_GOALS, PROFILE_NOTE_CONTENT
+from app.services.database_service import DatabaseService, context_sync_stats, user_context_cache
+
+USER_ID = 1
+
+def expire(profile: str) -> None:
+    """Age the cached snapshot past cache_ttl_seconds so the next call syncs"""
+    user_context_cache.get((USER_ID, profile)).fetched_at -= settings.cache_ttl_seconds
+
+async def measure(service: DatabaseService, profile: str) -> None:
+    user_context_cache.clear()
+    before = dict(context_sync_stats)
+    await service.get_user_context(USER_ID, "token", profile)
+    expire(profile)
+    await service.get_user_context(USER_ID, "token", profile)
+
+    full_bytes = context_sync_stats["fullBytes"] - before["fullBytes"]
+    delta_bytes = context_sync_stats["deltaBytes"] - before["deltaBytes"]
+    print(f"{profile:<16} full {full_bytes:>12,} B   warm delta {delta_bytes:>8,} B")
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--notes", type=int, default=2000)
+    parser.add_argument("--note-words", type=int, default=400)
+    args = parser.parse_args()
+
+    backend = FakeBackend(notes=args.notes, note_words=args.note_words)
+    async with LocalServer(backend.app) as server:
+        settings.nestjs_graphql_url = f"{server.url}/graphql"
+        settings.context_delta_sync_enabled = True
+        service = DatabaseService()
+
+        for profile in (PROFILE_FULL, PROFILE_GOALS, PROFILE_NOTE_CONTENT):
+            await measure(service, profile)
+
+        await database_service.get_backend_client().aclose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,57 @@
+"""Local stand-in for Auth0: a JWKS endpoint and a token minter for its key"""
+import base64
+import time
+from typing import Any, Dict, Optional
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import FastAPI
+from jose import jwt
+
+class FakeAuth:
+    """Serves /.well-known/jwks.json for a freshly generated RS256 key"""
+
+    def __init__(self, audience: str, issuer: str, kid: str = "bench-key", private_pem: Optional[bytes] = None):
+        self.audience = audience
+        self.issuer = issuer
+        self.kid = kid
+        self.private_pem = private_pem or rsa.generate_private_key(
+            public_exponent=65537, key_size=2048
+        ).private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption()
+        )
+        self.requests = 0
+
+        self.app = FastAPI()
+        self.app.get("/.well-known/jwks.json")(self.jwks)
+
+    async def jwks(self) -> Dict[str, Any]:
+        self.requests += 1
+        public = serialization.load_pem_private_key(self.private_pem, password=None).public_key().public_numbers()
+        return {
+            "keys": [{
+                "kty": "RSA",
+                "kid": self.kid,
+                "use": "sig",
+                "alg": "RS256",
+                "n": _b64(public.n),
+                "e": _b64(public.e)
+            }]
+        }
+
+    def mint(self, subject: str, ttl: int = 3600, **claims) -> str:
+        """Signed access token the app under test will accept"""
+        payload = {
+            "sub": subject,
+            "aud": self.audience,
+            "iss": self.issuer,
+            "iat": int(time.time()),
+            "exp": int(time.time()) + ttl,
+            **claims
+        }
+        return jwt.encode(payload, self.private_pem.decode(), algorithm="RS256", headers={"kid": self.kid})
+
+def _b64(number: int) -> str:
+    raw = number.to_bytes((number.bit_length() + 7) // 8, "big")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
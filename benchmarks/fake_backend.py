@@ -0,0 +1,87 @@
+"""Local stand-in for the NestJS GraphQL API, serving synthetic user data"""
+import asyncio
+import json
+import socket
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+import uvicorn
+from fastapi import FastAPI, Request, Response
+from benchmarks.synthetic import graphql_response, make_user_data
+
+class FakeBackend:
+    """Per-user synthetic data behind a /graphql endpoint, editable while running"""
+
+    def __init__(self, **data_options):
+        self.data_options = data_options
+        self.users: Dict[int, Dict[str, Any]] = {}
+        self.requests = 0
+        self.bytes_sent = 0
+
+        self.app = FastAPI()
+        self.app.post("/graphql")(self.graphql)
+
+    def user(self, user_id: int) -> Dict[str, Any]:
+        if user_id not in self.users:
+            self.users[user_id] = make_user_data(seed=user_id, **self.data_options)
+        return self.users[user_id]
+
+    async def graphql(self, request: Request) -> Response:
+        body = await request.json()
+        variables = body.get("variables") or {}
+        data = self.user(variables["userId"])
+        payload = json.dumps(graphql_response(data, body["query"], variables)).encode()
+
+        self.requests += 1
+        self.bytes_sent += len(payload)
+        return Response(payload, media_type="application/json")
+
+    def update_note(self, user_id: int, note_id: int, **fields) -> None:
+        note = next(n for n in self.user(user_id)["notes"] if n["id"] == note_id)
+        note.update(fields, updatedAt=datetime.now(timezone.utc).isoformat())
+
+    def add_note(self, user_id: int, title: str, content: str = "") -> int:
+        notes = self.user(user_id)["notes"]
+        now = datetime.now(timezone.utc).isoformat()
+        note_id = max((n["id"] for n in notes), default=0) + 1
+        notes.append({
+            "id": note_id,
+            "title": title,
+            "content": content,
+            "createdAt": now,
+            "updatedAt": now,
+            "tags": []
+        })
+        return note_id
+
+    def delete_note(self, user_id: int, note_id: int) -> None:
+        data = self.user(user_id)
+        data["notes"] = [n for n in data["notes"] if n["id"] != note_id]
+
+class LocalServer:
+    """Runs an ASGI app with uvicorn on a free localhost port inside the current loop"""
+
+    def __init__(self, app: Any, port: Optional[int] = None, lifespan: str = "off"):
+        self.port = port or free_port()
+        self.server = uvicorn.Server(
+            uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning", lifespan=lifespan)
+        )
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    async def __aenter__(self) -> "LocalServer":
+        self._task = asyncio.ensure_future(self.server.serve())
+        while not self.server.started:
+            await asyncio.sleep(0.01)
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.server.should_exit = True
+        await self._task
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
@@ -0,0 +1,245 @@
+"""Local stand-in for an OpenAI-compatible API with configurable latency
+
+Chat completions answer with JSON shaped like what the system prompt asks
+for (daily goals, a roadmap or its personalization, note suggestions or a
+note section analysis), plain or streamed as SSE chunks. Latency can grow
+with the tokens of the request and answer, and prompts over a context
+limit are rejected the way OpenAI does. Embeddings are deterministic per text.
+"""
+import asyncio
+import hashlib
+import json
+import math
+import random
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+
+class LatencyModel:
+    """Samples seconds from a fixed, uniform or lognormal distribution
+
+    median is the typical value; spread is the +/- range for uniform and
+    sigma of the underlying normal for lognormal.
+    """
+
+    DISTRIBUTIONS = ("fixed", "uniform", "lognormal")
+
+    def __init__(self, distribution: str = "lognormal", median: float = 0.5, spread: float = 0.4, seed: Optional[int] = None):
+        if distribution not in self.DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution: {distribution}")
+        self.distribution = distribution
+        self.median = median
+        self.spread = spread
+        self._rng = random.Random(seed)
+
+    def sample(self) -> float:
+        if self.distribution == "fixed":
+            return self.median
+        if self.distribution == "uniform":
+            return max(0.0, self._rng.uniform(self.median - self.spread, self.median + self.spread))
+        return self.median * math.exp(self._rng.gauss(0.0, self.spread))
+
+class FakeLLM:
+    """/v1/chat/completions and /v1/embeddings served from canned, prompt-shaped answers"""
+
+    def __init__(
+        self,
+        latency: Optional[LatencyModel] = None,
+        chunk_interval: float = 0.01,
+        chunk_chars: int = 16,
+        error_rate: float = 0.0,
+        embedding_dimensions: int = 64,
+        seed: int = 0,
+        seconds_per_1k_tokens: float = 0.0,
+        context_tokens: Optional[int] = None
+    ):
+        self.latency = latency or LatencyModel(seed=seed)
+        self.seconds_per_1k_tokens = seconds_per_1k_tokens
+        self.context_tokens = context_tokens
+        self.chunk_interval = chunk_interval
+        self.chunk_chars = chunk_chars
+        self.error_rate = error_rate
+        self.embedding_dimensions = embedding_dimensions
+        self._rng = random.Random(seed)
+
+        self.completions = 0
+        self.streams = 0
+        self.errors = 0
+        self.tokens = 0
+
+        self.app = FastAPI()
+        self.app.post("/v1/chat/completions")(self.chat_completions)
+        self.app.post("/v1/embeddings")(self.embeddings)
+
+    async def chat_completions(self, request: Request) -> Response:
+        body = await request.json()
+        if self._rng.random() < self.error_rate:
+            self.errors += 1
+            return JSONResponse(
+                {"error": {"message": "Injected failure", "type": "server_error"}},
+                status_code=500
+            )
+
+        messages = body.get("messages", [])
+        content = json.dumps(answer_for(messages))
+        prompt_tokens = sum(len(m.get("content") or "") for m in messages) // 4
+        if self.context_tokens and prompt_tokens > self.context_tokens:
+            self.errors += 1
+            return JSONResponse(
+                {"error": {
+                    "message": f"This model's maximum context length is {self.context_tokens} tokens",
+                    "type": "invalid_request_error",
+                    "code": "context_length_exceeded"
+                }},
+                status_code=400
+            )
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(content) // 4,
+            "total_tokens": prompt_tokens + len(content) // 4
+        }
+        self.tokens += usage["total_tokens"]
+
+        delay = self.latency.sample() + self.seconds_per_1k_tokens * usage["total_tokens"] / 1000
+        if body.get("stream"):
+            self.streams += 1
+            return StreamingResponse(
+                self._stream(body.get("model", "bench"), content, usage, delay),
+                media_type="text/event-stream"
+            )
+
+        self.completions += 1
+        await asyncio.sleep(delay)
+        return JSONResponse({
+            "id": f"chatcmpl-{self.completions}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "bench"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": usage
+        })
+
+    async def _stream(self, model: str, content: str, usage: Dict[str, int], delay: float) -> AsyncIterator[str]:
+        """First chunk after delay, then one chunk per interval"""
+        await asyncio.sleep(delay)
+        created = int(time.time())
+        for start in range(0, len(content), self.chunk_chars):
+            yield _sse_chunk(model, created, [{
+                "index": 0,
+                "delta": {"content": content[start:start + self.chunk_chars]},
+                "finish_reason": None
+            }])
+            await asyncio.sleep(self.chunk_interval)
+        yield _sse_chunk(model, created, [{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        yield _sse_chunk(model, created, [], usage)
+        yield "data: [DONE]\n\n"
+
+    async def embeddings(self, request: Request) -> Dict[str, Any]:
+        body = await request.json()
+        texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        return {
+            "object": "list",
+            "model": body.get("model", "bench"),
+            "data": [
+                {"object": "embedding", "index": i, "embedding": self._embed(text)}
+                for i, text in enumerate(texts)
+            ],
+            "usage": {"prompt_tokens": 0, "total_tokens": 0}
+        }
+
+    def _embed(self, text: str) -> List[float]:
+        rng = random.Random(hashlib.blake2b(text.encode(), digest_size=8).digest())
+        vector = [rng.gauss(0.0, 1.0) for _ in range(self.embedding_dimensions)]
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "completions": self.completions,
+            "streams": self.streams,
+            "errors": self.errors,
+            "tokens": self.tokens
+        }
+
+def _sse_chunk(model: str, created: int, choices: List[Dict[str, Any]], usage: Optional[Dict[str, int]] = None) -> str:
+    chunk = {
+        "id": "chatcmpl-stream",
+        "object": "chat.completion.chunk",
+        "created": created,
+        "model": model,
+        "choices": choices,
+        "usage": usage
+    }
+    return f"data: {json.dumps(chunk)}\n\n"
+
+def answer_for(messages: List[Dict[str, str]]) -> Dict[str, Any]:
+    """A well-formed answer for whichever assistant prompt this is"""
+    system = " ".join(m.get("content") or "" for m in messages if m.get("role") == "system")
+    if "daily goals" in system:
+        return {"goals": [
+            {
+                "type": "roadmap_step",
+                "title": f"Finish step {i + 1}",
+                "description": "Work through the next incomplete roadmap step",
+                "priority": ("high", "medium", "low")[i % 3],
+                "estimatedTime": 30,
+                "relatedContent": {"roadmapId": 1, "stepId": i + 1},
+                "reasoning": "It is the next step on an active roadmap"
+            }
+            for i in range(4)
+        ]}
+    if "adapting an existing learning roadmap" in system:
+        return {
+            "skipSteps": [1],
+            "stepNotes": [{"order": 3, "note": "This builds on your existing notes."}],
+            "extraSteps": [],
+            "reasoning": "Skips what your notes already cover"
+        }
+    if "learning roadmap" in system:
+        return {
+            "suggestedRoadmap": {
+                "title": "Suggested roadmap",
+                "description": "A step-by-step path through the topic",
+                "steps": [
+                    {
+                        "order": i + 1,
+                        "title": f"Step {i + 1}",
+                        "description": "What to learn in this step",
+                        "estimatedTime": 60,
+                        "prerequisites": [f"Step {i}"] if i else [],
+                        "learningObjectives": ["Understand the core idea", "Apply it to an exercise"]
+                    }
+                    for i in range(8)
+                ]
+            },
+            "reasoning": "Builds from fundamentals to applications"
+        }
+    if "section of a long study note" in system:
+        section = next((m.get("content") or "" for m in messages if m.get("role") == "user"), "")
+        words = section.split()
+        return {
+            "summary": f"Covers {' '.join(words[5:17])}.",
+            "topics": sorted(set(w.strip(".,").lower() for w in words[5:40] if len(w) > 6))[:4],
+            "suggestedTags": ["python", "algorithms"],
+            "contentGaps": ["Worked examples"],
+            "improvements": [
+                {"type": "clarity", "suggestion": "Define terms before using them", "location": "Opening paragraph"}
+            ]
+        }
+    if "study notes" in system:
+        return {"suggestions": {
+            "title": "Suggested title",
+            "improvedContent": "A restructured version of the note with headings and a summary.",
+            "suggestedTags": ["python", "algorithms"],
+            "contentGaps": ["Worked examples", "Complexity analysis"],
+            "improvements": [
+                {"type": "structure", "suggestion": "Add section headings", "location": "Throughout"},
+                {"type": "completeness", "suggestion": "Add a summary", "location": "End"}
+            ]
+        }}
+    return {}
@@ -0,0 +1,113 @@
+"""JSON decode, encode and LLM-output extraction: stdlib json vs app.utils.fast_json
+
+Decodes a synthetic user's GraphQL response the way the client used to
+(bytes -> str -> json.loads) and the way it does now (fast_json.loads on
+the bytes), encodes API-shaped payloads, and compares the old greedy-regex
+fallback of LLMService._parse_json with extract_json_object.
+
+    python -m benchmarks.json_codec [--notes 2000] [--note-words 400] [--repeat 20]
+"""
+import argparse
+import json
+import re
+import statistics
+import time
+from typing import Any, Callable
+from benchmarks.synthetic import graphql_response, make_user_data
+from app.services.context_queries import PROFILE_FULL, profile_query
+from app.utils import fast_json
+from app.utils.fast_json import extract_json_object
+
+def median_ms(func: Callable[[], Any], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return 1000 * statistics.median(timings)
+
+def regex_extract(text: str) -> Any:
+    """The fallback LLMService._parse_json used before"""
+    match = re.search(r'\{.*\}', text, re.DOTALL)
+    return json.loads(match.group()) if match else None
+
+def compare(label: str, old: Callable[[], Any], new: Callable[[], Any], repeat: int) -> None:
+    old_ms = median_ms(old, repeat)
+    new_ms = median_ms(new, repeat)
+    print(f"{label:<36} {old_ms:>10.3f} {new_ms:>10.3f} {old_ms / new_ms if new_ms else 0:>8.1f}x")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--notes", type=int, default=2000)
+    parser.add_argument("--note-words", type=int, default=400)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    if fast_json.orjson is None:
+        print("orjson isn't installed; fast_json is using the stdlib fallback")
+
+    data = make_user_data(notes=args.notes, note_words=args.note_words)
+    query, variables = profile_query(PROFILE_FULL, 1)
+    payload = json.dumps(graphql_response(data, query, variables)).encode()
+    response = json.loads(payload)
+
+    goals = {"goals": [
+        {
+            "type": "roadmap_step",
+            "title": f"Goal {i}",
+            "description": "Work through the next step " * 10,
+            "priority": "high",
+            "estimatedTime": 30,
+            "relatedContent": {"roadmapId": 1, "stepId": i},
+            "reasoning": "Next on an active roadmap " * 5
+        }
+        for i in range(5)
+    ]}
+    completion = f"Sure! Here are your goals:\n```json\n{json.dumps(goals, indent=2)}\n```\nGood luck!"
+    # Greedy match spans both objects, so the regex fallback can't parse it
+    two_objects = f"{completion}\nAlternatively: {{\"goals\": []}}"
+    # Unclosed braces make the greedy regex rescan the tail from every "{"
+    unbalanced = "{ " * 5000 + "no closing brace"
+
+    print(f"{args.notes} notes x {args.note_words} words: full profile response is {len(payload):,} bytes")
+    print(f"{'':<36} {'json ms':>10} {'fast ms':>10} {'speedup':>9}")
+    compare(
+        "decode GraphQL response",
+        lambda: json.loads(payload.decode()),
+        lambda: fast_json.loads(payload),
+        args.repeat
+    )
+    compare(
+        "encode GraphQL-sized payload",
+        lambda: json.dumps(response).encode(),
+        lambda: fast_json.dumps(response),
+        args.repeat
+    )
+    compare(
+        "encode daily goals response",
+        lambda: json.dumps(goals).encode(),
+        lambda: fast_json.dumps(goals),
+        args.repeat * 50
+    )
+    compare(
+        "extract object from prose",
+        lambda: regex_extract(completion),
+        lambda: extract_json_object(completion),
+        args.repeat * 50
+    )
+    compare(
+        "extract from unbalanced braces",
+        lambda: regex_extract(unbalanced),
+        lambda: extract_json_object(unbalanced),
+        max(1, args.repeat // 4)
+    )
+
+    assert extract_json_object(completion) == goals
+    assert extract_json_object(two_objects) == goals
+    try:
+        regex_extract(two_objects)
+    except ValueError:
+        print("regex fallback fails on two objects; extract_json_object returns the first")
+
+if __name__ == "__main__":
+    main()
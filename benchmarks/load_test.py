@@ -0,0 +1,319 @@
+"""Load test of the real app against local stand-ins for Auth0, NestJS and OpenAI
+
+The stand-ins (benchmarks.fake_auth, fake_backend, fake_llm) run in a child
+process so their CPU and allocations stay out of the measurements. The app
+runs under uvicorn in this process and is driven over HTTP by a closed loop
+of --concurrency clients. Each endpoint reports p50/p95/p99 latency (and
+time to first byte for streams), requests/sec, and the peak and retained
+Python allocations per request from a sequential tracemalloc pass.
+
+Results are written to --results-dir and compared with the previous run.
+Requests cycle through --users distinct users, a separate set for each
+endpoint so one endpoint doesn't warm the caches of the next. With more
+users than requests every request fetches context and calls the LLM; with
+a handful of users the caches answer most of them.
+
+    python -m benchmarks.load_test [--endpoints goals,notes-stream] [--requests 200]
+        [--concurrency 16] [--users 1000] [--llm-latency lognormal:0.5:0.4]
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import statistics
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+import httpx
+
+RESULTS_DIR = Path(__file__).parent / "results"
+USER_ID_STRIDE = 10_000_000
+
+class Endpoint(NamedTuple):
+    method: str
+    path: str
+    body: Optional[Callable[[int], Dict[str, Any]]] = None
+    streaming: bool = False
+
+TOPICS = ["Python basics", "Linear algebra", "Cell biology", "Macroeconomics", "Graph algorithms"]
+NOTE_TEXT = " ".join(["Gradient descent updates parameters against the gradient of the loss."] * 40)
+
+def _roadmap(user: int) -> Dict[str, Any]:
+    return {"userId": user, "topic": TOPICS[user % len(TOPICS)], "description": "From the ground up"}
+
+def _note(user: int) -> Dict[str, Any]:
+    return {"userId": user, "title": f"Lecture {user}", "content": NOTE_TEXT}
+
+def endpoints(api_prefix: str) -> Dict[str, Endpoint]:
+    return {
+        "health": Endpoint("GET", "/health"),
+        "goals": Endpoint("POST", f"{api_prefix}/goals/daily", lambda user: {"userId": user}),
+        "roadmap": Endpoint("POST", f"{api_prefix}/roadmap/assist", _roadmap),
+        "roadmap-stream": Endpoint("POST", f"{api_prefix}/roadmap/assist/stream", _roadmap, streaming=True),
+        "notes": Endpoint("POST", f"{api_prefix}/notes/assist", _note),
+        "notes-stream": Endpoint("POST", f"{api_prefix}/notes/assist/stream", _note, streaming=True)
+    }
+
+def serve_dependencies(ports: Dict[str, int], options: Dict[str, Any], private_pem: bytes, ready) -> None:
+    """Child process entry point: run the three stand-ins until terminated"""
+    from benchmarks.fake_auth import FakeAuth
+    from benchmarks.fake_backend import FakeBackend, LocalServer
+    from benchmarks.fake_llm import FakeLLM, LatencyModel
+
+    async def serve() -> None:
+        auth = FakeAuth(options["audience"], options["issuer"], private_pem=private_pem)
+        backend = FakeBackend(notes=options["notes"], note_words=options["note_words"], roadmaps=options["roadmaps"])
+        llm = FakeLLM(
+            latency=LatencyModel(*parse_latency(options["llm_latency"]), seed=1),
+            chunk_interval=options["llm_chunk_interval"],
+            error_rate=options["llm_error_rate"]
+        )
+        async with LocalServer(auth.app, ports["auth"]), \
+                LocalServer(backend.app, ports["backend"]), \
+                LocalServer(llm.app, ports["llm"]):
+            ready.set()
+            await asyncio.Event().wait()
+
+    asyncio.run(serve())
+
+def parse_latency(value: str) -> tuple:
+    """distribution[:median[:spread]], e.g. lognormal:0.5:0.4 or fixed:0.2"""
+    parts = value.split(":")
+    return (parts[0], *(float(p) for p in parts[1:]))
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+async def send(client: httpx.AsyncClient, endpoint: Endpoint, user: int, token: str) -> Dict[str, Any]:
+    """One request; returns total and first-byte latency in seconds and the status"""
+    kwargs = {"headers": {"Authorization": f"Bearer {token}"}}
+    if endpoint.body is not None:
+        kwargs["json"] = endpoint.body(user)
+
+    start = time.perf_counter()
+    first_byte = None
+    async with client.stream(endpoint.method, endpoint.path.format(user=user), **kwargs) as response:
+        async for _chunk in response.aiter_raw():
+            if first_byte is None:
+                first_byte = time.perf_counter() - start
+    total = time.perf_counter() - start
+    return {"latency": total, "ttfb": first_byte or total, "status": response.status_code}
+
+async def run_load(
+    client: httpx.AsyncClient,
+    endpoint: Endpoint,
+    tokens: Dict[int, str],
+    users: List[int],
+    requests: int,
+    concurrency: int
+) -> Dict[str, Any]:
+    """Closed loop: concurrency workers each send their next request as soon as one finishes"""
+    samples: List[Dict[str, Any]] = []
+    counter = iter(range(requests))
+
+    async def worker() -> None:
+        for i in counter:
+            user = users[i % len(users)]
+            try:
+                samples.append(await send(client, endpoint, user, tokens[user]))
+            except httpx.HTTPError:
+                samples.append({"latency": 0.0, "ttfb": 0.0, "status": 0})
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    ok = sorted(s["latency"] for s in samples if s["status"] == 200)
+    ttfb = sorted(s["ttfb"] for s in samples if s["status"] == 200)
+    result = {
+        "requests": len(samples),
+        "errors": sum(1 for s in samples if s["status"] != 200),
+        "rps": len(samples) / elapsed if elapsed else 0.0,
+        "p50Ms": 1000 * percentile(ok, 0.50),
+        "p95Ms": 1000 * percentile(ok, 0.95),
+        "p99Ms": 1000 * percentile(ok, 0.99),
+        "meanMs": 1000 * statistics.fmean(ok) if ok else 0.0
+    }
+    if endpoint.streaming:
+        result["ttfbP50Ms"] = 1000 * percentile(ttfb, 0.50)
+        result["ttfbP95Ms"] = 1000 * percentile(ttfb, 0.95)
+    return result
+
+async def measure_allocations(
+    client: httpx.AsyncClient,
+    endpoint: Endpoint,
+    tokens: Dict[int, str],
+    users: List[int],
+    requests: int
+) -> Dict[str, float]:
+    """Mean peak and retained traced bytes per sequential request (app and client together)"""
+    peaks, retained = [], []
+    tracemalloc.start()
+    try:
+        for i in range(requests):
+            user = users[i % len(users)]
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            await send(client, endpoint, user, tokens[user])
+            current, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+            retained.append(current - before)
+    finally:
+        tracemalloc.stop()
+    return {
+        "allocPeakKiB": statistics.fmean(peaks) / 1024 if peaks else 0.0,
+        "allocRetainedKiB": statistics.fmean(retained) / 1024 if retained else 0.0
+    }
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+def previous_result(results_dir: Path) -> Optional[Dict[str, Any]]:
+    runs = sorted(results_dir.glob("load_test-*.json"))
+    return json.loads(runs[-1].read_text()) if runs else None
+
+def report(result: Dict[str, Any], previous: Optional[Dict[str, Any]]) -> None:
+    columns = ("rps", "p50Ms", "p95Ms", "p99Ms", "ttfbP50Ms", "allocPeakKiB", "allocRetainedKiB")
+    print(f"{'endpoint':<16} {'errors':>6} " + " ".join(f"{c:>16}" for c in columns))
+    for name, stats in result["endpoints"].items():
+        before = (previous or {}).get("endpoints", {}).get(name, {})
+        cells = []
+        for column in columns:
+            if column not in stats:
+                cells.append(f"{'-':>16}")
+                continue
+            cell = f"{stats[column]:.1f}"
+            if before.get(column):
+                cell += f" ({100 * (stats[column] - before[column]) / before[column]:+.0f}%)"
+            cells.append(f"{cell:>16}")
+        print(f"{name:<16} {stats['errors']:>6} " + " ".join(cells))
+
+    if previous is not None:
+        note = "" if previous["config"] == result["config"] else ", different settings"
+        print(f"(changes vs {previous['timestamp']} at {previous.get('commit')}{note})")
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--endpoints", default="health,goals,roadmap,roadmap-stream,notes,notes-stream")
+    parser.add_argument("--requests", type=int, default=200, help="per endpoint")
+    parser.add_argument("--warmup", type=int, default=10, help="untimed requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--notes", type=int, default=300, help="per synthetic user")
+    parser.add_argument("--note-words", type=int, default=150)
+    parser.add_argument("--roadmaps", type=int, default=10)
+    parser.add_argument("--llm-latency", default="lognormal:0.5:0.4", help="distribution[:median[:spread]]")
+    parser.add_argument("--llm-chunk-interval", type=float, default=0.005)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--alloc-requests", type=int, default=20, help="0 skips the allocation pass")
+    parser.add_argument("--results-dir", type=Path, default=RESULTS_DIR)
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+
+    from benchmarks.fake_auth import FakeAuth
+    from benchmarks.fake_backend import LocalServer, free_port
+
+    ports = {"auth": free_port(), "backend": free_port(), "llm": free_port()}
+    auth = FakeAuth(os.environ["AUTH0_AUDIENCE"], os.environ["AUTH0_ISSUER"])
+    options = {
+        "audience": auth.audience,
+        "issuer": auth.issuer,
+        "notes": args.notes,
+        "note_words": args.note_words,
+        "roadmaps": args.roadmaps,
+        "llm_latency": args.llm_latency,
+        "llm_chunk_interval": args.llm_chunk_interval,
+        "llm_error_rate": args.llm_error_rate
+    }
+
+    # Settings are read once, when app.config is first imported, so they must
+    # point at the stand-ins before that
+    os.environ.update({
+        "AUTH0_JWKS_URL": f"http://127.0.0.1:{ports['auth']}/.well-known/jwks.json",
+        "NESTJS_API_URL": f"http://127.0.0.1:{ports['backend']}",
+        "NESTJS_GRAPHQL_URL": f"http://127.0.0.1:{ports['backend']}/graphql",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{ports['llm']}/v1",
+        "OPENAI_API_KEY": "bench",
+        "LLM_PROVIDERS": "openai",
+        "ENABLE_GOALS_PRECOMPUTE": "false",
+        "MAX_REQUESTS_PER_MINUTE": str(10 ** 9),
+        "GLOBAL_MAX_REQUESTS_PER_MINUTE": "0",
+        "LLM_TOKEN_BUDGET_PER_USER": "0"
+    })
+
+    context = multiprocessing.get_context("spawn")
+    ready = context.Event()
+    dependencies = context.Process(
+        target=serve_dependencies, args=(ports, options, auth.private_pem, ready), daemon=True
+    )
+    dependencies.start()
+    try:
+        if not await asyncio.get_running_loop().run_in_executor(None, ready.wait, 30):
+            raise RuntimeError("Stand-in servers didn't start")
+
+        from app.config import settings
+        from app.main import app
+
+        selected = endpoints(settings.api_prefix)
+        names = [n.strip() for n in args.endpoints.split(",") if n.strip()]
+        unknown = [n for n in names if n not in selected]
+        if unknown:
+            parser.error(f"unknown endpoints: {', '.join(unknown)}")
+
+        result = {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "config": {k: str(v) if isinstance(v, Path) else v for k, v in vars(args).items()
+                       if k not in ("results_dir", "no_save")},
+            "endpoints": {}
+        }
+
+        async with LocalServer(app, lifespan="on") as server:
+            limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+            async with httpx.AsyncClient(base_url=server.url, limits=limits, timeout=120) as client:
+                for index, name in enumerate(names):
+                    endpoint = selected[name]
+                    # Warm-up uses its own users so the timed run still sees cold ones
+                    base = (index + 1) * USER_ID_STRIDE
+                    warm_users = [base - i for i in range(1, args.warmup + 1)]
+                    users = [base + i for i in range(1, args.users + 1)]
+                    # Signing shares the loop with the app, so mint before timing
+                    tokens = {user: auth.mint(f"bench-user-{user}") for user in warm_users + users}
+                    if warm_users:
+                        await run_load(client, endpoint, tokens, warm_users, args.warmup, args.concurrency)
+
+                    stats = await run_load(client, endpoint, tokens, users, args.requests, args.concurrency)
+                    if args.alloc_requests:
+                        # Users the timed run hasn't touched yet, where there are any
+                        offset = args.requests % len(users)
+                        stats.update(await measure_allocations(
+                            client, endpoint, tokens, users[offset:] + users[:offset], args.alloc_requests
+                        ))
+                    result["endpoints"][name] = stats
+                    print(f"{name}: {stats['requests']} requests, {stats['errors']} errors")
+
+        previous = previous_result(args.results_dir)
+        report(result, previous)
+
+        if not args.no_save:
+            args.results_dir.mkdir(parents=True, exist_ok=True)
+            path = args.results_dir / f"load_test-{result['timestamp'].replace(':', '')}.json"
+            path.write_text(json.dumps(result, indent=2))
+            print(f"saved {path}")
+    finally:
+        dependencies.terminate()
+        dependencies.join()
+
+if __name__ == "__main__":
+    asyncio.run(main())
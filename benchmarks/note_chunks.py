@@ -0,0 +1,119 @@
+"""Note assistant on long notes: one prompt vs section analyses merged, cold and after an edit
+
+Runs RecommendationService.assist_note_creation against local stand-ins for
+NestJS and OpenAI. The fake LLM's latency grows with the tokens of each call
+(--seconds-per-1k) and prompts over --context-tokens are rejected, as a real
+model would. For each note size it reports latency, LLM calls and billed
+tokens for:
+
+    single   the whole note in one prompt (chunking disabled)
+    cold     sections analyzed concurrently, then merged
+    edited   the same note with one paragraph changed
+    repeat   the edited note again, unchanged
+
+    python -m benchmarks.note_chunks [--words 3000,15000,60000] [--llm-latency 0.4]
+        [--seconds-per-1k 0.3] [--context-tokens 16000]
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+from typing import Any, Dict, List
+from benchmarks.fake_backend import FakeBackend, LocalServer, free_port
+from benchmarks.fake_llm import FakeLLM, LatencyModel
+from benchmarks.synthetic import _text
+
+USER_ID = 1
+
+def long_note(words: int, seed: int = 0) -> List[str]:
+    """Paragraphs of a lecture-style note, with a heading every ten paragraphs"""
+    rng = random.Random(seed)
+    paragraphs = []
+    while words > 0:
+        if len(paragraphs) % 11 == 0:
+            paragraphs.append(f"# {_text(rng, 3).title()}")
+        length = min(words, rng.randint(40, 160))
+        paragraphs.append(_text(rng, length).capitalize() + ".")
+        words -= length
+    return paragraphs
+
+async def run(service: Any, llm: FakeLLM, content: str) -> Dict[str, Any]:
+    calls, tokens = llm.completions, llm.tokens
+    start = time.perf_counter()
+    try:
+        await service.assist_note_creation(USER_ID, content, "Lecture notes", "token")
+        error = None
+    except Exception as e:
+        error = type(e).__name__
+    return {
+        "seconds": time.perf_counter() - start,
+        "calls": llm.completions - calls,
+        "tokens": llm.tokens - tokens,
+        "error": error
+    }
+
+def row(label: str, result: Dict[str, Any]) -> None:
+    outcome = f"failed: {result['error']}" if result["error"] else ""
+    print(
+        f"  {label:<8} {1000 * result['seconds']:>9.0f} ms {result['calls']:>6} calls "
+        f"{result['tokens']:>9,} tokens  {outcome}"
+    )
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--words", default="3000,15000,60000")
+    parser.add_argument("--llm-latency", type=float, default=0.4, help="seconds per call before token costs")
+    parser.add_argument("--seconds-per-1k", type=float, default=0.3, help="added latency per 1k tokens of a call")
+    parser.add_argument("--context-tokens", type=int, default=16000)
+    args = parser.parse_args()
+
+    llm = FakeLLM(
+        latency=LatencyModel("fixed", args.llm_latency),
+        seconds_per_1k_tokens=args.seconds_per_1k,
+        context_tokens=args.context_tokens
+    )
+    backend = FakeBackend(notes=200, note_words=200)
+    ports = {"llm": free_port(), "backend": free_port()}
+    os.environ.update({
+        "OPENAI_API_KEY": "bench",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{ports['llm']}/v1",
+        "LLM_PROVIDERS": "openai",
+        "LLM_MAX_RETRIES": "0",
+        "NESTJS_GRAPHQL_URL": f"http://127.0.0.1:{ports['backend']}/graphql"
+    })
+    from app.config import settings
+    from app.dependencies import shutdown
+    from app.services.recommendation_service import RecommendationService
+
+    async with LocalServer(llm.app, ports["llm"]), LocalServer(backend.app, ports["backend"]):
+        # Edited and repeated notes reuse cached section analyses
+        settings.enable_llm_cache = True
+        service = RecommendationService()
+        threshold = settings.note_chunk_threshold_tokens
+        print(
+            f"sections of <= {settings.note_chunk_max_tokens} tokens, {settings.note_chunk_concurrency} in flight; "
+            f"LLM {args.llm_latency:.2f} s + {args.seconds_per_1k:.2f} s/1k tokens, "
+            f"context {args.context_tokens:,} tokens"
+        )
+
+        for seed, words in enumerate(int(w) for w in args.words.split(",")):
+            paragraphs = long_note(words, seed)
+            content = "\n\n".join(paragraphs)
+            print(f"\n{words:,} words (~{len(content) // 4:,} tokens)")
+
+            settings.note_chunk_threshold_tokens = 10 ** 9
+            # Differs from the chunked runs' content so no cache entry is shared
+            row("single", await run(service, llm, content + "\n\n(single)"))
+            settings.note_chunk_threshold_tokens = threshold
+
+            row("cold", await run(service, llm, content))
+            edited = list(paragraphs)
+            edited[len(edited) // 2] += " An added sentence about the edit."
+            row("edited", await run(service, llm, "\n\n".join(edited)))
+            row("repeat", await run(service, llm, "\n\n".join(edited)))
+
+        await shutdown()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,51 @@
+"""Response size and decode time of each GraphQL query profile
+
+    python -m benchmarks.profile_payloads [--notes 2000] [--note-words 400]
+"""
+import argparse
+import json
+import statistics
+import time
+from benchmarks.synthetic import graphql_response, make_user_data
+from app.config import settings
+from app.services.context_queries import QUERY_PROFILES, profile_query
+
+def measure(payload: bytes, repeat: int) -> float:
+    """Median json.loads time in milliseconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        json.loads(payload)
+        timings.append(time.perf_counter() - start)
+    return 1000 * statistics.median(timings)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--notes", type=int, default=2000)
+    parser.add_argument("--note-words", type=int, default=400)
+    parser.add_argument("--roadmaps", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    data = make_user_data(notes=args.notes, roadmaps=args.roadmaps, note_words=args.note_words)
+
+    print(f"{args.notes} notes x {args.note_words} words, {args.roadmaps} roadmaps")
+    print(f"{'profile':<16} {'filters':<8} {'bytes':>12} {'vs full':>8} {'decode ms':>10}")
+
+    full_size = None
+    for server_filters in (False, True):
+        settings.graphql_server_filters = server_filters
+        for profile in QUERY_PROFILES:
+            query, variables = profile_query(profile, 1)
+            if server_filters and query == QUERY_PROFILES[profile]:
+                # Profile has no filtered variant
+                continue
+            payload = json.dumps(graphql_response(data, query, variables)).encode()
+            full_size = full_size or len(payload)
+            print(
+                f"{profile:<16} {'server' if server_filters else '-':<8} {len(payload):>12,} "
+                f"{len(payload) / full_size:>8.1%} {measure(payload, args.repeat):>10.2f}"
+            )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Roadmap assistant with and without shared topic templates, on a skewed topic mix
+
+Many users ask for roadmaps on a few popular topics, worded in different
+ways ("Python basics", "basics of python", "Linear Algebra"). Requests run
+through RecommendationService.assist_roadmap_creation against local
+stand-ins for NestJS and OpenAI, once generating every roadmap in full and
+once from templates with a personalization pass. Reports latency, LLM calls
+and billed tokens for both, and the template store's hit rate.
+
+    python -m benchmarks.roadmap_templates [--requests 400] [--topics 40] [--concurrency 16]
+        [--llm-latency 0.4] [--seconds-per-1k 0.3]
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+from typing import Any, Dict, List, Tuple
+from benchmarks.fake_backend import FakeBackend, LocalServer, free_port
+from benchmarks.fake_llm import FakeLLM, LatencyModel
+
+SUBJECTS = [
+    "Python", "Linear Algebra", "Machine Learning", "Calculus", "Organic Chemistry",
+    "World History", "Spanish", "Statistics", "Rust", "Music Theory", "Microeconomics",
+    "Data Structures", "Photography", "Quantum Mechanics", "SQL", "Japanese", "Drawing",
+    "Genetics", "React", "Public Speaking"
+]
+LEVELS = ["basics", "fundamentals", "for beginners", "advanced", "for data science"]
+PHRASINGS = ["{subject} {level}", "{level} of {subject}", "{SUBJECT} {level}", "the {level} of {subject}"]
+
+def workload(requests: int, topics: int, seed: int = 0) -> List[Tuple[int, str]]:
+    """(user id, topic) pairs with Zipf-distributed topic popularity and varied wording"""
+    rng = random.Random(seed)
+    pool = [(s, l) for s in SUBJECTS for l in LEVELS][:topics]
+    rng.shuffle(pool)
+    weights = [1 / (rank + 1) for rank in range(len(pool))]
+    pairs = []
+    for i in range(requests):
+        subject, level = rng.choices(pool, weights)[0]
+        phrasing = rng.choice(PHRASINGS)
+        topic = phrasing.format(subject=subject, SUBJECT=subject.upper(), level=level)
+        pairs.append((1 + i % 200, topic))
+    return pairs
+
+async def run(service: Any, llm: FakeLLM, pairs: List[Tuple[int, str]], concurrency: int) -> Dict[str, Any]:
+    calls, tokens = llm.completions, llm.tokens
+    slots = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def request(user_id: int, topic: str) -> None:
+        async with slots:
+            start = time.perf_counter()
+            response = await service.assist_roadmap_creation(user_id, topic, None, "token")
+            latencies.append(time.perf_counter() - start)
+            assert response["suggestedRoadmap"]["steps"]
+
+    start = time.perf_counter()
+    await asyncio.gather(*(request(user_id, topic) for user_id, topic in pairs))
+    latencies.sort()
+    return {
+        "seconds": time.perf_counter() - start,
+        "p50": statistics.median(latencies),
+        "p95": latencies[int(0.95 * (len(latencies) - 1))],
+        "calls": llm.completions - calls,
+        "tokens": llm.tokens - tokens
+    }
+
+def row(label: str, result: Dict[str, Any]) -> None:
+    print(
+        f"{label:<10} p50 {1000 * result['p50']:>6.0f} ms  p95 {1000 * result['p95']:>6.0f} ms  "
+        f"{result['calls']:>5} calls {result['tokens']:>10,} tokens  total {result['seconds']:.1f} s"
+    )
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--topics", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--llm-latency", type=float, default=0.4, help="seconds per call before token costs")
+    parser.add_argument("--seconds-per-1k", type=float, default=0.3, help="added latency per 1k tokens of a call")
+    args = parser.parse_args()
+
+    llm = FakeLLM(latency=LatencyModel("fixed", args.llm_latency), seconds_per_1k_tokens=args.seconds_per_1k)
+    backend = FakeBackend(notes=100, note_words=100)
+    ports = {"llm": free_port(), "backend": free_port()}
+    os.environ.update({
+        "OPENAI_API_KEY": "bench",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{ports['llm']}/v1",
+        "LLM_PROVIDERS": "openai",
+        "EMBEDDING_BACKEND": "local",
+        "NESTJS_GRAPHQL_URL": f"http://127.0.0.1:{ports['backend']}/graphql"
+    })
+    from app.config import settings
+    from app.dependencies import shutdown
+    from app.services.context_queries import PROFILE_ROADMAP_ASSIST
+    from app.services.recommendation_service import RecommendationService
+    from app.services.roadmap_templates import normalize_topic, roadmap_templates
+
+    pairs = workload(args.requests, args.topics)
+    print(
+        f"{len(pairs)} requests, {len({t for _, t in pairs})} wordings of "
+        f"{len({normalize_topic(t) for _, t in pairs})} normalized topics, {args.concurrency} concurrent\n"
+    )
+
+    async with LocalServer(llm.app, ports["llm"]), LocalServer(backend.app, ports["backend"]):
+        service = RecommendationService()
+        # Warm user contexts so both runs measure only the LLM side
+        await asyncio.gather(*(
+            service.db_service.get_user_context(user_id, "token", PROFILE_ROADMAP_ASSIST)
+            for user_id in {u for u, _ in pairs}
+        ))
+
+        # Both runs send the same requests; the response cache would answer the second
+        settings.enable_llm_cache = False
+        settings.roadmap_templates_enabled = False
+        row("full", await run(service, llm, pairs, args.concurrency))
+
+        settings.roadmap_templates_enabled = True
+        row("templates", await run(service, llm, pairs, args.concurrency))
+
+        stats = roadmap_templates.stats()
+        print(
+            f"\ntemplate hit rate {stats['hitRate']:.1%} ({stats['exactHits']} exact, {stats['similarHits']} similar, "
+            f"{stats['misses']} misses), ~{stats['savedTokens']:,} generation tokens avoided, "
+            f"~{stats['personalizationTokens']:,} spent personalizing"
+        )
+        await shutdown()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,109 @@
+"""Cold-start cost: import time of app.main and time until /health answers
+
+Each measurement runs in a fresh interpreter. "lazy" is the app as it
+starts today; "eager" additionally builds the recommendation service
+(LLM router, provider SDKs and clients) at import, as the routers used to.
+
+    python -m benchmarks.startup [--repeat 5] [--import-profile]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import httpx
+from benchmarks.fake_backend import free_port
+
+IMPORT_SCRIPT = """
+import sys, time, json
+start = time.perf_counter()
+import app.main
+if {eager}:
+    from app.dependencies import get_recommendation_service
+    get_recommendation_service()
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    "seconds": elapsed,
+    "modules": len(sys.modules),
+    "sdks": sorted(m for m in ("openai", "anthropic") if m in sys.modules)
+}}))
+"""
+
+def child_env() -> dict:
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "bench")
+    env.setdefault("ANTHROPIC_API_KEY", "bench")
+    env.setdefault("LLM_PROVIDERS", "openai,anthropic")
+    return env
+
+def measure_import(eager: bool) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SCRIPT.format(eager=eager)],
+        capture_output=True, text=True, check=True, env=child_env()
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def measure_first_response(timeout: float = 30.0) -> float:
+    """Seconds from spawning uvicorn until GET /health returns 200"""
+    port = free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=child_env()
+    )
+    try:
+        with httpx.Client() as client:
+            while time.perf_counter() - start < timeout:
+                try:
+                    if client.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                        return time.perf_counter() - start
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.005)
+        raise RuntimeError("App didn't answer /health in time")
+    finally:
+        server.terminate()
+        server.wait()
+
+def import_profile(limit: int = 15) -> None:
+    """Slowest modules by cumulative import time (python -X importtime)"""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        capture_output=True, text=True, check=True, env=child_env()
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), module.rstrip()))
+    print("\nslowest imports of app.main (cumulative ms)")
+    for cumulative_us, module in sorted(rows, reverse=True)[:limit]:
+        print(f"{cumulative_us / 1000:>10.1f}  {module}")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--import-profile", action="store_true")
+    args = parser.parse_args()
+
+    print(f"{'mode':<8} {'import ms':>10} {'modules':>8}  provider SDKs")
+    for eager in (False, True):
+        runs = [measure_import(eager) for _ in range(args.repeat)]
+        print(
+            f"{'eager' if eager else 'lazy':<8} "
+            f"{1000 * statistics.median(r['seconds'] for r in runs):>10.1f} "
+            f"{runs[-1]['modules']:>8}  {', '.join(runs[-1]['sdks']) or '-'}"
+        )
+
+    first = [measure_first_response() for _ in range(args.repeat)]
+    print(f"\nspawn to first /health response: median {1000 * statistics.median(first):.0f} ms, "
+          f"max {1000 * max(first):.0f} ms")
+
+    if args.import_profile:
+        import_profile()
+
+if __name__ == "__main__":
+    main()
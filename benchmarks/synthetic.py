@@ -0,0 +1,140 @@
+"""Synthetic user study data shaped like the NestJS GraphQL schema"""
+import random
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+from app.utils.text_processing import parse_timestamp
+
+WORDS = (
+    "algebra calculus derivative integral matrix vector eigenvalue probability "
+    "distribution variance regression gradient descent network neuron layer "
+    "python function class module recursion graph tree heap sort search "
+    "biology cell protein enzyme history empire revolution economy market"
+).split()
+
+TAGS = ["math", "ml", "python", "algorithms", "biology", "history", "economics", "physics"]
+
+def _text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+def _timestamp(rng: random.Random, now: datetime, max_days: int = 120) -> str:
+    return (now - timedelta(seconds=rng.randint(0, max_days * 86400))).isoformat()
+
+def make_user_data(
+    notes: int = 2000,
+    roadmaps: int = 20,
+    steps_per_roadmap: int = 15,
+    note_words: int = 400,
+    seed: int = 0
+) -> Dict[str, Any]:
+    """Everything the full GraphQL profile returns for one user"""
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+
+    note_list = []
+    for i in range(notes):
+        created = _timestamp(rng, now)
+        note_list.append({
+            "id": i + 1,
+            "title": _text(rng, 4).title(),
+            "content": _text(rng, note_words),
+            "createdAt": created,
+            "updatedAt": max(created, _timestamp(rng, now)),
+            "tags": [
+                {"tag": {"id": TAGS.index(t) + 1, "name": t}}
+                for t in rng.sample(TAGS, rng.randint(1, 3))
+            ]
+        })
+
+    roadmap_list = []
+    for i in range(roadmaps):
+        created = _timestamp(rng, now)
+        roadmap_list.append({
+            "id": i + 1,
+            "title": _text(rng, 3).title(),
+            "description": _text(rng, 30),
+            "createdAt": created,
+            "updatedAt": max(created, _timestamp(rng, now)),
+            "steps": [
+                {
+                    "id": i * steps_per_roadmap + j + 1,
+                    "title": _text(rng, 5).title(),
+                    "description": _text(rng, 40),
+                    "order": j + 1,
+                    "isCompleted": rng.random() < 0.4,
+                    "createdAt": created
+                }
+                for j in range(steps_per_roadmap)
+            ]
+        })
+
+    desktops = [
+        {"id": i + 1, "name": _text(rng, 2).title(), "description": _text(rng, 20)}
+        for i in range(5)
+    ]
+    return {"notes": note_list, "roadmaps": roadmap_list, "desktops": desktops}
+
+_TOKEN_RE = re.compile(r"\(.*?\)|[{}]|[A-Za-z_]\w*")
+_ARG_RE = re.compile(r"(\w+)\s*:\s*(\$?\w+)")
+
+def parse_selection(query: str) -> Dict[str, Any]:
+    """Field tree of a GraphQL query: {field: (arguments, subtree or None)}"""
+    tokens = _TOKEN_RE.findall(query)
+    # Skip "query Name(...)" up to the operation's opening brace
+    position = tokens.index("{") + 1
+
+    def parse() -> Dict[str, Any]:
+        nonlocal position
+        fields: Dict[str, Any] = {}
+        last = None
+        while position < len(tokens):
+            token = tokens[position]
+            position += 1
+            if token == "{":
+                fields[last] = (fields[last][0], parse())
+            elif token == "}":
+                return fields
+            elif token.startswith("("):
+                fields[last] = (dict(_ARG_RE.findall(token)), None)
+            else:
+                fields[token] = ({}, None)
+                last = token
+        return fields
+
+    return parse()
+
+def _argument(value: str, variables: Dict[str, Any]) -> Any:
+    if value.startswith("$"):
+        return variables[value[1:]]
+    return {"true": True, "false": False}.get(value, value)
+
+def _filter(items: List[Dict[str, Any]], arguments: Dict[str, str], variables: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """The backend's updatedSince / isCompleted / take list arguments"""
+    if "updatedSince" in arguments:
+        since = parse_timestamp(_argument(arguments["updatedSince"], variables))
+        items = [i for i in items if parse_timestamp(i["updatedAt"]) >= since]
+    if "isCompleted" in arguments:
+        completed = _argument(arguments["isCompleted"], variables)
+        items = [i for i in items if i["isCompleted"] == completed]
+    if "take" in arguments:
+        items = items[:int(_argument(arguments["take"], variables))]
+    return items
+
+def execute(data: Any, selection: Dict[str, Any], variables: Dict[str, Any]) -> Any:
+    """Resolve a parsed selection against plain data"""
+    if isinstance(data, list):
+        return [execute(item, selection, variables) for item in data]
+
+    result = {}
+    for field, (arguments, sub) in selection.items():
+        if field not in data:
+            continue
+        value = data[field]
+        if isinstance(value, list):
+            value = _filter(value, arguments, variables)
+        result[field] = value if sub is None else execute(value, sub, variables)
+    return result
+
+def graphql_response(data: Dict[str, Any], query: str, variables: Dict[str, Any]) -> Dict[str, Any]:
+    """What the backend would answer for query over a user's full data"""
+    return {"data": execute(data, parse_selection(query), variables)}
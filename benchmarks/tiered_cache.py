@@ -0,0 +1,151 @@
+"""Two-tier cache (per-worker L1 in front of shared Redis) across simulated workers
+
+Each "worker" is a TieredCache with its own L1 over one Redis. Reports the
+stored size of a user context snapshot, L1 / L2 / load latencies, how many
+loads a cold-key stampede across workers costs, and how quickly a write on
+one worker evicts the others' L1 copies.
+
+Uses an in-process fakeredis server unless --redis-url points at a real one:
+
+    python -m benchmarks.tiered_cache [--workers 4] [--callers 200] [--notes 2000] [--redis-url redis://...]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Any, Callable, List
+from benchmarks.synthetic import make_user_data
+from app.services.context_sync import ContextSnapshot
+from app.utils.cache import LRUCache
+from app.utils.fast_json import dumps
+from app.utils.tiered_cache import TieredCache, encode_value
+
+KEY = (1, "full")
+
+def redis_clients(count: int, redis_url: str = None) -> List[Any]:
+    """Separate connections per worker, sharing one server"""
+    if redis_url:
+        import redis.asyncio as redis
+
+        return [redis.from_url(redis_url) for _ in range(count)]
+    import fakeredis
+
+    server = fakeredis.FakeServer()
+    return [fakeredis.FakeAsyncRedis(server=server) for _ in range(count)]
+
+def snapshot_cache(redis: Any, namespace: str) -> TieredCache:
+    return TieredCache(
+        namespace,
+        redis,
+        l1=LRUCache(max_entries=100),
+        encode=ContextSnapshot.to_dict,
+        decode=ContextSnapshot.from_dict,
+        size_of=lambda snapshot: snapshot.size
+    )
+
+async def median_ms(fn: Callable[[], Any], repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await fn()
+        times.append(time.perf_counter() - start)
+    return 1000 * statistics.median(times)
+
+async def measure_latency(workers: List[TieredCache], snapshot: ContextSnapshot, repeat: int) -> None:
+    writer, reader = workers[0], workers[1]
+    await writer.set(KEY, snapshot, ttl=300)
+    await asyncio.sleep(0.05)
+
+    async def l2_hit():
+        reader.l1.delete(KEY)
+        assert await reader.get(KEY) is not None
+
+    print(f"L1 hit   {await median_ms(lambda: reader.get(KEY), repeat):>9.3f} ms")
+    print(f"L2 hit   {await median_ms(l2_hit, repeat):>9.3f} ms  (GET + decode + rebuild UserContext)")
+    print(f"write    {await median_ms(lambda: writer.set(KEY, snapshot, ttl=300), repeat):>9.3f} ms  (encode + SET + PUBLISH)")
+
+async def measure_stampede(workers: List[TieredCache], callers: int, load_seconds: float) -> None:
+    loads = 0
+
+    async def loader(_stale):
+        nonlocal loads
+        loads += 1
+        await asyncio.sleep(load_seconds)
+        return {"loadedAt": time.time()}
+
+    key = ("stampede", time.time())
+    start = time.perf_counter()
+    values = await asyncio.gather(*(
+        workers[i % len(workers)].get_or_load(key, loader, ttl=60)
+        for i in range(callers)
+    ))
+    elapsed = time.perf_counter() - start
+    assert all(v == values[0] for v in values), "callers saw different values"
+    print(
+        f"stampede {callers} callers on {len(workers)} workers: {loads} load(s), "
+        f"{1000 * elapsed:.0f} ms (one load takes {1000 * load_seconds:.0f} ms), "
+        f"lock waits {sum(w.lock_waits for w in workers)}"
+    )
+    assert loads == 1, f"expected one load, got {loads}"
+
+async def measure_invalidation(workers: List[TieredCache], rounds: int) -> None:
+    key = "invalidation"
+    delays = []
+    for i in range(rounds):
+        await workers[0].set(key, {"version": i}, ttl=60)
+        for worker in workers[1:]:
+            await worker.get(key)
+            assert key in worker.l1
+
+        await workers[0].set(key, {"version": i + 0.5}, ttl=60)
+        start = time.perf_counter()
+        while any(key in worker.l1 for worker in workers[1:]):
+            await asyncio.sleep(0.0005)
+            if time.perf_counter() - start > 2:
+                raise AssertionError("invalidation didn't reach every worker")
+        delays.append(time.perf_counter() - start)
+        for worker in workers[1:]:
+            assert (await worker.get(key))["version"] == i + 0.5
+
+    print(
+        f"invalidation to {len(workers) - 1} other workers: median {1000 * statistics.median(delays):.2f} ms, "
+        f"max {1000 * max(delays):.2f} ms"
+    )
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--callers", type=int, default=200)
+    parser.add_argument("--load-ms", type=float, default=200)
+    parser.add_argument("--notes", type=int, default=2000)
+    parser.add_argument("--note-words", type=int, default=400)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--redis-url")
+    args = parser.parse_args()
+
+    data = make_user_data(notes=args.notes, note_words=args.note_words)
+    snapshot = ContextSnapshot(data, len(dumps(data)), time.time())
+    plain = len(dumps(snapshot.to_dict()))
+    stored = len(encode_value(snapshot.to_dict()))
+    print(f"snapshot of {args.notes} notes: {plain:,} B as JSON, {stored:,} B stored ({stored / plain:.0%})\n")
+
+    clients = redis_clients(args.workers, args.redis_url)
+    namespace = f"bench:{time.time_ns()}"
+    snapshots = [snapshot_cache(client, f"{namespace}:context") for client in clients]
+    workers = [TieredCache(f"{namespace}:plain", client) for client in clients]
+    for cache in snapshots + workers:
+        await cache.start()
+
+    try:
+        await measure_latency(snapshots, snapshot, args.repeat)
+        print()
+        await measure_stampede(workers, args.callers, args.load_ms / 1000)
+        await measure_invalidation(workers, args.repeat)
+    finally:
+        for cache in snapshots + workers:
+            await cache.aclose()
+        for client in clients:
+            await client.aclose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
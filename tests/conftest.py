@@ -0,0 +1,8 @@
+import os
+
+# Settings are read at import time; give the required ones values before any app module loads
+os.environ.setdefault("AUTH0_DOMAIN", "tests.example.com")
+os.environ.setdefault("AUTH0_AUDIENCE", "https://tests.example.com/api")
+os.environ.setdefault("AUTH0_ISSUER", "https://tests.example.com/")
+os.environ.setdefault("EMBEDDING_BACKEND", "local")
+os.environ.setdefault("ENABLE_GOALS_PRECOMPUTE", "false")
@@ -0,0 +1,24 @@
+import pytest
+from app.services.context_queries import (
+    PROFILE_FULL,
+    PROFILE_NOTE_ASSIST,
+    PROFILE_ROADMAP_ASSIST,
+    QUERY_PROFILES,
+    profile_query
+)
+
+def test_assistants_share_one_profile():
+    assert PROFILE_ROADMAP_ASSIST == PROFILE_NOTE_ASSIST
+    assert len(set(QUERY_PROFILES.values())) == len(QUERY_PROFILES)
+
+def test_delta_query_filters_notes_and_roadmaps_only():
+    query, variables = profile_query(PROFILE_FULL, 7, updated_since="2026-01-01T00:00:00+00:00")
+
+    assert "notes(userId: $userId, updatedSince: $updatedSince)" in query
+    assert "roadmaps(userId: $userId, updatedSince: $updatedSince)" in query
+    assert "desktops(userId: $userId)" in query
+    assert variables == {"userId": 7, "updatedSince": "2026-01-01T00:00:00+00:00"}
+
+def test_unknown_profile_is_rejected():
+    with pytest.raises(ValueError):
+        profile_query("everything", 7)
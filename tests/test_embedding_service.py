@@ -0,0 +1,87 @@
+import asyncio
+import numpy as np
+import pytest
+from app.config import settings
+from app.services.embedding_service import (
+    EmbeddingBackend,
+    EmbeddingService,
+    HashingEmbeddingBackend,
+    create_embedding_backend
+)
+
+NOTES = [
+    {"id": 1, "title": "Gradient descent", "content": "learning rate, loss gradient, convergence", "updatedAt": "a"},
+    {"id": 2, "title": "French verbs", "content": "conjugation of etre and avoir", "updatedAt": "a"},
+    {"id": 3, "title": "Stochastic gradient descent", "content": "mini-batch gradient of the loss", "updatedAt": "a"}
+]
+
+def test_openai_backend_without_a_key_falls_back_to_local(monkeypatch):
+    monkeypatch.setattr(settings, "embedding_backend", "openai")
+    monkeypatch.setattr(settings, "openai_api_key", None)
+
+    assert isinstance(create_embedding_backend(), HashingEmbeddingBackend)
+
+def test_backends_must_implement_embed():
+    with pytest.raises(TypeError):
+        EmbeddingBackend()
+
+def test_related_notes_rank_by_similarity_and_embed_only_changes():
+    async def run():
+        service = EmbeddingService(HashingEmbeddingBackend())
+        related = await service.related_notes(7, NOTES, "gradient descent on the loss", k=2)
+        assert {note_id for note_id, _ in related} == {1, 3}
+
+        edited = [dict(NOTES[0], updatedAt="b"), *NOTES[1:]]
+        await service.related_notes(7, edited[:2], "verbs", k=1)
+        return service.stats()
+
+    stats = asyncio.run(run())
+    # Three notes, then only the edited one; note 3 was dropped, not re-embedded
+    assert stats["embeddedNotes"] == 4
+
+def test_workers_share_note_vectors_through_redis(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    from app.services import embedding_service
+    from app.utils.tiered_cache import TieredCache
+
+    shared = TieredCache(
+        "note_vectors",
+        fakeredis.aioredis.FakeRedis(),
+        encode=lambda vector: vector.astype(np.float32).tobytes(),
+        decode=lambda data: np.frombuffer(data, dtype=np.float32)
+    )
+    monkeypatch.setattr(embedding_service, "shared_note_vectors", shared)
+
+    async def run():
+        first, second = EmbeddingService(HashingEmbeddingBackend()), EmbeddingService(HashingEmbeddingBackend())
+        expected = await first.related_notes(7, NOTES, "gradient descent", k=2)
+        related = await second.related_notes(7, NOTES, "gradient descent", k=2)
+        await shared.aclose()
+        return expected, related, first.stats(), second.stats()
+
+    expected, related, first, second = asyncio.run(run())
+    assert related == pytest.approx(expected)
+    assert first["embeddedNotes"] == 3 and second["embeddedNotes"] == 0
+
+def test_note_vectors_are_not_shared_across_models(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    from app.services import embedding_service
+    from app.utils.tiered_cache import TieredCache
+
+    shared = TieredCache(
+        "note_vectors",
+        fakeredis.aioredis.FakeRedis(),
+        encode=lambda vector: vector.astype(np.float32).tobytes(),
+        decode=lambda data: np.frombuffer(data, dtype=np.float32)
+    )
+    monkeypatch.setattr(embedding_service, "shared_note_vectors", shared)
+
+    async def run():
+        small, large = EmbeddingService(HashingEmbeddingBackend(256)), EmbeddingService(HashingEmbeddingBackend(512))
+        await small.related_notes(7, NOTES, "gradient descent", k=2)
+        await large.related_notes(7, NOTES, "gradient descent", k=2)
+        await shared.aclose()
+        return small.stats(), large.stats()
+
+    small, large = asyncio.run(run())
+    assert small["embeddedNotes"] == 3 and large["embeddedNotes"] == 3
@@ -0,0 +1,64 @@
+import asyncio
+from datetime import datetime, timezone
+from types import SimpleNamespace
+import pytest
+from app.services.recommendation_service import RecommendationService, daily_goals_cache
+from app.utils.etag import etag_matches, make_etag
+
+ETAG = make_etag(1, "2026-01-01", "v1")
+
+@pytest.mark.parametrize("if_none_match, matches", [
+    (None, False),
+    ("", False),
+    (ETAG, True),
+    (ETAG[2:], True),
+    (f'W/"other", {ETAG}', True),
+    ('W/"other"', False)
+])
+def test_tags_match_by_weak_comparison(if_none_match, matches):
+    assert etag_matches(if_none_match, ETAG) is matches
+
+def test_star_matches_only_an_existing_representation():
+    assert etag_matches(" * ", ETAG, exists=True)
+    assert not etag_matches("*", ETAG, exists=False)
+    # A named tag is compared whether or not the representation is still held
+    assert etag_matches(ETAG, ETAG, exists=False)
+
+class StubContexts:
+    async def get_user_context(self, user_id, auth_token, profile):
+        return SimpleNamespace(version="v1", stats={})
+
+def goals_service() -> RecommendationService:
+    service = RecommendationService.__new__(RecommendationService)
+    service.db_service = StubContexts()
+    service.generated = 0
+
+    async def daily_goals(user_id, context, stats, priority):
+        service.generated += 1
+        return [{"title": "Review"}]
+
+    service._daily_goals = daily_goals
+    return service
+
+def test_star_gets_goals_until_todays_have_been_generated():
+    service = goals_service()
+    today = datetime.now(timezone.utc).date().isoformat()
+    daily_goals_cache.clear()
+
+    async def run():
+        _etag, goals = await service.daily_goals_if_changed(1, "user-1", "*")
+        assert goals == [{"title": "Review"}] and service.generated == 1
+
+        daily_goals_cache.set(1, (today, "v1", goals))
+        _etag, goals = await service.daily_goals_if_changed(1, "user-1", "*")
+        assert goals is None and service.generated == 1
+
+        # Yesterday's goals are not a current representation
+        daily_goals_cache.set(1, ("2000-01-01", "v1", goals))
+        _etag, goals = await service.daily_goals_if_changed(1, "user-1", "*")
+        assert goals is not None and service.generated == 2
+
+    try:
+        asyncio.run(run())
+    finally:
+        daily_goals_cache.clear()
@@ -0,0 +1,50 @@
+import time
+import pytest
+from app.utils import fast_json
+from app.utils.fast_json import extract_json_object, loads
+
+@pytest.fixture(params=["orjson", "json"])
+def parser(request, monkeypatch):
+    """Run with orjson when it is installed and with the stdlib fallback"""
+    if request.param == "json":
+        monkeypatch.setattr(fast_json, "orjson", None)
+    elif fast_json.orjson is None:
+        pytest.skip("orjson is not installed")
+
+GOALS = {"goals": [1, 2]}
+
+@pytest.mark.parametrize("text, expected", [
+    ('{"goals": [1, 2]}', GOALS),
+    ('Here you go:\n```json\n{"goals": [1, 2]}\n```', GOALS),
+    ('Sure {"ignored": } then {"goals": [1, 2]} done', GOALS),
+    ('Use the {braces} format: {"goals": [1, 2]}', GOALS),
+    ('Stray { before {"goals": [1, 2]}', GOALS),
+    ('Two { stray { braces then {"goals": [1, 2]}', GOALS),
+    ('Stray } first } then {"goals": [1, 2]} and }', GOALS),
+    ('Stray { before {"goals": [1, 2]} and {"other": 1}', GOALS),
+    ('Stray { before {"note": "}{"} and {"goals": [1, 2]}', {"note": "}{"}),
+    ('Stray { before {"text": "escaped \\" and }"}', {"text": 'escaped " and }'})
+])
+def test_finds_the_object_around_prose(parser, text, expected):
+    assert extract_json_object(text) == expected
+
+@pytest.mark.parametrize("text", ["no json here", "{not json}", "} {", "{ { {"])
+def test_none_without_an_object(parser, text):
+    assert extract_json_object(text) is None
+
+def test_deep_nesting_is_a_parse_failure_not_a_crash(parser):
+    deep = '{"a": ' * 5000 + "1" + "}" * 5000
+    with pytest.raises(ValueError):
+        loads(deep)
+    assert extract_json_object(f"Here: {deep}") is None
+    assert extract_json_object(f'Here: {deep} or {{"goals": [1, 2]}}') == {"goals": [1, 2]}
+
+@pytest.mark.parametrize("text", [
+    '{"a": ' * 20000 + "}",
+    "{ " * 20000 + '{"goals": [1, 2]}',
+    "{x} " * 20000
+], ids=["unclosed keys", "stray braces", "invalid spans"])
+def test_unparseable_text_costs_linear_time(parser, text):
+    start = time.perf_counter()
+    extract_json_object(text)
+    assert time.perf_counter() - start < 1.0
@@ -0,0 +1,91 @@
+import json
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.config import settings
+from app.dependencies import get_recommendation_service
+from app.middleware import rate_limit
+from app.middleware.auth import verify_token
+from app.middleware.rate_limit import InMemoryRateLimitBackend, RateLimiter
+from app.routers import goals
+from app.services.recommendation_service import RecommendationService
+
+GOAL = {
+    "type": "roadmap_step",
+    "title": "Finish step 2",
+    "description": "Gradient descent",
+    "priority": "high",
+    "estimatedTime": 30,
+    "reasoning": "Next on the roadmap"
+}
+
+class StubRecommendations(RecommendationService):
+    """Real batch fan-out over canned per-user results"""
+
+    def __init__(self):
+        self.tokens = []
+
+    async def generate_daily_goals(self, user_id, auth_token, priority=None):
+        self.tokens.append(auth_token)
+        if user_id == 2:
+            raise RuntimeError("backend down for user 2")
+        if user_id == 3:
+            return [{"title": "missing fields"}]
+        return [GOAL]
+
+def client(monkeypatch, scope: str = "goals:batch") -> TestClient:
+    app = FastAPI()
+    app.include_router(goals.router)
+    service = StubRecommendations()
+    app.dependency_overrides[verify_token] = lambda: {"sub": "service@clients", "scope": f"read {scope}"}
+    app.dependency_overrides[get_recommendation_service] = lambda: service
+    monkeypatch.setattr(rate_limit, "rate_limiter", RateLimiter(InMemoryRateLimitBackend()))
+    monkeypatch.setattr(settings, "nestjs_service_token", None)
+    return TestClient(app)
+
+def test_batch_needs_the_batch_scope(monkeypatch):
+    response = client(monkeypatch, scope="goals:read").post("/goals/daily/batch", json={"userIds": [1]})
+    assert response.status_code == 403
+
+def test_batch_size_is_capped(monkeypatch):
+    monkeypatch.setattr(settings, "goals_batch_max_users", 3)
+    response = client(monkeypatch).post("/goals/daily/batch", json={"userIds": [1, 2, 3, 4]})
+    assert response.status_code == 400
+
+def test_each_user_gets_one_ndjson_record_and_failures_stay_per_user(monkeypatch):
+    test_client = client(monkeypatch)
+    response = test_client.post("/goals/daily/batch", json={"userIds": [1, 2, 3, 1]})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert response.text.endswith("\n")
+    records = {r["userId"]: r for r in map(json.loads, response.text.splitlines())}
+
+    assert len(response.text.splitlines()) == 3
+    assert records[1] == {
+        "userId": 1,
+        "status": "ok",
+        "result": goals.daily_goals_response([GOAL]).model_dump()
+    }
+    assert records[2] == {"userId": 2, "status": "error", "error": "backend down for user 2"}
+    assert records[3]["status"] == "error"
+
+def test_rate_limited_users_are_error_records(monkeypatch):
+    test_client = client(monkeypatch)
+    rate_limit.rate_limiter.user_capacity = 1
+
+    first = test_client.post("/goals/daily/batch", json={"userIds": [1]})
+    second = test_client.post("/goals/daily/batch", json={"userIds": [1, 4]})
+
+    assert json.loads(first.text)["status"] == "ok"
+    records = {r["userId"]: r for r in map(json.loads, second.text.splitlines())}
+    assert records[1]["status"] == "error" and records[4]["status"] == "ok"
+
+@pytest.mark.parametrize("service_token, expected", [(None, "service@clients"), ("backend-token", "backend-token")])
+def test_goals_are_fetched_with_the_service_token_when_set(monkeypatch, service_token, expected):
+    test_client = client(monkeypatch)
+    monkeypatch.setattr(settings, "nestjs_service_token", service_token)
+    test_client.post("/goals/daily/batch", json={"userIds": [1]})
+
+    service = test_client.app.dependency_overrides[get_recommendation_service]()
+    assert service.tokens == [expected]
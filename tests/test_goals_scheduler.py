@@ -0,0 +1,110 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+import pytest
+from app.config import settings
+from app.middleware.rate_limit import InMemoryRateLimitBackend, RateLimiter
+from app.services import goals_scheduler as scheduler_module
+from app.services.active_users import ActiveUserRegistry
+from app.services.goals_scheduler import GoalsScheduler
+from app.services.llm_dispatch import PRIORITY_BACKGROUND
+from app.services.llm_service import llm_usage_recorder
+
+fakeredis = pytest.importorskip("fakeredis")
+
+class RecordingRecommendations:
+    """Stands in for RecommendationService, reporting tokens like an LLM call would"""
+
+    def __init__(self, tokens: int = 100, failing=()):
+        self.tokens = tokens
+        self.failing = set(failing)
+        self.calls = []
+
+    async def generate_daily_goals(self, user_id, auth_token, priority):
+        self.calls.append((user_id, auth_token, priority))
+        if user_id in self.failing:
+            raise RuntimeError("backend down")
+        await llm_usage_recorder.get()(self.tokens)
+        return []
+
+@pytest.mark.parametrize("start, end, inside, outside", [
+    (3, 6, [3, 4, 5], [2, 6, 12]),
+    (22, 2, [22, 23, 0, 1], [2, 12, 21])
+])
+def test_runs_only_inside_the_off_peak_window(start, end, inside, outside):
+    scheduler = GoalsScheduler(start_hour=start, end_hour=end)
+    assert all(scheduler.in_window(hour) for hour in inside)
+    assert not any(scheduler.in_window(hour) for hour in outside)
+
+@pytest.fixture
+def users(monkeypatch):
+    """Three active users shared through a fake Redis; user 1 already has today's goals"""
+    registry = ActiveUserRegistry(3600, 100, redis=fakeredis.aioredis.FakeRedis())
+    today = datetime.now(timezone.utc).date()
+    entries = {
+        1: (today.isoformat(), "v1", []),
+        2: ((today - timedelta(days=1)).isoformat(), "v1", [])
+    }
+
+    async def get_daily_goals_entry(user_id):
+        return entries.get(user_id)
+
+    limiter = RateLimiter(InMemoryRateLimitBackend())
+    limiter.token_budget = 1000
+    monkeypatch.setattr(scheduler_module, "active_users", registry)
+    monkeypatch.setattr(scheduler_module, "get_daily_goals_entry", get_daily_goals_entry)
+    monkeypatch.setattr(scheduler_module, "rate_limiter", limiter)
+    monkeypatch.setattr(settings, "enable_redis", False)
+
+    async def add_users():
+        for user_id in (1, 2, 3):
+            await registry.add(user_id, f"user-{user_id}")
+
+    asyncio.run(add_users())
+    return limiter
+
+def test_generates_goals_for_active_users_without_todays(users, monkeypatch):
+    monkeypatch.setattr(settings, "nestjs_service_token", None)
+    service = RecordingRecommendations(failing=[3])
+    scheduler = GoalsScheduler(service)
+
+    assert asyncio.run(scheduler.run_once()) == 1
+    assert sorted(service.calls) == [
+        (2, "user-2", PRIORITY_BACKGROUND),
+        (3, "user-3", PRIORITY_BACKGROUND)
+    ]
+    assert (scheduler.generated, scheduler.failed, scheduler.runs) == (1, 1, 1)
+
+def test_usage_is_charged_to_the_subject_not_the_service_token(users, monkeypatch):
+    monkeypatch.setattr(settings, "nestjs_service_token", "service-token")
+    service = RecordingRecommendations(tokens=300)
+
+    async def run():
+        await GoalsScheduler(service).run_once()
+        return {
+            name: await users.backend.get_usage(f"llm:{name}", users.budget_window)
+            for name in ("user-2", "user-3", "service-token")
+        }
+
+    usage = asyncio.run(run())
+    assert {token for _user, token, _priority in service.calls} == {"service-token"}
+    assert usage == {"user-2": 300, "user-3": 300, "service-token": 0}
+
+def test_one_worker_per_interval_is_elected(monkeypatch):
+    redis = fakeredis.aioredis.FakeRedis()
+    monkeypatch.setattr(settings, "enable_redis", True)
+    monkeypatch.setattr(settings, "redis_url", "redis://fake")
+    monkeypatch.setattr(scheduler_module, "get_redis", lambda: redis)
+    first, second = GoalsScheduler(interval=0.1), GoalsScheduler(interval=0.1)
+
+    async def run():
+        elected = [await first._elected(), await second._elected(), await first._elected()]
+        # The lock lapses before the next interval, so any worker can take that run
+        await asyncio.sleep(0.1)
+        elected.append(await second._elected())
+        return elected
+
+    assert asyncio.run(run()) == [True, False, False, True]
+
+def test_without_redis_every_worker_runs(monkeypatch):
+    monkeypatch.setattr(settings, "enable_redis", False)
+    assert asyncio.run(GoalsScheduler()._elected()) is True
@@ -0,0 +1,158 @@
+import asyncio
+import hashlib
+import hmac
+import time
+import httpx
+import pytest
+from fastapi import FastAPI
+from app.config import settings
+from app.dependencies import shutdown
+from app.models.requests import ChangeEvent
+from app.routers import webhooks
+from app.services.context_queries import PROFILE_FULL
+from app.services.context_sync import ContextSnapshot
+from app.services.database_service import _apply_change_events, user_context_cache
+from app.services.invalidation import ChangeEventProcessor
+
+BODY = b'{"events": [{"entity": "note", "action": "updated", "userId": 1, "id": 7}]}'
+
+def sign(body: bytes, timestamp: str, secret: str = "secret") -> str:
+    return "sha256=" + hmac.new(secret.encode(), timestamp.encode() + b"." + body, hashlib.sha256).hexdigest()
+
+def post_events(timestamp: str, signature: str, body: bytes = BODY) -> httpx.Response:
+    app = FastAPI()
+    app.include_router(webhooks.router)
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://app") as client:
+            return await client.post(
+                "/internal/events",
+                content=body,
+                headers={
+                    "Content-Type": "application/json",
+                    "X-Webhook-Timestamp": timestamp,
+                    "X-Webhook-Signature": signature
+                }
+            )
+
+    return asyncio.run(run())
+
+@pytest.fixture
+def processor(monkeypatch):
+    processor = ChangeEventProcessor(debounce=60, max_delay=60)
+    monkeypatch.setattr(webhooks, "change_events", processor)
+    monkeypatch.setattr(settings, "webhook_secret", "secret")
+    return processor
+
+def test_signed_events_are_accepted(processor):
+    now = str(int(time.time()))
+    response = post_events(now, sign(BODY, now))
+
+    assert response.status_code == 202
+    assert response.json() == {"accepted": 1}
+    assert processor.stats()["received"] == 1
+
+@pytest.mark.parametrize("case", ["wrong secret", "other body", "forged", "missing"])
+def test_bad_signatures_are_rejected(processor, case):
+    now = str(int(time.time()))
+    signature = {
+        "wrong secret": sign(BODY, now, secret="guess"),
+        "other body": sign(BODY.replace(b"7", b"8"), now),
+        "forged": "0" * 64,
+        "missing": ""
+    }[case]
+
+    assert post_events(now, signature).status_code == 401
+    assert processor.received == 0
+
+@pytest.mark.parametrize("skew", [-1, 1, None])
+def test_timestamps_outside_the_tolerance_are_rejected(processor, skew):
+    timestamp = "soon"
+    if skew is not None:
+        timestamp = str(int(time.time()) + skew * (settings.webhook_tolerance_seconds + 2))
+
+    # Correctly signed, so only the timestamp check can refuse it
+    assert post_events(timestamp, sign(BODY, timestamp)).status_code == 401
+    assert processor.received == 0
+
+def test_webhooks_without_a_secret_are_unavailable(processor, monkeypatch):
+    monkeypatch.setattr(settings, "webhook_secret", None)
+    now = str(int(time.time()))
+    assert post_events(now, sign(BODY, now)).status_code == 503
+
+def event(user_id: int, note_id: int = 1, action: str = "updated", entity: str = "note") -> ChangeEvent:
+    return ChangeEvent(entity=entity, action=action, userId=user_id, id=note_id)
+
+def recording(processor: ChangeEventProcessor):
+    """(loop time, user id, note ids) of each batch the processor applies"""
+    applied = []
+
+    async def hook(user_id, events):
+        applied.append((asyncio.get_running_loop().time(), user_id, [e.id for e in events]))
+
+    processor.register(hook)
+    return applied
+
+def test_a_burst_of_events_is_applied_once_after_the_quiet_period():
+    processor = ChangeEventProcessor(debounce=0.05, max_delay=1.0)
+    applied = recording(processor)
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        for note_id in range(1, 4):
+            processor.submit([event(1, note_id)])
+            last = loop.time()
+            await asyncio.sleep(0.03)
+        processor.submit([event(2)])
+        await asyncio.sleep(0.1)
+        return last
+
+    last = asyncio.run(run())
+    assert [(user_id, ids) for _t, user_id, ids in applied] == [(1, [1, 2, 3]), (2, [1])]
+    assert applied[0][0] >= last + 0.05
+    assert processor.stats() == {"received": 4, "flushes": 2, "pendingUsers": 0, "hookErrors": 0}
+
+def test_a_steady_stream_is_flushed_every_max_delay():
+    processor = ChangeEventProcessor(debounce=0.05, max_delay=0.15)
+    applied = recording(processor)
+
+    async def run():
+        start = asyncio.get_running_loop().time()
+        for note_id in range(15):
+            processor.submit([event(1, note_id)])
+            await asyncio.sleep(0.03)
+        await processor.aclose()
+        return start
+
+    start = asyncio.run(run())
+    # Events keep arriving inside the debounce, so only max_delay flushes them
+    assert len(applied) >= 3
+    assert applied[0][0] - start == pytest.approx(0.15, abs=0.05)
+    assert sorted(i for _t, _u, ids in applied for i in ids) == list(range(15))
+
+@pytest.mark.parametrize("delta_sync, events, stale", [
+    (True, [event(1, action="updated"), event(1, 2, action="created")], True),
+    (True, [event(1, action="deleted")], False),
+    (True, [event(1, entity="step")], False),
+    (False, [event(1)], False)
+])
+def test_change_events_mark_snapshots_stale_or_drop_them(monkeypatch, delta_sync, events, stale):
+    monkeypatch.setattr(settings, "context_delta_sync_enabled", delta_sync)
+    key = (1, PROFILE_FULL)
+
+    async def run():
+        try:
+            user_context_cache.set(key, ContextSnapshot({}, 0, time.time()))
+            await _apply_change_events(1, events)
+            return user_context_cache.get(key)
+        finally:
+            user_context_cache.clear()
+            await shutdown()
+
+    snapshot = asyncio.run(run())
+    if stale:
+        # Kept for a delta sync on next use
+        assert snapshot is not None and snapshot.fetched_at == 0.0
+    else:
+        assert snapshot is None
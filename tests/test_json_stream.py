@@ -0,0 +1,59 @@
+import json
+import pytest
+from app.utils.json_stream import StreamingJSONParser
+
+STEPS = ("suggestedRoadmap", "steps", "*")
+
+DOCUMENT = {
+    "suggestedRoadmap": {
+        "title": "Linear algebra",
+        "description": "Vectors to \"eigenvalues\" {not a brace}",
+        "steps": [
+            {"order": 1, "title": "Vectors", "learningObjectives": ["add", "scale"], "estimatedTime": 2.5},
+            {"order": 2, "title": "Matrices [2x2]", "learningObjectives": [], "prerequisites": None},
+            {"order": 3, "title": "Eigen\u00e9", "learningObjectives": ["λ"], "done": True}
+        ]
+    },
+    "reasoning": "Builds up, step by step.",
+    "relatedNotes": [4, -2, 1e3]
+}
+
+def feed_in_chunks(parser: StreamingJSONParser, text: str, size: int):
+    completed = []
+    for start in range(0, len(text), size):
+        completed.extend(parser.feed(text[start:start + size]))
+    return completed
+
+@pytest.mark.parametrize("size", [1, 3, 7, 64, 10 ** 6])
+def test_values_complete_in_order_at_any_chunk_size(size):
+    text = "Here is the roadmap:\n```json\n" + json.dumps(DOCUMENT, indent=2) + "\n```\nDone."
+    parser = StreamingJSONParser({STEPS, ("reasoning",), ()})
+
+    completed = feed_in_chunks(parser, text, size)
+
+    assert completed == [
+        *((STEPS, step) for step in DOCUMENT["suggestedRoadmap"]["steps"]),
+        (("reasoning",), DOCUMENT["reasoning"]),
+        ((), DOCUMENT)
+    ]
+    assert parser.done
+    # Fed text up to the chunk that closed the root object
+    assert text.startswith(parser.text)
+    assert len(parser.text) > text.rindex("}")
+
+def test_incomplete_document_reports_only_finished_values():
+    text = json.dumps(DOCUMENT)
+    cut = text.index('"order": 3')
+    parser = StreamingJSONParser({STEPS, ()})
+
+    completed = feed_in_chunks(parser, text[:cut], 5)
+
+    assert [value["order"] for _, value in completed] == [1, 2]
+    assert not parser.done
+    assert parser.text == text[:cut]
+
+def test_input_after_the_root_object_is_ignored():
+    parser = StreamingJSONParser({()})
+
+    assert parser.feed('{"a": 1} {"b": 2}') == [((), {"a": 1})]
+    assert parser.feed('{"c": 3}') == []
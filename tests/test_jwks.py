@@ -0,0 +1,150 @@
+import asyncio
+import hashlib
+import threading
+import time
+import pytest
+from fastapi import HTTPException
+from benchmarks.fake_auth import FakeAuth
+from benchmarks.fake_backend import LocalServer
+from app.config import settings
+from app.middleware import auth as auth_module
+from app.middleware.auth import JWKSKeyStore, verified_tokens
+
+def jwks_test(test, **store_options):
+    """Run test(auth, server, store) against a local JWKS endpoint"""
+    async def run():
+        auth = FakeAuth("https://api", "https://issuer/", kid="key-1")
+        async with LocalServer(auth.app) as server:
+            store = JWKSKeyStore(f"{server.url}/.well-known/jwks.json", **store_options)
+            try:
+                await test(auth, server, store)
+            finally:
+                await store.aclose()
+
+    asyncio.run(run())
+
+def test_concurrent_callers_share_one_fetch():
+    async def test(auth, server, store):
+        keys = await asyncio.gather(*(store.get_key("key-1") for _ in range(200)))
+
+        assert all(key is keys[0] for key in keys) and keys[0] is not None
+        assert auth.requests == 1
+        assert await store.get_key("key-1") is keys[0]
+        assert store.stats()["hits"] == 1
+
+    jwks_test(test)
+
+def test_unknown_kid_refetches_at_most_once_per_interval():
+    async def test(auth, server, store):
+        await store.get_key("key-1")
+        for _ in range(20):
+            assert await store.get_key("garbage") is None
+        assert auth.requests == 1
+
+        store.min_refresh_interval = 0
+        auth.kid = "key-2"
+        assert await store.get_key("key-2") is not None
+        assert auth.requests == 2
+
+    jwks_test(test, min_refresh_interval=60)
+
+def test_expired_key_set_is_refetched():
+    async def test(auth, server, store):
+        await store.get_key("key-1")
+        await asyncio.sleep(0.06)
+        await store.get_key("key-1")
+
+        assert auth.requests == 2
+
+    jwks_test(test, ttl_seconds=0.05)
+
+def test_failed_refresh_keeps_serving_known_keys():
+    async def test(auth, server, store):
+        key = await store.get_key("key-1")
+        server.server.should_exit = True
+        await server._task
+        store._expires_at = 0
+
+        assert await store.get_key("key-1") is key
+        assert store.stats()["fetchErrors"] == 1
+
+    jwks_test(test, timeout=1.0)
+
+@pytest.fixture
+def decodes(monkeypatch):
+    """Threads jwt.decode ran on, one entry per verification"""
+    monkeypatch.setattr(settings, "auth0_audience", "https://api")
+    monkeypatch.setattr(settings, "auth0_issuer", "https://issuer/")
+    verified_tokens.clear()
+    threads = []
+    decode = auth_module.jwt.decode
+
+    def recording_decode(*args, **kwargs):
+        threads.append(threading.current_thread().name)
+        return decode(*args, **kwargs)
+
+    monkeypatch.setattr(auth_module.jwt, "decode", recording_decode)
+    yield threads
+    verified_tokens.clear()
+
+def verify_test(test, monkeypatch):
+    """Run test(auth) with the app's key store pointed at a local JWKS endpoint"""
+    async def run():
+        auth = FakeAuth("https://api", "https://issuer/", kid="key-1")
+        async with LocalServer(auth.app) as server:
+            store = JWKSKeyStore(f"{server.url}/.well-known/jwks.json")
+            monkeypatch.setattr(auth_module, "jwks_store", store)
+            try:
+                await test(auth)
+            finally:
+                await store.aclose()
+
+    asyncio.run(run())
+
+def test_verified_tokens_are_cached_until_exp(monkeypatch, decodes):
+    async def test(auth):
+        token = auth.mint("user-1")
+        claims = await auth_module._verify(token)
+        assert await auth_module._verify(token) is claims
+        assert claims["sub"] == "user-1" and len(decodes) == 1
+
+        key = hashlib.sha256(token.encode()).digest()
+        _claims, expires_at, _size = verified_tokens._data[key]
+        assert expires_at == claims["exp"]
+
+        await auth_module._verify(auth.mint("user-2"))
+        assert len(decodes) == 2
+
+    verify_test(test, monkeypatch)
+
+def test_tokens_are_decoded_off_the_event_loop(monkeypatch, decodes):
+    async def test(auth):
+        await auth_module._verify(auth.mint("user-1"))
+
+    verify_test(test, monkeypatch)
+    assert decodes and all(name.startswith("jwt-verify") for name in decodes)
+
+def test_expired_tokens_are_not_served_from_the_cache(monkeypatch, decodes):
+    async def test(auth):
+        token = auth.mint("user-1", ttl=1)
+        claims = await auth_module._verify(token)
+        # jose compares exp against whole seconds
+        await asyncio.sleep(claims["exp"] + 1.05 - time.time())
+        assert verified_tokens.get(hashlib.sha256(token.encode()).digest()) is None
+
+        with pytest.raises(HTTPException) as error:
+            await auth_module._verify(token)
+        assert error.value.status_code == 401
+        assert len(decodes) == 2
+
+    verify_test(test, monkeypatch)
+
+def test_invalid_tokens_are_not_cached(monkeypatch, decodes):
+    async def test(auth):
+        token = auth.mint("user-1", aud="https://other")
+        for _ in range(2):
+            with pytest.raises(HTTPException):
+                await auth_module._verify(token)
+        assert len(decodes) == 2 and len(verified_tokens) == 0
+
+    verify_test(test, monkeypatch)
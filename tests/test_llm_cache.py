@@ -0,0 +1,74 @@
+import asyncio
+import pytest
+from app.config import settings
+from app.services import llm_service
+from app.services.llm_cache import LLMResponseCache
+from app.services.llm_service import LLMService
+from app.utils.cache import MemoryCacheBackend
+
+def test_round_trip_counts_hits_and_saved_tokens():
+    async def run():
+        cache = LLMResponseCache(MemoryCacheBackend())
+        key = LLMResponseCache.make_key(prompt="p", model="m")
+
+        assert await cache.get(key) is None
+        await cache.set(key, "answer", tokens=120, latency=1.5, ttl=60)
+        assert await cache.get(key) == "answer"
+        return cache.stats()
+
+    stats = asyncio.run(run())
+    assert (stats["hits"], stats["misses"], stats["savedTokens"]) == (1, 1, 120)
+
+def test_unreadable_entries_are_misses():
+    async def run():
+        cache = LLMResponseCache(MemoryCacheBackend())
+        await cache.backend.set("corrupt", b"\x00not json")
+        await cache.backend.set("old-format", b'{"completion": "answer"}')
+
+        assert await cache.get("corrupt") is None
+        assert await cache.get("old-format") is None
+        return cache.stats()
+
+    stats = asyncio.run(run())
+    assert (stats["hits"], stats["misses"], stats["errors"]) == (0, 2, 2)
+
+class ScriptedRouter:
+    """Stands in for LLMRouter, answering each call with the next reply"""
+
+    signature = ["scripted"]
+
+    def __init__(self, *replies: str):
+        self.replies = list(replies)
+        self.calls = 0
+
+    async def complete(self, messages, temperature, max_tokens, response_format=None, priority=0):
+        self.calls += 1
+        return self.replies.pop(0), 10
+
+    async def stream(self, messages, temperature, max_tokens, usage, priority=0):
+        self.calls += 1
+        yield self.replies.pop(0)
+
+def test_unparseable_completions_are_not_replayed(monkeypatch):
+    monkeypatch.setattr(settings, "enable_llm_cache", True)
+    monkeypatch.setattr(llm_service, "llm_response_cache", LLMResponseCache(MemoryCacheBackend()))
+    router = ScriptedRouter("Sorry, I can't.", '{"goals": [1]}', "{truncated", '{"goals": [2]}')
+    service = LLMService(router=router)
+
+    async def stream(prompt):
+        return [item async for item in service.stream_structured_response(prompt, cache_ttl=60)]
+
+    async def run():
+        with pytest.raises(ValueError):
+            await service.generate_structured_response("p", cache_ttl=60)
+        assert await service.generate_structured_response("p", cache_ttl=60) == {"goals": [1]}
+        assert await service.generate_structured_response("p", cache_ttl=60) == {"goals": [1]}
+        assert router.calls == 2
+
+        with pytest.raises(ValueError):
+            await stream("s")
+        assert await stream("s") == [((), {"goals": [2]})]
+        assert await stream("s") == [((), {"goals": [2]})]
+        assert router.calls == 4
+
+    asyncio.run(run())
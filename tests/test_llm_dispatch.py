@@ -0,0 +1,160 @@
+import asyncio
+import time
+from types import SimpleNamespace
+from typing import Dict, Optional
+import pytest
+from app.services.llm_dispatch import LLMDispatcher
+
+class ProviderError(Exception):
+    def __init__(self, status_code: int, headers: Optional[Dict[str, str]] = None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers=headers or {})
+
+async def ok() -> str:
+    return "ok"
+
+def test_limit_grows_by_about_one_slot_per_limit_of_fast_calls():
+    dispatcher = LLMDispatcher(initial_limit=4, max_limit=6)
+
+    async def run():
+        for _ in range(5):
+            await dispatcher.run(ok)
+        assert int(dispatcher.limit) == 5
+
+        for _ in range(50):
+            await dispatcher.run(ok)
+        assert dispatcher.limit == 6
+
+    asyncio.run(run())
+
+def test_limit_halves_on_429_and_is_trimmed_when_slow():
+    dispatcher = LLMDispatcher(initial_limit=16, min_limit=3, latency_target=0.01, max_retries=0)
+
+    async def rate_limited():
+        raise ProviderError(429)
+
+    async def slow():
+        await asyncio.sleep(0.02)
+
+    async def run():
+        with pytest.raises(ProviderError):
+            await dispatcher.run(rate_limited)
+        assert dispatcher.limit == 8 and dispatcher.rate_limited == 1
+
+        await dispatcher.run(slow)
+        assert dispatcher.limit == pytest.approx(7.2)
+
+        for _ in range(3):
+            with pytest.raises(ProviderError):
+                await dispatcher.run(rate_limited)
+        assert dispatcher.limit == 3
+
+    asyncio.run(run())
+
+def test_waiters_run_by_priority_then_arrival():
+    dispatcher = LLMDispatcher(initial_limit=1)
+    order = []
+
+    async def run():
+        release = asyncio.Event()
+
+        async def holder():
+            await release.wait()
+
+        def call(name: str):
+            async def record():
+                order.append(name)
+            return record
+
+        first = asyncio.create_task(dispatcher.run(holder))
+        await asyncio.sleep(0)
+        waiters = [
+            asyncio.create_task(dispatcher.run(call(name), priority=priority))
+            for name, priority in [("background", 10), ("interactive-1", 0), ("default", 5), ("interactive-2", 0)]
+        ]
+        await asyncio.sleep(0)
+        assert dispatcher.stats()["queueDepth"] == 4
+
+        release.set()
+        await asyncio.gather(first, *waiters)
+
+    asyncio.run(run())
+    assert order == ["interactive-1", "interactive-2", "default", "background"]
+    assert dispatcher.in_flight == 0
+
+def test_a_waiter_cancelled_as_it_is_granted_hands_the_slot_on():
+    dispatcher = LLMDispatcher(initial_limit=1)
+
+    async def run():
+        await dispatcher._acquire(0)
+        granted, next_in_line = (
+            asyncio.create_task(dispatcher.run(ok)) for _ in range(2)
+        )
+        await asyncio.sleep(0)
+
+        # The slot goes to the first waiter, which is cancelled before it runs
+        dispatcher._release()
+        granted.cancel()
+
+        assert await asyncio.wait_for(next_in_line, 1) == "ok"
+        with pytest.raises(asyncio.CancelledError):
+            await granted
+        assert dispatcher.in_flight == 0
+
+    asyncio.run(run())
+
+def test_a_waiter_cancelled_while_queued_is_skipped():
+    dispatcher = LLMDispatcher(initial_limit=1)
+
+    async def run():
+        await dispatcher._acquire(0)
+        cancelled, waiting = (asyncio.create_task(dispatcher.run(ok)) for _ in range(2))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.sleep(0)
+
+        dispatcher._release()
+        assert await asyncio.wait_for(waiting, 1) == "ok"
+        assert dispatcher.in_flight == 0
+
+    asyncio.run(run())
+
+@pytest.mark.parametrize("headers", [{"retry-after": "0.2"}, {"retry-after-ms": "200"}])
+def test_retries_wait_at_least_the_requested_retry_after(headers):
+    dispatcher = LLMDispatcher(max_retries=2, backoff_base=0.01, backoff_max=0.01)
+    failures = [ProviderError(429, headers)]
+
+    async def call():
+        if failures:
+            raise failures.pop(0)
+        return "ok"
+
+    async def run():
+        start = time.perf_counter()
+        assert await dispatcher.run(call) == "ok"
+        return time.perf_counter() - start
+
+    elapsed = asyncio.run(run())
+    assert 0.2 <= elapsed < 0.5
+    assert dispatcher.retries == 1
+
+def test_gives_up_after_max_retries_and_never_retries_client_errors():
+    dispatcher = LLMDispatcher(max_retries=2, backoff_base=0.001, backoff_max=0.001)
+    calls = []
+
+    def failing(status_code: int):
+        async def call():
+            calls.append(status_code)
+            raise ProviderError(status_code)
+        return call
+
+    async def run():
+        with pytest.raises(ProviderError):
+            await dispatcher.run(failing(503))
+        with pytest.raises(ProviderError):
+            await dispatcher.run(failing(400))
+
+    asyncio.run(run())
+    assert calls == [503, 503, 503, 400]
+    assert dispatcher.retries == 2
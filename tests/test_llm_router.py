@@ -0,0 +1,131 @@
+import asyncio
+import time
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from app.services.llm_dispatch import LLMDispatcher
+from app.services.llm_providers import LLMProvider
+from app.services.llm_router import LLMRouter
+
+class ProviderError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+class FakeProvider(LLMProvider):
+    """In-process provider with injected latency and a queue of failures"""
+
+    def __init__(self, name: str, latency: float, failures: Optional[List[int]] = None):
+        self.name = name
+        self.model = f"{name}-model"
+        self.latency = latency
+        self.failures = list(failures or [])
+        self.calls = 0
+        self.cancelled = 0
+
+    async def _call(self) -> None:
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.latency)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.failures:
+            raise ProviderError(self.failures.pop(0))
+
+    async def complete(self, messages, temperature, max_tokens, response_format=None) -> Tuple[str, int]:
+        await self._call()
+        return self.name, 10
+
+    async def stream(self, messages, temperature, max_tokens, usage: Dict[str, int]) -> AsyncIterator[str]:
+        await self._call()
+        for word in ("streamed", " by ", self.name):
+            yield word
+        usage["total_tokens"] = 10
+
+def router(*providers: FakeProvider, **options) -> LLMRouter:
+    llm_router = LLMRouter(list(providers), **options)
+    for route in llm_router.routes:
+        # Fast retries so the tests don't wait out production backoff
+        route.dispatcher = LLMDispatcher(max_retries=2, backoff_base=0.01, backoff_max=0.01)
+    return llm_router
+
+async def complete(llm_router: LLMRouter) -> str:
+    text, _tokens = await llm_router.complete([{"role": "user", "content": "hi"}], 0.0, 10)
+    return text
+
+def test_routes_to_the_faster_provider_once_measured():
+    slow, fast = FakeProvider("slow", 0.05), FakeProvider("fast", 0.005)
+    llm_router = router(slow, fast, hedging=False)
+
+    async def run():
+        return [await complete(llm_router) for _ in range(10)]
+
+    results = asyncio.run(run())
+    # Each gets tried while unmeasured, then the fast one takes the traffic
+    assert results[2:] == ["fast"] * 8
+    assert slow.calls == 1
+
+def test_fails_over_on_the_first_transient_error_without_backing_off():
+    primary, secondary = FakeProvider("primary", 0.001, failures=[503]), FakeProvider("secondary", 0.001)
+    llm_router = router(primary, secondary, hedging=False)
+
+    assert asyncio.run(complete(llm_router)) == "secondary"
+    assert primary.calls == 1
+    assert llm_router.routes[0].dispatcher.retries == 0
+    assert llm_router.stats()["failovers"] == 1
+
+def test_retries_with_backoff_after_every_provider_failed():
+    primary = FakeProvider("primary", 0.001, failures=[503, 503])
+    secondary = FakeProvider("secondary", 0.001, failures=[400])
+    llm_router = router(primary, secondary, hedging=False)
+
+    assert asyncio.run(complete(llm_router)) == "primary"
+    # One try each, then two retries on the provider whose error was transient
+    assert (primary.calls, secondary.calls) == (3, 1)
+
+def test_hedge_goes_to_the_second_provider_and_cancels_the_loser():
+    slow, fast = FakeProvider("slow", 1.0), FakeProvider("fast", 0.01)
+    llm_router = router(slow, fast, hedging=True, hedge_default_delay=0.02, hedge_min_delay=0)
+
+    async def run():
+        start = time.perf_counter()
+        text = await complete(llm_router)
+        await asyncio.sleep(0)
+        return text, time.perf_counter() - start
+
+    text, elapsed = asyncio.run(run())
+    assert text == "fast" and elapsed < 0.5
+    assert slow.cancelled == 1
+    assert llm_router.stats()["hedgeWins"] == 1
+    # A cancelled hedge loser isn't a provider failure
+    assert llm_router.routes[0].stats.failures == 0
+
+def test_zero_hedge_min_delay_is_kept():
+    assert router(FakeProvider("a", 0), hedge_min_delay=0).hedge_min_delay == 0
+
+def test_breaker_opens_after_repeated_failures():
+    flaky, healthy = FakeProvider("flaky", 0.001, failures=[400] * 10), FakeProvider("healthy", 0.001)
+    llm_router = router(flaky, healthy, hedging=False)
+    llm_router.routes[0].breaker.failure_threshold = 2
+
+    async def run():
+        # Pin the flaky provider first until its breaker opens
+        for _ in range(2):
+            await llm_router._with_failover(llm_router.routes, ([], 0.0, 10, None, 5))
+        return [await complete(llm_router) for _ in range(5)]
+
+    assert asyncio.run(run()) == ["healthy"] * 5
+    assert flaky.calls == 2
+    assert llm_router.routes[0].breaker.state == "open"
+
+def test_streams_record_latency_and_fail_over_before_the_first_chunk():
+    broken, working = FakeProvider("broken", 0.001, failures=[503]), FakeProvider("working", 0.001)
+    llm_router = router(broken, working, hedging=False)
+
+    async def run():
+        usage = {}
+        chunks = [c async for c in llm_router.stream([{"role": "user", "content": "hi"}], 0.0, 10, usage)]
+        return "".join(chunks)
+
+    assert asyncio.run(run()) == "streamed by working"
+    assert len(llm_router.routes[1].stats.latencies) == 1
+    assert llm_router.routes[0].stats.failures == 1
@@ -0,0 +1,65 @@
+import asyncio
+import httpx
+import pytest
+from fastapi import FastAPI
+from app.config import settings
+from app.routers import health
+from app.utils.metrics import request_timings, span
+
+def test_nested_spans_are_not_counted_twice():
+    async def run():
+        timings = {}
+        request_timings.set(timings)
+        with span("context"):
+            await asyncio.sleep(0.02)
+            with span("graphql"):
+                await asyncio.sleep(0.05)
+        return timings
+
+    timings = asyncio.run(run())
+    assert timings["graphql"] >= 0.05
+    assert 0.02 <= timings["context"] < 0.05
+
+def get(path: str, **headers) -> httpx.Response:
+    app = FastAPI()
+    app.include_router(health.router)
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://app") as client:
+            return await client.get(path, headers=headers)
+
+    return asyncio.run(run())
+
+@pytest.mark.parametrize("path", ["/metrics", "/health/caches", "/health/rate-limits"])
+def test_internal_endpoints_need_the_internal_token(monkeypatch, path):
+    assert get(path).status_code == 503
+
+    monkeypatch.setattr(settings, "internal_token", "secret")
+    assert get(path).status_code == 401
+    assert get(path, Authorization="Bearer wrong").status_code == 401
+    assert get(path, Authorization="Bearer secret").status_code == 200
+
+def test_liveness_is_open():
+    assert get("/health").json() == {"status": "healthy"}
+
+def test_readiness_checks_are_shared_for_a_few_seconds(monkeypatch):
+    runs = []
+
+    async def run_checks():
+        runs.append(1)
+        return {"backend": {"ok": len(runs) > 1, "latencyMs": 1.0}}
+
+    monkeypatch.setattr(health, "_run_checks", run_checks)
+    health._readiness.clear()
+
+    responses = [get("/health/ready") for _ in range(3)]
+    assert [r.status_code for r in responses] == [503] * 3
+    assert responses[0].json() == {"status": "unavailable"}
+    assert len(runs) == 1
+
+    # Once the result expires the next probe checks again
+    health._readiness.clear()
+    assert get("/health/ready").status_code == 200
+    assert len(runs) == 2
+    health._readiness.clear()
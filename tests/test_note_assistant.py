@@ -0,0 +1,44 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from app.config import settings
+from app.middleware.rate_limit import InMemoryRateLimitBackend, RateLimiter
+from app.models.requests import NoteAssistRequest
+from app.routers import note_assistant
+from app.routers.note_assistant import check_note_size
+from app.services.recommendation_service import RecommendationService
+
+PARAGRAPH = "Gradient descent updates the weights against the gradient of the loss. " * 20
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(note_assistant, "rate_limiter", RateLimiter(InMemoryRateLimitBackend()))
+    # Only the note estimate is used, which needs no LLM or backend
+    return RecommendationService.__new__(RecommendationService)
+
+def check(service, content: str) -> None:
+    request = NoteAssistRequest(userId=1, content=content)
+    asyncio.run(check_note_size(request, {"sub": "a"}, service))
+
+def test_long_notes_are_split_into_sections(service):
+    sections, tokens = service.estimate_note_analysis("\n\n".join([PARAGRAPH] * 40))
+    assert sections > 1 and tokens > settings.note_chunk_threshold_tokens
+    assert service.estimate_note_analysis(PARAGRAPH)[0] == 0
+
+@pytest.mark.parametrize("limit, value", [("note_content_max_chars", 1000), ("note_chunk_max_sections", 2)])
+def test_oversized_notes_are_rejected(service, monkeypatch, limit, value):
+    content = "\n\n".join([PARAGRAPH] * 40)
+    check(service, content)
+
+    monkeypatch.setattr(settings, limit, value)
+    with pytest.raises(HTTPException) as error:
+        check(service, content)
+    assert error.value.status_code == 413
+
+def test_notes_beyond_the_remaining_budget_are_rejected(service, monkeypatch):
+    monkeypatch.setattr(note_assistant.rate_limiter, "token_budget", 1000)
+    check(service, PARAGRAPH)
+
+    with pytest.raises(HTTPException) as error:
+        check(service, "\n\n".join([PARAGRAPH] * 40))
+    assert error.value.status_code == 429 and "Retry-After" in error.value.headers
@@ -0,0 +1,90 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from app.middleware import rate_limit
+from app.middleware.auth import require_scope
+from app.middleware.rate_limit import InMemoryRateLimitBackend, RateLimiter
+from app.services.llm_service import llm_usage_recorder
+
+def limiter(user: int, global_: int, budget: int = 0) -> RateLimiter:
+    limiter = RateLimiter(InMemoryRateLimitBackend())
+    limiter.user_capacity = user
+    limiter.global_capacity = global_
+    limiter.token_budget = budget
+    return limiter
+
+def checks(limiter: RateLimiter, user_id: str, count: int):
+    async def run():
+        return [await limiter.check(user_id) for _ in range(count)]
+
+    return asyncio.run(run())
+
+def test_user_bucket_limits_each_user_separately():
+    rate_limiter = limiter(user=3, global_=0)
+
+    results = checks(rate_limiter, "a", 4)
+    assert results[:3] == [None] * 3
+    assert results[3][0] == "user" and results[3][1] > 0
+    assert checks(rate_limiter, "b", 1) == [None]
+
+def test_zero_capacities_disable_the_limits():
+    assert checks(limiter(user=0, global_=0), "a", 500) == [None] * 500
+
+def test_requests_the_global_limit_rejects_cost_the_user_nothing():
+    rate_limiter = limiter(user=5, global_=2)
+
+    results = checks(rate_limiter, "a", 6)
+    assert results[:2] == [None, None]
+    assert all(r[0] == "global" for r in results[2:])
+
+    # Four global rejections later the user still has three of five tokens
+    tokens, _updated = rate_limiter.backend._buckets.get("user:a")
+    assert round(tokens) == 3
+
+def test_exhausted_token_budget_rejects_until_the_window_ends():
+    rate_limiter = limiter(user=0, global_=0, budget=1000)
+
+    async def run():
+        await rate_limiter.record_llm_usage("a", 600)
+        first = await rate_limiter.check("a")
+        await rate_limiter.record_llm_usage("a", 600)
+        return first, await rate_limiter.check("a"), await rate_limiter.check("b")
+
+    first, second, other = asyncio.run(run())
+    assert first is None and other is None
+    assert second[0] == "budget"
+
+def test_enforce_rate_limits_rejects_and_charges_the_given_user(monkeypatch):
+    rate_limiter = limiter(user=1, global_=0, budget=1000)
+    monkeypatch.setattr(rate_limit, "rate_limiter", rate_limiter)
+
+    async def run():
+        await rate_limit.enforce_rate_limits("user-id:1")
+        await llm_usage_recorder.get()(1500)
+        try:
+            await rate_limit.enforce_rate_limits("user-id:1")
+        except HTTPException as e:
+            return e
+
+    error = asyncio.run(run())
+    assert error.status_code == 429 and error.detail == "LLM usage budget exhausted"
+    assert asyncio.run(rate_limiter.check("user-id:2")) is None
+
+def test_require_scope_accepts_scopes_or_permissions():
+    check = require_scope("goals:batch")
+    assert asyncio.run(check({"scope": "read goals:batch"}))
+    assert asyncio.run(check({"permissions": ["goals:batch"]}))
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(check({"sub": "user", "scope": "read"}))
+    assert error.value.status_code == 403
+
+def test_check_budget_counts_the_tokens_about_to_be_spent():
+    rate_limiter = limiter(user=0, global_=0, budget=1000)
+
+    async def run():
+        await rate_limiter.record_llm_usage("a", 600)
+        return await rate_limiter.check_budget("a", 300), await rate_limiter.check_budget("a", 500)
+
+    fits, over = asyncio.run(run())
+    assert fits is None and over > 0
+    assert asyncio.run(limiter(user=0, global_=0).check_budget("a", 10 ** 9)) is None
@@ -0,0 +1,84 @@
+import asyncio
+import pytest
+from app.models.responses import RoadmapAssistResponse
+from app.services.roadmap_templates import RoadmapTemplateStore, normalize_topic, personalize
+
+@pytest.mark.parametrize("topics", [
+    ("C++ basics", "C# basics", "C basics", "Basics"),
+    ("Introduction to R", "Introduction"),
+    ("Python 2", "Python 3", "Python"),
+    ("A* search", "A search")
+])
+def test_distinct_topics_get_distinct_keys(topics):
+    keys = [normalize_topic(topic) for topic in topics]
+    assert len(set(keys)) == len(keys)
+
+@pytest.mark.parametrize("first, second", [
+    ("Machine Learning", "machine-learning"),
+    ("Learn the Python 3", "python 3 learn"),
+    ("Basics of C++", "C++ basics")
+])
+def test_rephrasings_share_a_key(first, second):
+    assert normalize_topic(first) == normalize_topic(second)
+
+def test_similar_topics_with_other_versions_are_not_matched():
+    async def run():
+        store = RoadmapTemplateStore(min_similarity=0.0)
+        generated = []
+
+        async def generate(topic):
+            generated.append(topic)
+            return {"topic": topic}
+
+        await store.get_or_create("Python 2 basics", lambda: generate("Python 2 basics"))
+        template, stored = await store.get_or_create("Python 3 basics", lambda: generate("Python 3 basics"))
+        similar = await store.find("Python 3 fundamentals basics")
+        return generated, template, stored, similar, await store.find("Rust")
+
+    generated, template, stored, similar, missing = asyncio.run(run())
+    assert generated == ["Python 2 basics", "Python 3 basics"]
+    assert template == {"topic": "Python 3 basics"} and not stored
+    assert similar == {"topic": "Python 3 basics"}
+    assert missing is None
+
+TEMPLATE = {
+    "suggestedRoadmap": {
+        "title": "Linear algebra",
+        "description": "From vectors to decompositions",
+        "steps": [
+            {"order": i, "title": title, "description": title, "learningObjectives": [title]}
+            for i, title in enumerate(["Vectors", "Matrices", "Eigenvalues"], 1)
+        ]
+    },
+    "reasoning": "Generic"
+}
+
+def test_personalize_accepts_step_numbers_sent_as_strings():
+    result = personalize(TEMPLATE, {
+        "skipSteps": ["2", "two"],
+        "stepNotes": [{"order": "3", "note": "You have notes on this."}, {"order": None, "note": "Lost"}]
+    })
+
+    steps = result["suggestedRoadmap"]["steps"]
+    assert [(s["order"], s["title"]) for s in steps] == [(1, "Vectors"), (2, "Eigenvalues")]
+    assert steps[1]["description"] == "Eigenvalues You have notes on this."
+    assert TEMPLATE["suggestedRoadmap"]["steps"][2]["description"] == "Eigenvalues"
+
+def test_personalize_drops_extra_steps_that_are_not_valid_roadmap_steps():
+    result = personalize(TEMPLATE, {
+        "extraSteps": [
+            {"after": "1", "title": "Dot products", "description": "Projections", "estimatedTime": "30"},
+            {"after": 2, "title": "No description"},
+            {"after": 2, "title": "Bad time", "description": "x", "estimatedTime": "an hour"},
+            {"after": 2, "title": "Bad objectives", "description": "x", "learningObjectives": "all"},
+            "Determinants"
+        ],
+        "reasoning": "Tailored"
+    })
+
+    steps = result["suggestedRoadmap"]["steps"]
+    assert [s["title"] for s in steps] == ["Vectors", "Dot products", "Matrices", "Eigenvalues"]
+    assert steps[1]["learningObjectives"] == [] and steps[1]["estimatedTime"] == 30
+    # What the roadmap endpoint builds from it
+    response = RoadmapAssistResponse(**result, relatedNotes=[])
+    assert response.reasoning == "Tailored"
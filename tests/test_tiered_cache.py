@@ -0,0 +1,162 @@
+import asyncio
+import time
+import pytest
+from app.services.active_users import ActiveUserRegistry
+from app.utils.tiered_cache import TieredCache
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")  # the lock release is a Lua script
+
+def workers(count: int = 2, **options):
+    """TieredCaches of one namespace over a shared fake Redis, as separate workers would have"""
+    server = fakeredis.FakeServer()
+    caches = [
+        TieredCache("test", fakeredis.aioredis.FakeRedis(server=server), poll_interval=0.01, **options)
+        for _ in range(count)
+    ]
+    return server, caches
+
+def run(test):
+    async def main():
+        server, caches = workers()
+        try:
+            await test(server, *caches)
+        finally:
+            for cache in caches:
+                await cache.aclose()
+
+    asyncio.run(main())
+
+async def eventually(condition, timeout: float = 1.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        await asyncio.sleep(0.01)
+    return True
+
+def test_l2_hit_fills_l1_for_the_remaining_ttl():
+    async def test(server, a, b):
+        await a.set("k", {"v": 1}, ttl=10)
+        await asyncio.sleep(0.2)
+
+        assert await b.get("k") == {"v": 1}
+        assert b.l2_hits == 1
+        _value, expires_at, _size = b.l1._data["k"]
+        assert time.time() + 9 < expires_at <= time.time() + 9.85
+
+        # Served from L1 now
+        assert await b.get("k") == {"v": 1}
+        assert b.l2_hits == 1
+
+    run(test)
+
+def test_writes_and_deletes_drop_other_workers_l1_copies():
+    async def test(server, a, b):
+        await a.start()
+        await b.start()
+        await a.set("k", 1)
+        assert await b.get("k") == 1
+
+        await a.set("k", 2)
+        assert await eventually(lambda: "k" not in b.l1)
+        assert await b.get("k") == 2
+
+        await b.delete("k")
+        assert await eventually(lambda: "k" not in a.l1)
+        assert await a.get("k") is None
+        assert b.invalidations_received == 2 and a.invalidations_received == 1
+
+    run(test)
+
+def test_one_worker_loads_while_the_others_wait():
+    async def test(server, a, b):
+        loads = []
+
+        async def loader(stale):
+            loads.append(stale)
+            await asyncio.sleep(0.1)
+            return "loaded"
+
+        results = await asyncio.gather(
+            *(cache.get_or_load("k", loader, ttl=10) for cache in (a, b, a, b))
+        )
+        assert results == ["loaded"] * 4
+        assert loads == [None]
+        assert a.lock_waits + b.lock_waits == 1
+
+    run(test)
+
+def test_stale_values_are_passed_to_the_loader():
+    async def test(server, a, b):
+        await a.set("k", {"version": 1}, ttl=10)
+
+        async def loader(stale):
+            return {"version": stale["version"] + 1}
+
+        value = await b.get_or_load("k", loader, ttl=10, is_fresh=lambda v: v["version"] > 1)
+        assert value == {"version": 2}
+        assert await a.get_or_load("k", loader, is_fresh=lambda v: v["version"] > 1) == {"version": 2}
+
+    run(test)
+
+def test_without_redis_it_behaves_like_its_l1():
+    async def test(server, a, b):
+        server.connected = False
+
+        await a.set("k", 1, ttl=10)
+        assert await a.get("k") == 1
+        assert await b.get("k") is None
+
+        async def loader(stale):
+            return "loaded"
+
+        assert await b.get_or_load("k", loader, ttl=10) == "loaded"
+        assert await b.get("k") == "loaded"
+        await a.delete("k")
+        assert await a.get("k") is None
+        assert a.errors and b.errors
+
+    run(test)
+
+def test_active_users_are_seen_by_every_worker():
+    async def main():
+        server = fakeredis.FakeServer()
+        first, second = (
+            ActiveUserRegistry(60, 2, redis=fakeredis.aioredis.FakeRedis(server=server))
+            for _ in range(2)
+        )
+        await first.add(1, "user-1")
+        await second.add(2, "user-2")
+        assert await first.items() == [(1, "user-1"), (2, "user-2")]
+
+        # Over max_users, the least recently seen goes
+        await first.add(3, "user-3")
+        assert await second.items() == [(2, "user-2"), (3, "user-3")]
+
+        server.connected = False
+        assert await second.items() == [(2, "user-2")]
+        assert second.errors == 1
+
+    asyncio.run(main())
+
+def test_active_users_outside_the_window_are_dropped():
+    async def main():
+        registry = ActiveUserRegistry(60, 10, redis=fakeredis.aioredis.FakeRedis())
+        await registry.add(1, "user-1")
+        await registry.add(2, "user-2")
+        await registry._redis.zadd(registry._seen, {"1": time.time() - 120})
+
+        assert await registry.items() == [(2, "user-2")]
+        assert await registry._redis.hkeys(registry._subjects) == [b"2"]
+
+    asyncio.run(main())
+
+def test_active_users_without_redis_are_per_worker():
+    async def main():
+        registry = ActiveUserRegistry(60, 10)
+        await registry.add(1, "user-1")
+        assert await registry.items() == [(1, "user-1")]
+        assert registry.stats() == {"local": 1, "shared": False, "errors": 0}
+
+    asyncio.run(main())
@@ -0,0 +1,152 @@
+import asyncio
+import time
+import pytest
+from fastapi import Request, Response
+from benchmarks.fake_backend import FakeBackend, LocalServer
+from app.config import settings
+from app.dependencies import shutdown
+from app.services.context_queries import PROFILE_FULL, PROFILE_GOALS, PROFILE_NOTE_CONTENT
+from app.services.database_service import DatabaseService, context_sync_stats, user_context_cache
+
+class OwnerOnlyBackend(FakeBackend):
+    """Stub GraphQL backend that only answers "Bearer user-<id>" for user <id>"""
+
+    async def graphql(self, request: Request) -> Response:
+        user_id = (await request.json())["variables"]["userId"]
+        if request.headers.get("Authorization") != f"Bearer user-{user_id}":
+            self.requests += 1
+            return Response(b'{"errors": [{"message": "Forbidden"}]}', media_type="application/json")
+        return await super().graphql(request)
+
+def backend_test(test, monkeypatch, **data_options):
+    """Run test(backend, service) against a local stub GraphQL server with empty caches"""
+    async def run():
+        backend = OwnerOnlyBackend(notes=20, note_words=20, **data_options)
+        async with LocalServer(backend.app) as server:
+            monkeypatch.setattr(settings, "nestjs_graphql_url", f"{server.url}/graphql")
+            try:
+                await test(backend, DatabaseService())
+            finally:
+                await shutdown()
+
+    user_context_cache.clear()
+    for key in context_sync_stats:
+        context_sync_stats[key] = 0
+    asyncio.run(run())
+
+def test_cached_context_is_only_served_to_the_credentials_that_fetched_it(monkeypatch):
+    async def test(backend, service):
+        owner = await service.get_user_context(1, "user-1")
+        assert await service.get_user_context(1, "user-1") is owner
+        assert backend.requests == 1
+
+        # Another user's token goes to the backend, which refuses it
+        with pytest.raises(Exception, match="Forbidden"):
+            await service.get_user_context(1, "user-2")
+        assert backend.requests == 2
+        assert await service.get_user_context(1, "user-1") is owner
+
+    backend_test(test, monkeypatch)
+
+def test_concurrent_fetches_are_shared_per_credentials_only(monkeypatch):
+    async def test(backend, service):
+        results = await asyncio.gather(
+            *(service.get_user_context(1, "user-1") for _ in range(20)),
+            *(service.get_user_context(1, "user-2") for _ in range(20)),
+            return_exceptions=True
+        )
+
+        assert all(r is results[0] for r in results[:20])
+        assert all(isinstance(r, Exception) for r in results[20:])
+        assert backend.requests == 2
+
+    backend_test(test, monkeypatch)
+
+def test_profiles_are_cached_separately(monkeypatch):
+    async def test(backend, service):
+        full = await service.get_user_context(1, "user-1", PROFILE_FULL)
+        stats = await service.get_user_stats(1, "user-1")
+
+        assert stats["totalNotes"] == len(full.notes)
+        assert backend.requests == 2
+
+    backend_test(test, monkeypatch)
+
+def expire(profile: str) -> None:
+    """Age the cached snapshot past cache_ttl_seconds so the next call syncs"""
+    user_context_cache.get((1, profile)).fetched_at -= settings.cache_ttl_seconds
+
+def titles(context) -> dict:
+    return {n["id"]: n["title"] for n in context.notes}
+
+@pytest.fixture
+def delta_sync(monkeypatch):
+    monkeypatch.setattr(settings, "context_delta_sync_enabled", True)
+
+@pytest.mark.parametrize("profile", [PROFILE_FULL, PROFILE_NOTE_CONTENT])
+def test_delta_sync_applies_edits_and_additions_and_full_resync_deletions(delta_sync, profile, monkeypatch):
+    async def test(backend, service):
+        full = await service.get_user_context(1, "user-1", profile)
+        assert context_sync_stats["fullSyncs"] == 1
+
+        # Stale, nothing changed: an empty delta
+        expire(profile)
+        context = await service.get_user_context(1, "user-1", profile)
+        assert context_sync_stats["deltaSyncs"] == 1
+        assert titles(context) == titles(full)
+
+        first_id = full.notes[0]["id"]
+        backend.update_note(1, first_id, title="Edited title")
+        new_id = backend.add_note(1, "Brand new note", "fresh content")
+        expire(profile)
+        context = await service.get_user_context(1, "user-1", profile)
+        assert titles(context)[first_id] == "Edited title"
+        assert titles(context)[new_id] == "Brand new note"
+        assert len(context.notes) == len(full.notes) + 1
+        assert context_sync_stats["fullSyncs"] == 1
+
+        # Deltas can't see deletions; the next full resync drops the note
+        backend.delete_note(1, new_id)
+        expire(profile)
+        assert new_id in titles(await service.get_user_context(1, "user-1", profile))
+        snapshot = user_context_cache.get((1, profile))
+        snapshot.full_synced_at -= settings.context_full_resync_seconds
+        user_context_cache.set((1, profile), snapshot, expires_at=time.time() - 1)
+        context = await service.get_user_context(1, "user-1", profile)
+        assert new_id not in titles(context)
+        assert context_sync_stats["fullSyncs"] == 2
+
+    backend_test(test, monkeypatch)
+
+def test_profiles_with_steps_keep_the_short_lifetime(delta_sync, monkeypatch):
+    async def test(backend, service):
+        await service.get_user_context(1, "user-1", PROFILE_GOALS)
+        await service.get_user_context(1, "user-1", PROFILE_NOTE_CONTENT)
+        goals = user_context_cache.get((1, PROFILE_GOALS))
+        notes = user_context_cache.get((1, PROFILE_NOTE_CONTENT))
+
+        assert service._expires_at(PROFILE_GOALS, goals) == goals.full_synced_at + settings.cache_ttl_seconds
+        assert service._expires_at(PROFILE_NOTE_CONTENT, notes) == (
+            notes.full_synced_at + settings.context_full_resync_seconds
+        )
+
+    backend_test(test, monkeypatch)
+
+def test_snapshot_size_follows_the_merged_data(delta_sync, monkeypatch):
+    async def test(backend, service):
+        await service.get_user_context(1, "user-1", PROFILE_NOTE_CONTENT)
+        initial = user_context_cache.get((1, PROFILE_NOTE_CONTENT)).size
+
+        # Unchanged data re-sent by many deltas doesn't grow the accounted size
+        for _ in range(5):
+            backend.update_note(1, backend.user(1)["notes"][0]["id"])
+            expire(PROFILE_NOTE_CONTENT)
+            await service.get_user_context(1, "user-1", PROFILE_NOTE_CONTENT)
+        assert abs(user_context_cache.get((1, PROFILE_NOTE_CONTENT)).size - initial) < 100
+
+        backend.add_note(1, "Long note", "word " * 2000)
+        expire(PROFILE_NOTE_CONTENT)
+        await service.get_user_context(1, "user-1", PROFILE_NOTE_CONTENT)
+        assert user_context_cache.get((1, PROFILE_NOTE_CONTENT)).size > initial + 10000
+
+    backend_test(test, monkeypatch)